@@ -1,11 +1,30 @@
 import streamlit as st
-import json
+import jsonio
 import pandas as pd
-from datetime import datetime
+import numpy as np
 import os
 from pathlib import Path
 import copy
+from functools import partial
 import tempfile
+from storage import (
+    DATA_DIR, load_json_file, save_json_records, get_cache_stats,
+    insert_records, update_record, delete_record, load_dataframe, WriteConflict,
+    load_index, dataset_exists
+)
+from validation import get_validator
+from codec import get_codec
+from keys import load_primary_index, KeyConflictChecker
+from stats import load_stats
+from views import has_view, load_view
+from fulltext import load_trigram_index
+from standings import RESULTS_FILE, refresh_for_results
+from careers import CAREERS, compute_careers, refresh_careers_for_results, uncovered_ids
+from export import export_bundle, dataset_json_bytes, dataframe_csv_bytes
+from streaming import StreamImport, StreamParseError, split_checked
+from integrity import ReferenceChecker
+from registry import dataset_labels, describe, get_schema
+from tracing import RerunTrace, new_session_id
 
 # Configurazione pagina
 st.set_page_config(
@@ -14,342 +33,267 @@ st.set_page_config(
     layout="wide"
 )
 
+# Tempi delle fasi di questa esecuzione dello script (pannello debug e log JSONL)
+if "trace_session_id" not in st.session_state:
+    st.session_state.trace_session_id = new_session_id()
+# L'esecuzione precedente non è arrivata in fondo (eccezione o rerun da un widget): la si registra ora
+if "trace" in st.session_state:
+    st.session_state.trace.finish(interrupted=True)
+trace = RerunTrace(st.session_state.trace_session_id)
+st.session_state.trace = trace
+
+
+def rerun():
+    """st.rerun dopo aver registrato il trace di questa esecuzione, che non arriverà in fondo"""
+    trace.finish()
+    st.rerun()
+
 # Titolo dell'app
 st.title("🏎️ F1 Database Manager")
 st.markdown("Gestisci e aggiorna i tuoi file JSON della Formula 1")
 
 # Directory per i file JSON
-DATA_DIR = "data"
 os.makedirs(DATA_DIR, exist_ok=True)
 
-# Schema dei file aggiornato
-SCHEMAS = {
-    "f1db-drivers.json": {
-        "fields": [
-            {"name": "id", "type": "text", "required": True},
-            {"name": "name", "type": "text", "required": True},
-            {"name": "firstName", "type": "text", "required": True},
-            {"name": "lastName", "type": "text", "required": True},
-            {"name": "fullName", "type": "text", "required": True},
-            {"name": "abbreviation", "type": "text", "required": True},
-            {"name": "permanentNumber", "type": "text", "required": True},
-            {"name": "gender", "type": "select", "options": ["MALE", "FEMALE", "OTHER"], "required": True},
-            {"name": "dateOfBirth", "type": "date", "required": True},
-            {"name": "dateOfDeath", "type": "date", "required": False},
-            {"name": "placeOfBirth", "type": "text", "required": True},
-            {"name": "countryOfBirthCountryId", "type": "text", "required": True},
-            {"name": "nationalityCountryId", "type": "text", "required": True},
-            {"name": "secondNationalityCountryId", "type": "text", "required": False},
-            {"name": "bestChampionshipPosition", "type": "integer", "required": True},
-            {"name": "bestStartingGridPosition", "type": "integer", "required": True},
-            {"name": "bestRaceResult", "type": "integer", "required": True},
-            {"name": "bestSprintRaceResult", "type": "integer", "required": False},
-            {"name": "totalChampionshipWins", "type": "integer", "required": True},
-            {"name": "totalRaceEntries", "type": "integer", "required": True},
-            {"name": "totalRaceStarts", "type": "integer", "required": True},
-            {"name": "totalRaceWins", "type": "integer", "required": True},
-            {"name": "totalRaceLaps", "type": "integer", "required": True},
-            {"name": "totalPodiums", "type": "integer", "required": True},
-            {"name": "totalPoints", "type": "float", "required": True},
-            {"name": "totalChampionshipPoints", "type": "float", "required": True},
-            {"name": "totalPolePositions", "type": "integer", "required": True},
-            {"name": "totalFastestLaps", "type": "integer", "required": True},
-            {"name": "totalSprintRaceStarts", "type": "integer", "required": True},
-            {"name": "totalSprintRaceWins", "type": "integer", "required": True},
-            {"name": "totalDriverOfTheDay", "type": "integer", "required": True},
-            {"name": "totalGrandSlams", "type": "integer", "required": True}
-        ]
-    },
-    "f1db-constructors.json": {
-        "fields": [
-            {"name": "id", "type": "text", "required": True},
-            {"name": "name", "type": "text", "required": True},
-            {"name": "fullName", "type": "text", "required": True},
-            {"name": "countryId", "type": "text", "required": True},
-            {"name": "bestChampionshipPosition", "type": "integer", "required": True},
-            {"name": "bestStartingGridPosition", "type": "integer", "required": True},
-            {"name": "bestRaceResult", "type": "integer", "required": True},
-            {"name": "bestSprintRaceResult", "type": "integer", "required": False},
-            {"name": "totalChampionshipWins", "type": "integer", "required": True},
-            {"name": "totalRaceEntries", "type": "integer", "required": True},
-            {"name": "totalRaceStarts", "type": "integer", "required": True},
-            {"name": "totalRaceWins", "type": "integer", "required": True},
-            {"name": "total1And2Finishes", "type": "integer", "required": True},
-            {"name": "totalRaceLaps", "type": "integer", "required": True},
-            {"name": "totalPodiums", "type": "integer", "required": True},
-            {"name": "totalPodiumRaces", "type": "integer", "required": True},
-            {"name": "totalPoints", "type": "float", "required": True},
-            {"name": "totalChampionshipPoints", "type": "float", "required": True},
-            {"name": "totalPolePositions", "type": "integer", "required": True},
-            {"name": "totalFastestLaps", "type": "integer", "required": True},
-            {"name": "totalSprintRaceStarts", "type": "integer", "required": True},
-            {"name": "totalSprintRaceWins", "type": "integer", "required": True}
-        ]
-    },
-    "f1db-races.json": {
-        "fields": [
-            {"name": "id", "type": "integer", "required": True},
-            {"name": "year", "type": "text", "required": True},
-            {"name": "round", "type": "integer", "required": True},
-            {"name": "date", "type": "date", "required": True},
-            {"name": "time", "type": "text", "required": True},
-            {"name": "grandPrixId", "type": "text", "required": True},
-            {"name": "officialName", "type": "text", "required": True},
-            {"name": "qualifyingFormat", "type": "select", "options": ["KNOCKOUT", "ONE_SHOT", "GROUP", "ELIMINATION", None], "required": True},
-            {"name": "sprintQualifyingFormat", "type": "select", "options": ["KNOCKOUT", "ONE_SHOT", "GROUP", "ELIMINATION", None], "required": False},
-            {"name": "circuitId", "type": "text", "required": True},
-            {"name": "circuitType", "type": "select", "options": ["RACE", "SPRINT", "TEST"], "required": True},
-            {"name": "direction", "type": "select", "options": ["CLOCKWISE", "ANTI_CLOCKWISE"], "required": True},
-            {"name": "courseLength", "type": "float", "required": True},
-            {"name": "turns", "type": "integer", "required": True},
-            {"name": "laps", "type": "integer", "required": True},
-            {"name": "distance", "type": "float", "required": True},
-            {"name": "scheduledLaps", "type": "integer", "required": False},
-            {"name": "scheduledDistance", "type": "float", "required": False},
-            {"name": "driversChampionshipDecider", "type": "checkbox", "required": True},
-            {"name": "constructorsChampionshipDecider", "type": "checkbox", "required": True},
-            {"name": "preQualifyingDate", "type": "date", "required": False},
-            {"name": "preQualifyingTime", "type": "text", "required": False},
-            {"name": "freePractice1Date", "type": "date", "required": True},
-            {"name": "freePractice1Time", "type": "text", "required": True},
-            {"name": "freePractice2Date", "type": "date", "required": True},
-            {"name": "freePractice2Time", "type": "text", "required": True},
-            {"name": "freePractice3Date", "type": "date", "required": True},
-            {"name": "freePractice3Time", "type": "text", "required": True},
-            {"name": "freePractice4Date", "type": "date", "required": False},
-            {"name": "freePractice4Time", "type": "text", "required": False},
-            {"name": "qualifying1Date", "type": "date", "required": False},
-            {"name": "qualifying1Time", "type": "text", "required": False},
-            {"name": "qualifying2Date", "type": "date", "required": False},
-            {"name": "qualifying2Time", "type": "text", "required": False},
-            {"name": "qualifyingDate", "type": "date", "required": True},
-            {"name": "qualifyingTime", "type": "text", "required": True},
-            {"name": "sprintQualifyingDate", "type": "date", "required": False},
-            {"name": "sprintQualifyingTime", "type": "text", "required": False},
-            {"name": "sprintRaceDate", "type": "date", "required": False},
-            {"name": "sprintRaceTime", "type": "text", "required": False},
-            {"name": "warmingUpDate", "type": "date", "required": False},
-            {"name": "warmingUpTime", "type": "text", "required": False}
-        ]
-    },
-    "f1db-races-race-results.json": {
-        "fields": [
-            {"name": "raceId", "type": "integer", "required": True},
-            {"name": "year", "type": "text", "required": True},
-            {"name": "round", "type": "integer", "required": True},
-            {"name": "positionDisplayOrder", "type": "integer", "required": True},
-            {"name": "positionNumber", "type": "integer", "required": True},
-            {"name": "positionText", "type": "text", "required": True},
-            {"name": "driverNumber", "type": "text", "required": True},
-            {"name": "driverId", "type": "text", "required": True},
-            {"name": "constructorId", "type": "text", "required": True},
-            {"name": "engineManufacturerId", "type": "text", "required": True},
-            {"name": "tyreManufacturerId", "type": "text", "required": True},
-            {"name": "sharedCar", "type": "checkbox", "required": True},
-            {"name": "laps", "type": "integer", "required": True},
-            {"name": "time", "type": "text", "required": False},
-            {"name": "timeMillis", "type": "integer", "required": False},
-            {"name": "timePenalty", "type": "text", "required": False},
-            {"name": "timePenaltyMillis", "type": "integer", "required": False},
-            {"name": "gap", "type": "text", "required": True},
-            {"name": "gapMillis", "type": "integer", "required": False},
-            {"name": "gapLaps", "type": "integer", "required": True},
-            {"name": "interval", "type": "text", "required": False},
-            {"name": "intervalMillis", "type": "integer", "required": False},
-            {"name": "reasonRetired", "type": "text", "required": False},
-            {"name": "points", "type": "float", "required": False},
-            {"name": "polePosition", "type": "checkbox", "required": True},
-            {"name": "qualificationPositionNumber", "type": "integer", "required": True},
-            {"name": "qualificationPositionText", "type": "text", "required": True},
-            {"name": "gridPositionNumber", "type": "integer", "required": True},
-            {"name": "gridPositionText", "type": "text", "required": True},
-            {"name": "positionsGained", "type": "integer", "required": True},
-            {"name": "pitStops", "type": "integer", "required": True},
-            {"name": "fastestLap", "type": "checkbox", "required": True},
-            {"name": "driverOfTheDay", "type": "checkbox", "required": True},
-            {"name": "grandSlam", "type": "checkbox", "required": True}
-        ]
-    },
-    "f1db-races-constructor-standings.json": {
-        "fields": [
-            {"name": "raceId", "type": "integer", "required": True},
-            {"name": "year", "type": "text", "required": True},
-            {"name": "round", "type": "integer", "required": True},
-            {"name": "positionDisplayOrder", "type": "integer", "required": True},
-            {"name": "positionNumber", "type": "integer", "required": True},
-            {"name": "positionText", "type": "text", "required": True},
-            {"name": "constructorId", "type": "text", "required": True},
-            {"name": "engineManufacturerId", "type": "text", "required": True},
-            {"name": "points", "type": "float", "required": True},
-            {"name": "positionsGained", "type": "integer", "required": True},
-            {"name": "championshipWon", "type": "checkbox", "required": True}
-        ]
-    }
-}
-
-# Funzioni di utilità
-def load_json_file(filename):
-    """Carica un file JSON"""
-    filepath = os.path.join(DATA_DIR, filename)
-    if os.path.exists(filepath):
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return []
-
-def save_json_file(filename, data):
-    """Salva dati in un file JSON"""
-    filepath = os.path.join(DATA_DIR, filename)
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
-    return True
-
-def convert_date_to_string(date_obj):
-    """Converte un oggetto date in stringa ISO"""
-    if date_obj:
-        return date_obj.isoformat()
-    return None
-
-def convert_string_to_date(date_str):
-    """Converte una stringa ISO in oggetto date"""
-    if date_str:
-        return datetime.fromisoformat(date_str).date()
-    return None
-
 # Sidebar per la navigazione
 st.sidebar.title("Navigazione")
 
+# Dataset di FILE_MAPPING e file JSON trovati in DATA_DIR (dal manifest, senza decodificarli)
+datasets = dataset_labels()
+
 # Seleziona tipo di file
 file_type = st.sidebar.selectbox(
     "Seleziona tipo di dati",
-    ["Piloti", "Costruttori", "Gare", "Risultati Gare", "Classifica Costruttori"],
+    list(datasets),
     index=0
 )
 
-# Mappatura tipo di file
-FILE_MAPPING = {
-    "Piloti": "f1db-drivers.json",
-    "Costruttori": "f1db-constructors.json",
-    "Gare": "f1db-races.json",
-    "Risultati Gare": "f1db-races-race-results.json",
-    "Classifica Costruttori": "f1db-races-constructor-standings.json"
-}
+selected_file = datasets[file_type]
+# Il file selezionato viene decodificato solo se è cambiato dall'ultima descrizione
+manifest_entry = describe(selected_file)
+schema = get_schema(selected_file)
+codec = get_codec(selected_file, schema)
+if manifest_entry:
+    schema_source = "dichiarato" if manifest_entry["schema_source"] == "declared" else "dedotto"
+    st.sidebar.caption(
+        f"{manifest_entry['bytes'] / 1024:,.0f} KB su disco · {manifest_entry['rows']} record nel file · schema {schema_source}"
+    )
+
+# Carica i dati esistenti (dalla cache condivisa: la lista non va modificata,
+# le scritture passano da insert_records/update_record/delete_record)
+with trace.span("caricamento"):
+    data = load_json_file(selected_file)
+trace.annotate(dataset=selected_file, rows=len(data))
 
-selected_file = FILE_MAPPING[file_type]
-schema = SCHEMAS[selected_file]
+# Indice di chiave primaria: unicità delle chiavi, allocazione id e ricerca nella tab Modifica
+with trace.span("indice chiavi"):
+    pk_index = load_primary_index(selected_file, schema)
 
-# Carica i dati esistenti
-data = load_json_file(selected_file)
+
+def sync_from_results(records):
+    """Dopo una scrittura dei risultati gara ricalcola le classifiche delle stagioni toccate e i totali di
+    carriera dei piloti e costruttori coinvolti, solo dove i risultati li coprono (records: risultati
+    scritti, vecchi e nuovi)"""
+    if selected_file != RESULTS_FILE:
+        return
+    with trace.span("classifiche e totali"):
+        try:
+            changes = refresh_for_results(records)
+            careers = refresh_careers_for_results(records)
+        except (WriteConflict, OSError) as e:
+            st.warning(f"Classifiche e totali non aggiornati: {e}")
+            return
+    skipped = [reason for counts in changes.values() for reason in counts["skipped"]]
+    if skipped:
+        st.info("Classifiche non ricalcolate, risultati incompleti: " + " · ".join(skipped))
+    uncovered = [value for result in careers.values() for value in result["uncovered"]]
+    if uncovered:
+        st.info("Totali di carriera non aggiornati, risultati incompleti: " + ", ".join(map(str, uncovered)))
+
+
+def reference_errors(record):
+    """Chiavi esterne del record senza record di riferimento (es. driverId inesistente), "" se tutte valide"""
+    _, violations = ReferenceChecker(selected_file).split([record])
+    return "; ".join(f"{column}: {message}" for column, message in violations[0]["errors"].items()) if violations else ""
 
 # Layout principale
 tab1, tab2, tab3, tab4 = st.tabs(["Visualizza", "Aggiungi singolo", "Aggiungi multipli", "Modifica"])
 
-with tab1:
+with tab1, trace.span("Visualizza"):
     st.header(f"📊 Visualizza {file_type}")
     
     if data:
-        # Converti in DataFrame per una visualizzazione migliore
-        df = pd.DataFrame(data)
+        # DataFrame per una visualizzazione migliore (dal sidecar colonnare se disponibile)
+        with trace.span("dataframe"):
+            df = load_dataframe(selected_file)
+        
+        # Vista materializzata: nomi di gare, circuiti, piloti e costruttori accanto agli id
+        if has_view(selected_file) and st.toggle("Mostra nomi di gare, piloti e costruttori", value=True):
+            with trace.span("vista"):
+                df = load_view(selected_file)
         
         # Mostra statistiche
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.metric("Numero record", len(data))
+        with trace.span("metriche"):
+            # Statistiche mantenute in modo incrementale dalle scritture: nessun ricalcolo
+            dataset_stats = load_stats(selected_file)
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Numero record", dataset_stats.rows)
+            
+            with col2:
+                if file_type == "Piloti":
+                    st.metric("Piloti attivi", dataset_stats.missing('dateOfDeath'))
+                elif file_type == "Costruttori":
+                    st.metric("Costruttori", dataset_stats.rows)
+                elif file_type == "Gare":
+                    st.metric("Stagioni", dataset_stats.distinct('year'))
+                elif file_type == "Classifica Costruttori":
+                    st.metric("Costruttori", dataset_stats.distinct('constructorId'))
+                else:
+                    st.metric("Gare registrate", dataset_stats.distinct('raceId'))
+            
+            with col3:
+                if file_type == "Gare":
+                    st.metric("Circuiti", dataset_stats.distinct('circuitId'))
+                elif file_type == "Risultati Gare":
+                    st.metric("Piloti", dataset_stats.distinct('driverId'))
+                elif file_type == "Classifica Costruttori":
+                    st.metric("Gare", dataset_stats.distinct('raceId'))
         
-        with col2:
-            if file_type == "Piloti":
-                st.metric("Piloti attivi", len([d for d in data if not d.get('dateOfDeath')]))
-            elif file_type == "Costruttori":
-                st.metric("Costruttori", len(data))
-            elif file_type == "Gare":
-                st.metric("Stagioni", df['year'].nunique())
-            elif file_type == "Classifica Costruttori":
-                st.metric("Costruttori", df['constructorId'].nunique())
-            else:
-                st.metric("Gare registrate", df['raceId'].nunique())
+        # Filtri: le colonne categoriali usano gli indici secondari del dataset,
+        # le posizioni candidate vengono ristrette per intersezione
+        with trace.span("indici"):
+            index = load_index(selected_file)
+        positions = None  # None = tutte le righe
         
-        with col3:
-            if file_type == "Gare":
-                st.metric("Circuiti", df['circuitId'].nunique())
-            elif file_type == "Risultati Gare":
-                st.metric("Piloti", df['driverId'].nunique())
-            elif file_type == "Classifica Costruttori":
-                st.metric("Gare", df['raceId'].nunique())
+        def index_selectbox(label, column, positions):
+            """Selectbox sui valori distinti di una colonna indicizzata; restituisce le posizioni filtrate"""
+            values = index.distinct_values(column, positions)
+            selected_value = st.selectbox(label, ["Tutti"] + list(values))
+            if selected_value != "Tutti":
+                positions = index.filter(column, selected_value, positions)
+            return positions
         
-        # Filtri
         st.subheader("Filtri")
         col1, col2 = st.columns(2)
         
         with col1:
+            # Ricerca sull'indice di trigrammi: senza accenti e tollerante agli errori di battitura
             if 'name' in df.columns:
                 search_name = st.text_input("Cerca per nome")
-                if search_name:
-                    df = df[df['name'].str.contains(search_name, case=False, na=False)]
             elif 'officialName' in df.columns:
                 search_name = st.text_input("Cerca per nome gara")
-                if search_name:
-                    df = df[df['officialName'].str.contains(search_name, case=False, na=False)]
-            elif 'constructorId' in df.columns and file_type == "Classifica Costruttori":
-                search_constructor = st.text_input("Cerca costruttore")
-                if search_constructor:
-                    df = df[df['constructorId'].str.contains(search_constructor, case=False, na=False)]
+            elif file_type == "Classifica Costruttori":
+                search_name = st.text_input("Cerca costruttore")
+            else:
+                search_name = st.text_input("Cerca per id (gara, pilota, costruttore)")
+            search_ranking = None
+            if search_name:
+                with trace.span("ricerca"):
+                    search_ranking = np.asarray(load_trigram_index(selected_file).search(search_name), dtype=np.intp)
+                positions = np.sort(search_ranking)
         
         with col2:
-            if 'year' in df.columns:
-                years = sorted(df['year'].unique())
-                selected_year = st.selectbox("Filtra per anno", ["Tutti"] + list(years))
-                if selected_year != "Tutti":
-                    df = df[df['year'] == selected_year]
+            if 'year' in index:
+                positions = index_selectbox("Filtra per anno", 'year', positions)
         
         # Filtri aggiuntivi
         if file_type == "Gare":
             col3, col4 = st.columns(2)
             with col3:
-                if 'circuitId' in df.columns:
-                    circuits = sorted(df['circuitId'].unique())
-                    selected_circuit = st.selectbox("Filtra per circuito", ["Tutti"] + list(circuits))
-                    if selected_circuit != "Tutti":
-                        df = df[df['circuitId'] == selected_circuit]
+                if 'circuitId' in index:
+                    positions = index_selectbox("Filtra per circuito", 'circuitId', positions)
             
             with col4:
-                if 'grandPrixId' in df.columns:
-                    grand_prix = sorted(df['grandPrixId'].unique())
-                    selected_gp = st.selectbox("Filtra per Gran Premio", ["Tutti"] + list(grand_prix))
-                    if selected_gp != "Tutti":
-                        df = df[df['grandPrixId'] == selected_gp]
+                if 'grandPrixId' in index:
+                    positions = index_selectbox("Filtra per Gran Premio", 'grandPrixId', positions)
         
         elif file_type == "Classifica Costruttori":
             col3, col4 = st.columns(2)
             with col3:
-                if 'raceId' in df.columns:
-                    race_ids = sorted(df['raceId'].unique())
-                    selected_race = st.selectbox("Filtra per ID Gara", ["Tutti"] + list(race_ids))
-                    if selected_race != "Tutti":
-                        df = df[df['raceId'] == selected_race]
+                if 'raceId' in index:
+                    positions = index_selectbox("Filtra per ID Gara", 'raceId', positions)
             
             with col4:
-                if 'constructorId' in df.columns:
-                    constructors = sorted(df['constructorId'].unique())
-                    selected_constructor = st.selectbox("Filtra per costruttore", ["Tutti"] + list(constructors))
-                    if selected_constructor != "Tutti":
-                        df = df[df['constructorId'] == selected_constructor]
+                if 'constructorId' in index:
+                    positions = index_selectbox("Filtra per costruttore", 'constructorId', positions)
         
-        # Mostra dati
-        st.dataframe(
-            df,
-            use_container_width=True,
-            hide_index=True
-        )
+        if positions is not None:
+            if search_ranking is not None:
+                # Risultati della ricerca dal più rilevante, dopo gli altri filtri
+                positions = search_ranking[np.isin(search_ranking, positions)]
+            df = df.iloc[positions]
+        
+        # Mostra dati: in vista paginata viene materializzata e inviata al browser
+        # solo la pagina visibile
+        total_rows = len(df)
+        paginated = st.toggle("Vista paginata", value=True)
+        
+        if paginated and total_rows:
+            key_column = 'id' if 'id' in df.columns else ('raceId' if 'raceId' in df.columns else None)
+            
+            pcol1, pcol2, pcol3, pcol4 = st.columns(4)
+            with pcol1:
+                page_size = st.selectbox("Righe per pagina", [25, 50, 100, 250, 500], index=1)
+            with pcol2:
+                sort_column = st.selectbox("Ordina per", ["(nessuno)"] + list(df.columns))
+            with pcol3:
+                descending = st.checkbox("Ordine decrescente")
+            with pcol4:
+                jump_key = st.text_input(f"Vai a {key_column}", disabled=key_column is None)
+            
+            # Ordine delle righe: si ordina solo la colonna scelta, non l'intero DataFrame
+            rows = np.arange(total_rows)
+            if sort_column != "(nessuno)":
+                sort_values = df[sort_column].reset_index(drop=True)
+                try:
+                    rows = sort_values.sort_values(kind='stable', ascending=not descending, na_position='last').index.to_numpy()
+                except TypeError:
+                    rows = sort_values.astype(str).sort_values(kind='stable', ascending=not descending).index.to_numpy()
+            
+            n_pages = max(1, -(-total_rows // page_size))
+            if st.session_state.get("view_page", 1) > n_pages:
+                st.session_state["view_page"] = n_pages
+            
+            # Salta alla pagina che contiene la chiave cercata (solo quando la chiave cambia)
+            if key_column and jump_key and jump_key != st.session_state.get("view_last_jump"):
+                key_value = int(jump_key) if jump_key.lstrip('-').isdigit() else jump_key
+                matches = np.flatnonzero(df[key_column].to_numpy()[rows] == key_value)
+                if len(matches):
+                    st.session_state["view_page"] = int(matches[0]) // page_size + 1
+                else:
+                    st.warning(f"{key_column} '{jump_key}' non trovato")
+            st.session_state["view_last_jump"] = jump_key
+            
+            page = st.number_input("Pagina", min_value=1, max_value=n_pages, step=1, key="view_page")
+            start = (page - 1) * page_size
+            page_rows = rows[start:start + page_size]
+            
+            with trace.span("tabella"):
+                st.dataframe(
+                    df.iloc[page_rows],
+                    use_container_width=True,
+                    hide_index=True
+                )
+            st.caption(f"Righe {start + 1}–{start + len(page_rows)} di {total_rows} (pagina {page} di {n_pages})")
+        else:
+            with trace.span("tabella"):
+                st.dataframe(
+                    df,
+                    use_container_width=True,
+                    hide_index=True
+                )
         
         # Opzione per scaricare i dati
         st.subheader("📥 Download dati")
         col1, col2 = st.columns(2)
         
+        # I file da scaricare vengono generati solo al click, non a ogni rerun
         with col1:
             # Download CSV
-            csv_data = df.to_csv(index=False).encode('utf-8')
             st.download_button(
                 label="💾 Scarica come CSV",
-                data=csv_data,
+                data=partial(dataframe_csv_bytes, df),
                 file_name=f"{selected_file.replace('.json', '')}.csv",
                 mime="text/csv",
                 use_container_width=True,
@@ -357,11 +301,10 @@ with tab1:
             )
         
         with col2:
-            # Download JSON
-            json_data = json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+            # Download JSON: i byte del file su disco, senza ricodifica
             st.download_button(
                 label="📄 Scarica come JSON",
-                data=json_data,
+                data=partial(dataset_json_bytes, selected_file),
                 file_name=selected_file,
                 mime="application/json",
                 use_container_width=True,
@@ -375,7 +318,7 @@ with tab1:
     else:
         st.info("Nessun dato disponibile. Usa la tab 'Aggiungi' per inserire nuovi record.")
 
-with tab2:
+with tab2, trace.span("Aggiungi singolo"):
     st.header(f"➕ Aggiungi nuovo {file_type[:-1].replace('f1db-', '').replace('.json', '')}")
     
     with st.form("add_form"):
@@ -432,46 +375,29 @@ with tab2:
         
         if submitted:
             # Validazione campi obbligatori
-            missing_fields = []
-            for field in schema["fields"]:
-                if field.get("required", False):
-                    field_name = field["name"]
-                    if field_name not in form_data or form_data[field_name] == "":
-                        missing_fields.append(field_name)
+            missing_fields = codec.missing_required(form_data)
             
             if missing_fields:
                 st.error(f"Campi obbligatori mancanti: {', '.join(missing_fields)}")
             else:
-                # Converti date in stringhe
-                for field in schema["fields"]:
-                    if field["type"] == "date":
-                        field_name = field["name"]
-                        if form_data[field_name]:
-                            form_data[field_name] = convert_date_to_string(form_data[field_name])
+                # Converti i valori del form (date, numeri, checkbox) nei tipi del file JSON
+                form_data = codec.encode(form_data)
+                _, conflicts = pk_index.conflicts_for([form_data])
+                orphan_errors = reference_errors(form_data)
                 
-                # Converti numeri al tipo corretto
-                for field in schema["fields"]:
-                    field_name = field["name"]
-                    if field["type"] == "integer" and field_name in form_data:
-                        form_data[field_name] = int(form_data[field_name])
-                    elif field["type"] == "float" and field_name in form_data:
-                        form_data[field_name] = float(form_data[field_name])
-                
-                # Per i campi year, assicurati che siano stringhe (per supportare "2026b")
-                if 'year' in form_data:
-                    form_data['year'] = str(form_data['year'])
-                
-                # Aggiungi nuovo record ai dati
-                data.append(form_data)
-                
-                # Salva nel file
-                if save_json_file(selected_file, data):
+                # Aggiungi nuovo record al journal del dataset
+                if orphan_errors:
+                    st.error(f"Record non salvato: {orphan_errors}")
+                elif conflicts:
+                    st.error(f"Record non salvato: {conflicts[0]['errors']['chiave']}")
+                elif insert_records(selected_file, [form_data]):
+                    sync_from_results([form_data])
                     st.success("Record salvato con successo!")
-                    st.rerun()
+                    rerun()
                 else:
                     st.error("Errore nel salvataggio del record")
 
-with tab3:
+with tab3, trace.span("Aggiungi multipli"):
     st.header(f"📝 Aggiungi più {file_type[:-1].replace('f1db-', '').replace('.json', '')}")
     
     st.markdown("""
@@ -489,7 +415,7 @@ with tab3:
         ```json
         {
             "id": 1173,
-            "year": "2026",
+            "year": 2026,
             "round": 24,
             "date": "2026-12-06",
             "time": "13:00",
@@ -539,7 +465,7 @@ with tab3:
         ```json
         {
             "raceId": 1149,
-            "year": "2025",
+            "year": 2025,
             "round": 24,
             "positionDisplayOrder": 10,
             "positionNumber": 10,
@@ -628,7 +554,7 @@ with tab3:
             elif file_type == "Gare":
                 example = {
                     "id": 1173 + len(data),
-                    "year": "2026",
+                    "year": 2026,
                     "round": len(data) + 1,
                     "date": "2026-01-01",
                     "time": "14:00",
@@ -673,7 +599,7 @@ with tab3:
             elif file_type == "Classifica Costruttori":
                 example = {
                     "raceId": 1149,
-                    "year": "2026",
+                    "year": 2026,
                     "round": 1,
                     "positionDisplayOrder": 1,
                     "positionNumber": 1,
@@ -687,7 +613,7 @@ with tab3:
             else:  # Risultati Gare
                 example = {
                     "raceId": 1150,
-                    "year": "2026",
+                    "year": 2026,
                     "round": 25,
                     "positionDisplayOrder": 1,
                     "positionNumber": 1,
@@ -722,8 +648,8 @@ with tab3:
                     "grandSlam": True
                 }
             
-            st.session_state.example_json = json.dumps(example, indent=2, ensure_ascii=False)
-            st.rerun()
+            st.session_state.example_json = jsonio.dumps(example, pretty=True).decode('utf-8')
+            rerun()
     
     with col2:
         add_records = st.button("➕ Aggiungi record", type="primary", use_container_width=True)
@@ -732,7 +658,7 @@ with tab3:
         if st.button("🔄 Reset", use_container_width=True):
             if 'example_json' in st.session_state:
                 del st.session_state.example_json
-            st.rerun()
+            rerun()
     
     # Usa l'esempio se presente in session_state
     if 'example_json' in st.session_state:
@@ -746,7 +672,7 @@ with tab3:
     if add_records and json_input:
         try:
             # Prova a parsare il JSON
-            new_data = json.loads(json_input)
+            new_data = jsonio.loads(json_input)
             
             # Controlla se è un singolo oggetto o un array
             if isinstance(new_data, dict):
@@ -758,77 +684,115 @@ with tab3:
                 new_records = []
             
             if new_records:
-                # Validazione dei campi obbligatori
-                invalid_records = []
-                valid_records = []
+                # Validazione (presenza, tipo e conversione) con il validatore compilato dallo schema
+                valid_records, valid_indices, invalid_records = get_validator(selected_file, schema).validate(new_records, with_indices=True)
                 
-                for i, record in enumerate(new_records):
-                    missing_fields = []
-                    for field in schema["fields"]:
-                        if field.get("required", False):
-                            field_name = field["name"]
-                            if field_name not in record or record[field_name] == "":
-                                missing_fields.append(field_name)
-                    
-                    if missing_fields:
-                        invalid_records.append({
-                            "index": i,
-                            "record": record,
-                            "missing_fields": missing_fields
-                        })
-                    else:
-                        valid_records.append(record)
+                # Chiavi esterne (piloti, costruttori, gare, circuiti) verificate sugli insiemi di chiavi in cache
+                valid_records, valid_indices, orphans = split_checked(ReferenceChecker(selected_file), valid_records, valid_indices)
+                if orphans:
+                    invalid_records = sorted(invalid_records + orphans, key=lambda invalid: invalid['index'])
+                    st.warning(f"{len(orphans)} record scartati perché citano id inesistenti")
+                
+                # Unicità delle chiavi rispetto al dataset e all'interno del batch
+                valid_records, key_conflicts = pk_index.conflicts_for(valid_records, valid_indices)
+                if key_conflicts:
+                    invalid_records = sorted(invalid_records + key_conflicts, key=lambda invalid: invalid['index'])
+                    st.warning(f"{len(key_conflicts)} record scartati per chiave ({', '.join(schema['primary_key'])}) già presente o duplicata")
                 
                 if invalid_records:
-                    st.error(f"{len(invalid_records)} record hanno campi obbligatori mancanti:")
-                    for invalid in invalid_records:
-                        st.write(f"Record {invalid['index']}: Mancano {', '.join(invalid['missing_fields'])}")
+                    st.error(f"{len(invalid_records)} record non validi:")
+                    st.dataframe(
+                        pd.DataFrame([
+                            {
+                                "Record": invalid['index'],
+                                "Campi mancanti": ', '.join(invalid['missing_fields']),
+                                "Errori": '; '.join(f"{k}: {v}" for k, v in invalid['errors'].items())
+                            }
+                            for invalid in invalid_records
+                        ]),
+                        use_container_width=True,
+                        hide_index=True
+                    )
                 
                 if valid_records:
                     # Aggiungi i record validi
                     old_count = len(data)
-                    data.extend(valid_records)
                     
                     # Salva nel file
-                    if save_json_file(selected_file, data):
-                        st.success(f"Aggiunti {len(valid_records)} nuovi record! Totale: {old_count} → {len(data)}")
+                    if insert_records(selected_file, valid_records):
+                        sync_from_results(valid_records)
+                        st.success(f"Aggiunti {len(valid_records)} nuovi record! Totale: {old_count} → {old_count + len(valid_records)}")
                         
                         # Mostra anteprima dei record aggiunti
                         with st.expander("Anteprima dei record aggiunti"):
                             df_new = pd.DataFrame(valid_records)
                             st.dataframe(df_new, use_container_width=True)
                         
-                        st.rerun()
+                        rerun()
         
-        except json.JSONDecodeError as e:
+        except jsonio.DecodeError as e:
             st.error(f"Errore nel parsing JSON: {str(e)}")
         except Exception as e:
             st.error(f"Errore: {str(e)}")
 
-with tab4:
+with tab4, trace.span("Modifica"):
     st.header(f"✏️ Modifica {file_type}")
     
     if data:
-        # Seleziona record da modificare
-        if file_type == "Piloti":
-            options = {f"{d.get('name', '')} ({d.get('id', '')})": idx for idx, d in enumerate(data)}
-        elif file_type == "Costruttori":
-            options = {f"{d.get('name', '')} ({d.get('id', '')})": idx for idx, d in enumerate(data)}
-        elif file_type == "Gare":
-            options = {f"{d.get('officialName', '')} (Round {d.get('round', '')})": idx for idx, d in enumerate(data)}
-        elif file_type == "Classifica Costruttori":
-            options = {f"Race {d.get('raceId', '')} - {d.get('constructorId', '')} (Pos {d.get('positionNumber', '')})": idx for idx, d in enumerate(data)}
-        else:
-            options = {f"Race {d.get('raceId', '')} - Driver {d.get('driverId', '')}": idx for idx, d in enumerate(data)}
+        # Seleziona record da modificare: la ricerca interroga l'indice di chiave
+        # primaria lato server e al browser arrivano solo i primi risultati
+        duplicate_keys = pk_index.duplicates()
+        if duplicate_keys:
+            st.warning(f"{len(duplicate_keys)} chiavi ({', '.join(schema['primary_key'])}) duplicate nel file")
         
-        selected_key = st.selectbox(
+        search_query = st.text_input("Cerca record (chiave o nome)", key="edit_search")
+        matches = pk_index.search(search_query, limit=50)
+        
+        selected_idx = st.selectbox(
             "Seleziona record da modificare",
-            options=list(options.keys())
+            options=matches,
+            format_func=lambda idx: pk_index.labels[idx]
         )
+        if search_query and not matches:
+            st.info("Nessun record trovato")
         
-        if selected_key:
-            record_idx = options[selected_key]
-            record = copy.deepcopy(data[record_idx])
+        if selected_idx is not None:
+            record_idx = selected_idx
+            # Il salvataggio è verificato sulla versione del record mostrata nel form
+            # al rerun precedente: se un altro utente l'ha modificata nel frattempo
+            # la scrittura viene rifiutata invece di sovrascriverla
+            snapshot_key = (selected_file, record_idx)
+            previous_snapshot = st.session_state.get("edit_snapshot")
+            if previous_snapshot and previous_snapshot[0] == snapshot_key:
+                expected_record = previous_snapshot[1]
+            else:
+                expected_record = data[record_idx]
+            st.session_state.edit_snapshot = (snapshot_key, data[record_idx])
+            
+            # Valori nei tipi usati dai widget (es. date come oggetti date)
+            record = codec.decode(copy.deepcopy(data[record_idx]))
+            
+            # Totali di carriera confrontati con quelli calcolati dai risultati gara
+            if selected_file in CAREERS and dataset_exists(RESULTS_FILE):
+                record_id = data[record_idx].get("id")
+                with trace.span("totali carriera"):
+                    computed = compute_careers(selected_file, [record_id])[record_id]
+                    covered = record_id not in uncovered_ids(selected_file, [record_id])
+                differences = {field: value for field, value in computed.items() if data[record_idx].get(field) != value}
+                if differences and not covered:
+                    st.caption("Totali di carriera non verificabili: i risultati gara non coprono tutte le sue stagioni")
+                elif differences:
+                    st.info("Totali diversi da quelli calcolati dai risultati: " + ", ".join(
+                        f"{field} {data[record_idx].get(field)} → {value}" for field, value in differences.items()
+                    ))
+                    if st.button("Applica i totali calcolati"):
+                        try:
+                            update_record(selected_file, record_idx, {**data[record_idx], **differences}, expected=expected_record)
+                        except WriteConflict as e:
+                            st.error(f"Totali non aggiornati: {e}")
+                        else:
+                            st.success("Totali aggiornati dai risultati gara!")
+                            rerun()
             
             with st.form("edit_form"):
                 # Crea campi del form con i valori esistenti
@@ -843,14 +807,7 @@ with tab4:
                         required = field.get("required", False)
                         
                         label = f"{field_name}{' *' if required else ''}"
-                        current_value = record.get(field_name, "")
-                        
-                        # Converti stringhe date in oggetti date per il form
-                        if field_type == "date" and current_value:
-                            try:
-                                current_value = convert_string_to_date(current_value)
-                            except:
-                                current_value = None
+                        current_value = record.get(field_name)
                         
                         if field_type == "text":
                             edit_data[field_name] = st.text_input(
@@ -915,65 +872,62 @@ with tab4:
                 
                 if update_clicked:
                     # Validazione
-                    missing_fields = []
-                    for field in schema["fields"]:
-                        if field.get("required", False):
-                            field_name = field["name"]
-                            if field_name not in edit_data or edit_data[field_name] == "":
-                                missing_fields.append(field_name)
+                    missing_fields = codec.missing_required(edit_data)
                     
                     if missing_fields:
                         st.error(f"Campi obbligatori mancanti: {', '.join(missing_fields)}")
                     else:
-                        # Converti date in stringhe
-                        for field in schema["fields"]:
-                            if field["type"] == "date":
-                                field_name = field["name"]
-                                edit_data[field_name] = convert_date_to_string(edit_data[field_name])
-                        
-                        # Converti numeri al tipo corretto
-                        for field in schema["fields"]:
-                            field_name = field["name"]
-                            if field["type"] == "integer" and field_name in edit_data:
-                                edit_data[field_name] = int(edit_data[field_name])
-                            elif field["type"] == "float" and field_name in edit_data:
-                                edit_data[field_name] = float(edit_data[field_name])
-                        
-                        # Per i campi year, assicurati che siano stringhe
-                        if 'year' in edit_data:
-                            edit_data['year'] = str(edit_data['year'])
+                        # Campi senza tipo nello schema (es. liste annidate dei file scoperti) restano invariati
+                        edit_data.update({k: v for k, v in data[record_idx].items() if k not in edit_data})
+                        # Converti i valori del form nei tipi del file JSON
+                        edit_data = codec.encode(edit_data)
+                        _, conflicts = pk_index.conflicts_for([edit_data], exclude_position=record_idx)
+                        orphan_errors = reference_errors(edit_data)
                         
                         # Aggiorna record
-                        data[record_idx] = edit_data
-                        
-                        if save_json_file(selected_file, data):
-                            st.success("Record aggiornato con successo!")
-                            st.rerun()
+                        if orphan_errors:
+                            st.error(f"Record non aggiornato: {orphan_errors}")
+                        elif conflicts:
+                            st.error(f"Record non aggiornato: {conflicts[0]['errors']['chiave']}")
+                        else:
+                            try:
+                                update_record(selected_file, record_idx, edit_data, expected=expected_record)
+                            except WriteConflict as e:
+                                st.error(f"Record non aggiornato: {e}. Controlla i valori attuali e riprova.")
+                            else:
+                                sync_from_results([expected_record, edit_data])
+                                st.success("Record aggiornato con successo!")
+                                rerun()
                 
                 if delete_clicked:
                     # Rimuovi record
-                    deleted_record = data.pop(record_idx)
+                    deleted_record = data[record_idx]
                     
-                    if save_json_file(selected_file, data):
+                    try:
+                        delete_record(selected_file, record_idx, expected=expected_record)
+                    except WriteConflict as e:
+                        st.error(f"Record non eliminato: {e}")
+                    else:
+                        sync_from_results([expected_record])
                         st.success("Record eliminato con successo!")
                         with st.expander("Record eliminato"):
                             st.json(deleted_record)
-                        st.rerun()
+                        rerun()
                 
                 if duplicate_clicked:
-                    # Duplica il record
-                    duplicated_record = copy.deepcopy(record)
+                    # Duplica il record (quello salvato, non la versione convertita per il form)
+                    duplicated_record = copy.deepcopy(data[record_idx])
                     
                     # Modifica l'ID per evitare duplicati
                     if file_type == "Gare":
-                        # Per le gare, incrementa l'ID
-                        max_id = max([d.get('id', 0) for d in data])
-                        duplicated_record['id'] = max_id + 1
+                        # Per le gare, nuovo ID dalla sequenza dell'indice di chiave
+                        duplicated_record['id'] = pk_index.allocate_id()
                     elif file_type == "Classifica Costruttori":
-                        # Per le classifiche, modifica raceId o round
+                        # Per le classifiche, passa alla gara successiva
+                        duplicated_record['raceId'] = duplicated_record.get('raceId', 0) + 1
                         duplicated_record['round'] = duplicated_record.get('round', 0) + 1
                     elif 'id' in duplicated_record:
-                        duplicated_record['id'] = f"{duplicated_record['id']}-copy-{len(data)}"
+                        duplicated_record['id'] = pk_index.unique_slug(f"{duplicated_record['id']}-copy")
                     
                     if 'officialName' in duplicated_record:
                         duplicated_record['officialName'] = f"{duplicated_record['officialName']} (Copia)"
@@ -981,11 +935,16 @@ with tab4:
                         duplicated_record['name'] = f"{duplicated_record['name']} (Copia)"
                     
                     # Aggiungi alla lista
-                    data.append(duplicated_record)
-                    
-                    if save_json_file(selected_file, data):
+                    _, conflicts = pk_index.conflicts_for([duplicated_record])
+                    orphan_errors = reference_errors(duplicated_record)
+                    if orphan_errors:
+                        st.error(f"Record non duplicato: {orphan_errors}")
+                    elif conflicts:
+                        st.error(f"Record non duplicato: {conflicts[0]['errors']['chiave']}")
+                    elif insert_records(selected_file, [duplicated_record]):
+                        sync_from_results([duplicated_record])
                         st.success("Record duplicato con successo!")
-                        st.rerun()
+                        rerun()
     else:
         st.info("Nessun dato disponibile da modificare.")
 
@@ -1012,26 +971,13 @@ col1, col2 = st.sidebar.columns(2)
 
 with col1:
     if st.button("💾 CSV Completo", use_container_width=True):
-        # Crea un file ZIP con tutti i CSV
-        import zipfile
-        import io
-        
-        zip_buffer = io.BytesIO()
-        with zipfile.ZipFile(zip_buffer, 'w') as zip_file:
-            for filename in FILE_MAPPING.values():
-                filepath = os.path.join(DATA_DIR, filename)
-                if os.path.exists(filepath):
-                    data = load_json_file(filename)
-                    if data:
-                        df = pd.DataFrame(data)
-                        csv_data = df.to_csv(index=False).encode('utf-8')
-                        zip_file.writestr(f"{filename.replace('.json', '')}.csv", csv_data)
-        
-        zip_buffer.seek(0)
+        # Crea un file ZIP con tutti i CSV (dalla cache se nessun dataset è cambiato)
+        zip_data, rebuilt = export_bundle(datasets.values(), "csv")
+        st.sidebar.caption(f"CSV rigenerati: {len(rebuilt)}")
         
         st.sidebar.download_button(
             label="Scarica ZIP CSV",
-            data=zip_buffer,
+            data=zip_data,
             file_name="f1db_data_csv.zip",
             mime="application/zip",
             use_container_width=True
@@ -1039,24 +985,13 @@ with col1:
 
 with col2:
     if st.button("📄 JSON Completo", use_container_width=True):
-        # Crea un file ZIP con tutti i JSON
-        import zipfile
-        import io
-        
-        zip_buffer = io.BytesIO()
-        with zipfile.ZipFile(zip_buffer, 'w') as zip_file:
-            for filename in FILE_MAPPING.values():
-                filepath = os.path.join(DATA_DIR, filename)
-                if os.path.exists(filepath):
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        json_data = f.read()
-                        zip_file.writestr(filename, json_data)
-        
-        zip_buffer.seek(0)
+        # Crea un file ZIP con tutti i JSON (dalla cache se nessun dataset è cambiato)
+        zip_data, rebuilt = export_bundle(datasets.values(), "json")
+        st.sidebar.caption(f"JSON rigenerati: {len(rebuilt)}")
         
         st.sidebar.download_button(
             label="Scarica ZIP JSON",
-            data=zip_buffer,
+            data=zip_data,
             file_name="f1db_data_json.zip",
             mime="application/zip",
             use_container_width=True
@@ -1068,23 +1003,28 @@ st.sidebar.subheader("📄 Download singolo")
 
 selected_download = st.sidebar.selectbox(
     "Seleziona file da scaricare",
-    ["Piloti", "Costruttori", "Gare", "Risultati Gare", "Classifica Costruttori"]
+    list(datasets)
 )
 
-download_file = FILE_MAPPING[selected_download]
-download_data = load_json_file(download_file)
+download_file = datasets[selected_download]
 
-if download_data:
-    json_str = json.dumps(download_data, indent=2, ensure_ascii=False).encode('utf-8')
-    
+# Il file viene letto da disco solo al click sul download
+if dataset_exists(download_file):
     st.sidebar.download_button(
         label=f"Scarica {selected_download}.json",
-        data=json_str,
+        data=partial(dataset_json_bytes, download_file),
         file_name=download_file,
         mime="application/json",
         use_container_width=True
     )
 
+# Statistiche della cache dei dataset
+cache_stats = get_cache_stats()
+st.sidebar.caption(
+    f"Cache dataset: {cache_stats['hits']} hit / {cache_stats['misses']} miss "
+    f"({cache_stats['hit_rate']:.0%}), {cache_stats['entries']} file in memoria"
+)
+
 # Bottone per upload file JSON
 st.sidebar.markdown("---")
 uploaded_file = st.sidebar.file_uploader(
@@ -1094,27 +1034,55 @@ uploaded_file = st.sidebar.file_uploader(
 )
 
 if uploaded_file is not None:
-    try:
-        new_data = json.load(uploaded_file)
-        if st.sidebar.button(f"Sostituisci {file_type} con file caricato", type="primary", use_container_width=True):
-            # Sostituisci i dati
-            data = new_data if isinstance(new_data, list) else [new_data]
-            if save_json_file(selected_file, data):
-                st.sidebar.success(f"Dati di {file_type} aggiornati dal file!")
-                st.rerun()
-    except Exception as e:
-        st.sidebar.error(f"Errore nel caricamento del file: {str(e)}")
+    st.sidebar.caption(f"{uploaded_file.name}: {uploaded_file.size / 1024 / 1024:.1f} MB")
+    if st.sidebar.button(f"Sostituisci {file_type} con file caricato", type="primary", use_container_width=True):
+        # Import in streaming: parsing incrementale e validazione a blocchi,
+        # i record validi vengono scritti direttamente nel file di destinazione
+        progress_bar = st.sidebar.progress(0.0, text="Import in corso...")
+        
+        def show_progress(job):
+            fraction = min(job.bytes_read / uploaded_file.size, 1.0) if uploaded_file.size else 1.0
+            progress_bar.progress(
+                fraction,
+                text=f"{job.rows_read:,} record letti ({job.rows_per_second:,.0f} record/s)"
+            )
+        
+        uploaded_file.seek(0)
+        job = StreamImport(
+            uploaded_file,
+            get_validator(selected_file, schema),
+            key_checker=KeyConflictChecker(pk_index.key_of),
+            on_progress=show_progress,
+            reference_checker=ReferenceChecker(selected_file)
+        )
+        try:
+            written = save_json_records(selected_file, job.records())
+        except StreamParseError as e:
+            st.sidebar.error(f"File JSON non valido (dati non modificati): {str(e)}")
+        except Exception as e:
+            st.sidebar.error(f"Errore nel caricamento del file: {str(e)}")
+        else:
+            progress_bar.progress(1.0, text=f"{job.rows_read:,} record letti ({job.rows_per_second:,.0f} record/s)")
+            if job.rows_invalid:
+                st.sidebar.warning(f"{job.rows_invalid} record non validi scartati")
+                with st.sidebar.expander("Record scartati"):
+                    for invalid in job.invalid_records:
+                        problems = invalid['missing_fields'] + [f"{k}: {v}" for k, v in invalid['errors'].items()]
+                        st.write(f"Record {invalid['index']}: {'; '.join(problems)}")
+            if written:
+                st.sidebar.success(f"Dati di {file_type} aggiornati dal file! ({written} record)")
+                if not job.rows_invalid:
+                    rerun()
+            else:
+                st.sidebar.error("Nessun record valido nel file: dati non modificati")
 
 # Esporta singolo record come JSON
 st.sidebar.markdown("---")
 st.sidebar.subheader("🔖 Esporta record")
 
 if data and st.sidebar.button("Esporta record selezionato", use_container_width=True):
-    if 'selected_key' in locals() and selected_key:
-        record_idx = options[selected_key]
-        record = data[record_idx]
-        
-        json_record = json.dumps(record, indent=2, ensure_ascii=False).encode('utf-8')
+    if 'selected_idx' in locals() and selected_idx is not None:
+        record = data[selected_idx]
         
         if file_type == "Gare":
             record_name = record.get('grandPrixId', record.get('officialName', 'race'))
@@ -1129,8 +1097,22 @@ if data and st.sidebar.button("Esporta record selezionato", use_container_width=
         
         st.sidebar.download_button(
             label=f"Scarica {record_name}.json",
-            data=json_record,
+            data=lambda record=record: jsonio.dumps(record, pretty=True),
             file_name=f"{record_name}.json",
             mime="application/json",
             use_container_width=True
-        )
\ No newline at end of file
+        )
+
+# Pannello debug: tempi delle fasi di questa esecuzione (già registrata nel log)
+st.sidebar.markdown("---")
+show_trace = st.sidebar.toggle("⏱️ Debug prestazioni", key="trace_panel")
+rerun_trace = trace.finish()
+if show_trace:
+    st.sidebar.caption(
+        f"Esecuzione: {rerun_trace['total_ms']:.0f} ms · {rerun_trace['rows']} record · sessione {rerun_trace['session_id'][:8]}"
+    )
+    st.sidebar.dataframe(
+        pd.DataFrame(rerun_trace["spans"], columns=["name", "start_ms", "ms"]),
+        use_container_width=True,
+        hide_index=True
+    )
@@ -0,0 +1,342 @@
+import argparse
+import calendar
+import glob
+import io
+import json
+import os
+import platform
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import jsonio
+import storage
+import export
+from export import export_bundle
+from fulltext import load_trigram_index
+from indexes import INDEX_COLUMNS
+from keys import KeyConflictChecker, load_primary_index
+from registry import dataset_labels, get_schema
+from storage import (
+    DATA_DIR, compact_dataset, load_dataframe, load_index, load_json_file,
+    save_json_records, update_record
+)
+from streaming import StreamImport
+from validation import get_validator
+
+# File scalati dal generatore sintetico: le copie ricevono raceId/id e anni traslati
+SCALED_FILES = (
+    "f1db-races.json",
+    "f1db-races-race-results.json",
+    "f1db-races-constructor-standings.json",
+    "f1db-races-driver-standings.json",
+)
+
+# Query della ricerca per nome/id (con un errore di battitura, come nella tab Visualizza)
+SEARCH_QUERY = "hamiltn"
+
+_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+# --- Generatore sintetico ---------------------------------------------------
+
+def _shift_date(value, years):
+    year = int(value[:4]) + years
+    month_day = value[4:]
+    # Il 29 febbraio esiste solo negli anni bisestili
+    if month_day == "-02-29" and not calendar.isleap(year):
+        month_day = "-02-28"
+    return f"{year:04d}{month_day}"
+
+
+def _scaled_copy(record, copy, race_offset, year_offset):
+    """Copia di un record spostata di copy * offset su raceId/id e anni, con le date coerenti"""
+    result = dict(record)
+    if "raceId" in result:
+        result["raceId"] += copy * race_offset
+    elif type(result.get("id")) is int:
+        result["id"] += copy * race_offset
+    if type(result.get("year")) is int:
+        result["year"] += copy * year_offset
+    for name, value in result.items():
+        if "date" in name.lower() and type(value) is str and _DATE.match(value):
+            result[name] = _shift_date(value, copy * year_offset)
+    # I nomi ufficiali delle gare riportano l'anno
+    if type(result.get("officialName")) is str and "year" in record:
+        result["officialName"] = result["officialName"].replace(str(record["year"]), str(result["year"]), 1)
+    return result
+
+
+def generate_dataset(source_dir, target_dir, factor):
+    """Copia i file JSON di source_dir in target_dir, moltiplicando per factor gare e classifiche.
+
+    Ogni copia k delle gare ha id + k * max(id) e anni + k * (numero di stagioni),
+    e i file collegati usano lo stesso spostamento su raceId e year: le chiavi
+    restano univoche e coerenti tra i file. Piloti, costruttori e circuiti
+    restano invariati. Restituisce il numero di record per file.
+    """
+    os.makedirs(target_dir, exist_ok=True)
+    races = []
+    races_path = os.path.join(source_dir, "f1db-races.json")
+    if os.path.exists(races_path):
+        with open(races_path, 'r', encoding='utf-8') as f:
+            races = json.load(f)
+    race_offset = max((race["id"] for race in races), default=0)
+    years = [race["year"] for race in races]
+    year_offset = max(years) - min(years) + 1 if years else 0
+
+    rows = {}
+    for source in sorted(glob.glob(os.path.join(source_dir, "*.json"))):
+        filename = os.path.basename(source)
+        target = os.path.join(target_dir, filename)
+        if filename not in SCALED_FILES or factor == 1:
+            shutil.copyfile(source, target)
+            continue
+        with open(source, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        scaled = list(data)
+        for copy in range(1, factor):
+            scaled.extend(_scaled_copy(record, copy, race_offset, year_offset) for record in data)
+        with open(target, 'w', encoding='utf-8') as f:
+            json.dump(scaled, f, ensure_ascii=False)
+        rows[filename] = len(scaled)
+    return rows
+
+
+# --- Casi di benchmark ------------------------------------------------------
+
+def _measure(fn, repeat, setup=None):
+    """Tempi (secondi) di repeat esecuzioni di fn; setup viene eseguita prima di ognuna, fuori dalla misura"""
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def _cold():
+    storage.clear_caches()
+
+
+def _frequent_value(index, column):
+    """Valore più frequente della colonna: il caso peggiore per un filtro della tab Visualizza"""
+    return max(index.distinct_values(column), key=lambda value: len(index.filter(column, value)))
+
+
+def dataset_cases(filename):
+    """Casi (nome, funzione, setup) per un dataset"""
+    schema = get_schema(filename)
+    filepath = os.path.join(DATA_DIR, filename)
+
+    def load():
+        load_json_file(filename)
+
+    def build_dataframe():
+        load_dataframe(filename)
+
+    def validate():
+        get_validator(filename, schema).validate(load_json_file(filename))
+
+    def save_one():
+        update_record(filename, 0, load_json_file(filename)[0])
+
+    def upload_replace():
+        with open(filepath, 'rb') as f:
+            content = io.BytesIO(f.read())
+        job = StreamImport(content, get_validator(filename, schema),
+                           key_checker=KeyConflictChecker(load_primary_index(filename, schema).key_of))
+        save_json_records(filename, job.records())
+
+    cases = [
+        ("load_cold", load, _cold),
+        ("load_warm", load, None),
+        ("dataframe_cold", build_dataframe, _cold),
+        ("validate", validate, None),
+        ("save_record", save_one, None),
+        ("upload_replace", upload_replace, None),
+    ]
+
+    # Parsing e serializzazione con ogni backend JSON installato
+    with open(filepath, 'rb') as f:
+        raw = f.read()
+    parsed = jsonio.loads(raw)
+    for backend, (loads, dumps, _) in jsonio.BACKENDS.items():
+        cases.extend([
+            (f"json_loads:{backend}", lambda loads=loads: loads(raw), None),
+            (f"json_dumps_pretty:{backend}", lambda dumps=dumps: dumps(parsed, True), None),
+            (f"json_dumps_compact:{backend}", lambda dumps=dumps: dumps(parsed, False), None),
+        ])
+
+    df = load_dataframe(filename)
+    index = load_index(filename)
+    for column in INDEX_COLUMNS:
+        if column in index:
+            value = _frequent_value(index, column)
+            cases.append((f"filter:{column}", lambda column=column, value=value: df.iloc[index.filter(column, value)], None))
+    name_columns = [c for c in ("name", "fullName", "officialName") if c in df.columns]
+    if name_columns:
+        column = name_columns[0]
+        cases.append((f"search:{column}",
+                      lambda: df.iloc[df[column].astype(str).str.contains("an", case=False, na=False).to_numpy().nonzero()[0]],
+                      None))
+    # Ricerca della tab Visualizza: indice di trigrammi a freddo (costruzione o ripristino) e query
+    cases.extend([
+        ("search_index_cold", lambda: load_trigram_index(filename), _cold),
+        ("search_trigram", lambda: load_trigram_index(filename).search(SEARCH_QUERY), None),
+    ])
+    return cases
+
+
+def global_cases(filenames):
+    def bundle(fmt):
+        return lambda: export_bundle(filenames, fmt)
+
+    return [
+        ("export_zip_csv_cold", bundle("csv"), lambda: (_cold(), export.clear_cache())),
+        ("export_zip_csv_warm", bundle("csv"), None),
+        ("export_zip_json_cold", bundle("json"), lambda: (_cold(), export.clear_cache())),
+        ("export_zip_json_warm", bundle("json"), None),
+    ]
+
+
+def _result(name, dataset, timings):
+    return {
+        "name": name,
+        "dataset": dataset,
+        "repeat": len(timings),
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.fmean(timings),
+    }
+
+
+def benchmark_datasets():
+    """Dataset del registro presenti in DATA_DIR (directory corrente), anche quelli senza schema dichiarato"""
+    return [f for f in dataset_labels().values() if storage.dataset_exists(f)]
+
+
+def run_suite(repeat=5, only=None):
+    """Esegue i casi sui dataset del registro presenti in DATA_DIR (directory corrente)"""
+    filenames = benchmark_datasets()
+    results = []
+    for filename in filenames:
+        storage.clear_caches()
+        for name, fn, setup in dataset_cases(filename):
+            if only and not any(pattern in name for pattern in only):
+                continue
+            results.append(_result(name, filename, _measure(fn, repeat, setup)))
+        compact_dataset(filename)
+    for name, fn, setup in global_cases(filenames):
+        if only and not any(pattern in name for pattern in only):
+            continue
+        results.append(_result(name, None, _measure(fn, repeat, setup)))
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Casi più lenti del baseline oltre la tolleranza (confronto sulle mediane)"""
+    previous = {(r["name"], r["dataset"]): r for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        before = previous.get((result["name"], result["dataset"]))
+        if before and before["median"] > 0 and result["median"] > before["median"] * (1 + tolerance):
+            regressions.append({
+                "name": result["name"],
+                "dataset": result["dataset"],
+                "baseline": before["median"],
+                "median": result["median"],
+                "ratio": result["median"] / before["median"],
+            })
+    return regressions
+
+
+def cmd_run(args):
+    source_dir = os.path.abspath(args.data_dir)
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="f1db-bench-") as workdir:
+        # I casi di scrittura modificano i file: si lavora su una copia
+        rows = generate_dataset(source_dir, os.path.join(workdir, DATA_DIR), args.scale)
+        os.chdir(workdir)
+        try:
+            results = run_suite(args.repeat, args.case)
+            sizes = {
+                filename: os.path.getsize(os.path.join(DATA_DIR, filename))
+                for filename in benchmark_datasets() if os.path.exists(os.path.join(DATA_DIR, filename))
+            }
+        finally:
+            storage.clear_caches()
+            export.clear_cache()
+            os.chdir(cwd)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "scale": args.scale,
+            "repeat": args.repeat,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "json_backend": jsonio.BACKEND,
+            "storage_backend": storage.STORAGE_BACKEND,
+            "scaled_rows": rows,
+            "bytes": sizes,
+        },
+        "results": results,
+    }
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            report["regressions"] = compare(results, json.load(f), args.tolerance)
+        exit_code = 1 if report["regressions"] else 0
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    else:
+        print(output)
+    return exit_code
+
+
+def cmd_generate(args):
+    rows = generate_dataset(os.path.abspath(args.data_dir), args.target, args.scale)
+    print(json.dumps(rows, indent=2))
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="benchmark.py", description="Benchmark dei dataset f1db")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("run", help="Esegue i benchmark su una copia (eventualmente scalata) dei dati")
+    p.add_argument("--data-dir", default=DATA_DIR, help="directory dei file JSON di partenza")
+    p.add_argument("--scale", type=int, default=1, help="fattore di moltiplicazione di gare e classifiche (es. 10, 100)")
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--case", action="append", help="esegue solo i casi che contengono questo testo (ripetibile)")
+    p.add_argument("--baseline", help="report JSON precedente con cui confrontare le mediane")
+    p.add_argument("--tolerance", type=float, default=0.2, help="rallentamento ammesso rispetto al baseline (0.2 = +20%%)")
+    p.add_argument("-o", "--output", help="file del report JSON (default: stdout)")
+    p.set_defaults(func=cmd_run)
+
+    p = commands.add_parser("generate", help="Genera una copia scalata della directory dati")
+    p.add_argument("target", help="directory di destinazione")
+    p.add_argument("--data-dir", default=DATA_DIR, help="directory dei file JSON di partenza")
+    p.add_argument("--scale", type=int, default=10)
+    p.set_defaults(func=cmd_generate)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
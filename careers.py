@@ -0,0 +1,228 @@
+import numpy as np
+import pandas as pd
+
+from keys import load_primary_index
+from registry import get_schema
+from standings import RACES_FILE, RESULTS_FILE, json_number
+from storage import dataset_exists, load_dataframe, load_index, load_json_file, upsert_records
+
+# Totali di carriera per dataset: colonna dei risultati che identifica il pilota/costruttore e classifica
+CAREERS = {
+    "f1db-drivers.json": {"entity": "driverId", "standings": "f1db-races-driver-standings.json"},
+    "f1db-constructors.json": {"entity": "constructorId", "standings": "f1db-races-constructor-standings.json"},
+}
+
+# positionText dei risultati che non contano come partenza
+NON_STARTS = ("DNQ", "DNPQ", "DNS", "EX")
+
+# Migliori piazzamenti: None (e non 0) per chi non ne ha
+_BEST_FIELDS = ("bestChampionshipPosition", "bestStartingGridPosition", "bestRaceResult")
+
+
+def _column(df, name, default=np.nan):
+    if name in df.columns:
+        return df[name]
+    return pd.Series(default, index=df.index)
+
+
+def _flag(df, name):
+    return _column(df, name, False).fillna(False).astype(bool)
+
+
+def _rows(filename, column, ids):
+    """Righe di un dataset con column in ids (tutte se ids è None), dalle posting list dell'indice"""
+    df = load_dataframe(filename)
+    if ids is None:
+        return df
+    index = load_index(filename)
+    if column not in index:
+        return df[df[column].isin(ids)] if column in df.columns else df.iloc[:0]
+    positions = [index.filter(column, value) for value in ids]
+    return df.iloc[np.unique(np.concatenate(positions)) if positions else []]
+
+
+def _race_totals(results, entity):
+    """Totali dai risultati gara, per gara e poi per pilota/costruttore (group-by vettoriali)"""
+    position = pd.to_numeric(_column(results, 'positionNumber'), errors='coerce')
+    races = pd.DataFrame({
+        'entity': results[entity],
+        'raceId': results['raceId'],
+        'start': ~_column(results, 'positionText', '').isin(NON_STARTS),
+        'win': position == 1,
+        'second': position == 2,
+        'podium': position <= 3,
+        'laps': pd.to_numeric(_column(results, 'laps'), errors='coerce').fillna(0),
+        'points': pd.to_numeric(_column(results, 'points'), errors='coerce').fillna(0),
+        'pole': _flag(results, 'polePosition'),
+        'fastest': _flag(results, 'fastestLap'),
+        'driverOfTheDay': _flag(results, 'driverOfTheDay'),
+        'grandSlam': _flag(results, 'grandSlam'),
+        'grid': pd.to_numeric(_column(results, 'gridPositionNumber'), errors='coerce'),
+        'result': position,
+    }).dropna(subset=['entity', 'raceId'])
+    # Un costruttore ha più auto per gara: vittorie, pole e giri veloci contano una volta per gara
+    per_race = races.groupby(['entity', 'raceId']).agg(
+        start=('start', 'any'), win=('win', 'any'), second=('second', 'any'), podiums=('podium', 'sum'),
+        podium_race=('podium', 'any'), laps=('laps', 'sum'), points=('points', 'sum'), pole=('pole', 'any'),
+        fastest=('fastest', 'any'), driverOfTheDay=('driverOfTheDay', 'sum'), grandSlam=('grandSlam', 'sum'),
+        grid=('grid', 'min'), result=('result', 'min'),
+    )
+    per_race['one_two'] = per_race['win'] & per_race['second']
+    totals = per_race.groupby(level='entity').agg(
+        totalRaceEntries=('start', 'size'), totalRaceStarts=('start', 'sum'), totalRaceWins=('win', 'sum'),
+        total1And2Finishes=('one_two', 'sum'), totalRaceLaps=('laps', 'sum'), totalPodiums=('podiums', 'sum'),
+        totalPodiumRaces=('podium_race', 'sum'), totalPoints=('points', 'sum'), totalPolePositions=('pole', 'sum'),
+        totalFastestLaps=('fastest', 'sum'), totalDriverOfTheDay=('driverOfTheDay', 'sum'),
+        totalGrandSlams=('grandSlam', 'sum'), bestStartingGridPosition=('grid', 'min'), bestRaceResult=('result', 'min'),
+    )
+    return totals
+
+
+def _championship_totals(standings, entity):
+    """Totali dalle classifiche all'ultimo round di ogni stagione"""
+    if entity not in standings.columns:
+        return pd.DataFrame(columns=["bestChampionshipPosition", "totalChampionshipWins", "totalChampionshipPoints"])
+    final_round = standings.groupby('year')['round'].transform('max')
+    final = standings[standings['round'] == final_round]
+    # Più motori nella stessa stagione: il costruttore conta una volta
+    seasons = pd.DataFrame({
+        'entity': final[entity],
+        'year': final['year'],
+        'position': pd.to_numeric(final['positionNumber'], errors='coerce'),
+        'points': pd.to_numeric(final['points'], errors='coerce').fillna(0),
+        'won': final['championshipWon'].fillna(False).astype(bool),
+    }).groupby(['entity', 'year']).agg(position=('position', 'min'), points=('points', 'sum'), won=('won', 'any'))
+    return seasons.groupby(level='entity').agg(
+        bestChampionshipPosition=('position', 'min'), totalChampionshipWins=('won', 'sum'),
+        totalChampionshipPoints=('points', 'sum'),
+    )
+
+
+def _covered_years():
+    """Stagioni con i risultati di tutte le gare in calendario fino all'ultimo round con risultati"""
+    played = load_dataframe(RESULTS_FILE)[['year', 'round']].dropna().drop_duplicates().astype(int)
+    last_round = played.groupby('year')['round'].max()
+    if dataset_exists(RACES_FILE):
+        calendar = load_dataframe(RACES_FILE)[['year', 'round']].dropna().drop_duplicates().astype(int)
+    else:
+        # Senza calendario: i round da 1 all'ultimo con risultati
+        calendar = pd.DataFrame(
+            [(year, rnd) for year, last in last_round.items() for rnd in range(1, last + 1)], columns=['year', 'round']
+        )
+    calendar = calendar[calendar['round'] <= calendar['year'].map(last_round)]
+    missing = calendar.merge(played, how='left', indicator=True).query("_merge == 'left_only'")['year']
+    return set(last_round.index.tolist()) - set(missing.tolist())
+
+
+def uncovered_ids(filename, ids=None):
+    """Id la cui carriera non è coperta dai risultati gara: i totali calcolati sarebbero parziali.
+
+    Una carriera è coperta se ogni stagione in cui l'id compare nei risultati
+    o nella classifica salvata ha i risultati di tutte le gare, compresi i
+    suoi; senza alcuna stagione non è verificabile e non è coperta.
+    """
+    config = CAREERS[filename]
+    entity = config["entity"]
+    if ids is None:
+        ids = [record.get("id") for record in load_json_file(filename)]
+    if not dataset_exists(RESULTS_FILE):
+        return set(ids)
+    results = _rows(RESULTS_FILE, entity, ids)[[entity, 'year']].dropna().drop_duplicates()
+    seasons = results.assign(raced=True)
+    if dataset_exists(config["standings"]):
+        standings = _rows(config["standings"], entity, ids)
+        if entity in standings.columns:
+            # Stagioni in classifica senza risultati dell'id: i suoi risultati mancano
+            seasons = standings[[entity, 'year']].dropna().drop_duplicates().merge(seasons, how='outer')
+    seasons['covered'] = seasons['year'].isin(_covered_years()) & seasons['raced'].eq(True)
+    complete = seasons.groupby(entity)['covered'].all()
+    return {value for value in dict.fromkeys(ids) if not complete.get(value, False)}
+
+
+def compute_careers(filename, ids=None):
+    """Totali di carriera calcolati dai risultati gara e dalle classifiche, uno per id (tutti se ids è None).
+
+    Restituisce {id: {campo: valore}} con i soli campi dello schema del
+    dataset; chi non ha risultati ha totali 0 e migliori piazzamenti None.
+    Le sprint non hanno un dataset: i relativi totali non vengono calcolati.
+    """
+    config = CAREERS[filename]
+    entity = config["entity"]
+    if not dataset_exists(RESULTS_FILE):
+        raise FileNotFoundError(f"{RESULTS_FILE} non trovato: i totali si calcolano dai risultati gara")
+    totals = _race_totals(_rows(RESULTS_FILE, entity, ids), entity)
+    if dataset_exists(config["standings"]):
+        totals = totals.join(_championship_totals(_rows(config["standings"], entity, ids), entity), how='outer')
+
+    fields = [field["name"] for field in get_schema(filename)["fields"] if field["name"] in totals.columns]
+    if ids is None:
+        ids = [record.get("id") for record in load_json_file(filename)]
+    totals = totals.reindex(list(ids))[fields]
+    careers = {}
+    for key, values in zip(totals.index, totals.itertuples(index=False)):
+        careers[key] = {
+            field: (None if pd.isna(value) else int(value)) if field in _BEST_FIELDS
+            else json_number(0 if pd.isna(value) else value)
+            for field, value in zip(fields, values)
+        }
+    return careers
+
+
+def career_report(filename):
+    """Differenze tra i totali salvati nel dataset e quelli calcolati per le carriere coperte dai risultati.
+
+    Restituisce ([{index, id, field, stored, computed}], id non coperti).
+    """
+    data = load_json_file(filename)
+    careers = compute_careers(filename)
+    uncovered = uncovered_ids(filename)
+    differences = []
+    for position, record in enumerate(data):
+        if record.get("id") in uncovered:
+            continue
+        for field, value in careers.get(record.get("id"), {}).items():
+            if record.get(field) != value:
+                differences.append({
+                    "index": position, "id": record.get("id"), "field": field,
+                    "stored": record.get(field), "computed": value,
+                })
+    return differences, sorted(uncovered, key=str)
+
+
+def refresh_careers(filename, ids):
+    """Aggiorna i totali dei soli id indicati con la carriera coperta dai risultati.
+
+    Restituisce {"updated": record modificati, "uncovered": id lasciati invariati perché non coperti}.
+    """
+    ids = [value for value in dict.fromkeys(ids) if value is not None]
+    if not ids or not dataset_exists(filename):
+        return {"updated": 0, "uncovered": []}
+    uncovered = uncovered_ids(filename, ids)
+    ids = [value for value in ids if value not in uncovered]
+    uncovered = sorted(uncovered, key=str)
+    if not ids:
+        return {"updated": 0, "uncovered": uncovered}
+    data = load_json_file(filename)
+    pk_index = load_primary_index(filename, get_schema(filename))
+    updates = []
+    for key, values in compute_careers(filename, ids).items():
+        position = pk_index.position(pk_index.key_of({"id": key}))
+        if position is None:
+            continue
+        record = data[position]
+        if any(record.get(field) != value for field, value in values.items()):
+            updates.append((position, {**record, **values}, record))
+    upsert_records(filename, updates, [])
+    return {"updated": len(updates), "uncovered": uncovered}
+
+
+def refresh_careers_for_results(records):
+    """Aggiorna i totali dei piloti e costruttori presenti nei risultati gara scritti (vecchi e nuovi record).
+
+    Le carriere non coperte dai risultati restano invariate e vengono
+    restituite in "uncovered", per il confronto con career_report.
+    """
+    return {
+        filename: refresh_careers(filename, [record.get(config["entity"]) for record in records])
+        for filename, config in CAREERS.items()
+    }
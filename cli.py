@@ -0,0 +1,329 @@
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+from careers import CAREERS, career_report, refresh_careers, refresh_careers_for_results
+from integrity import ReferenceChecker, integrity_report
+from export import dataframe_csv_bytes, dataset_json_bytes, export_bundle
+from journal import journal_path
+from keys import KeyConflictChecker, load_primary_index
+from registry import dataset_labels, describe, get_schema, scan
+from standings import IncompleteResults, RESULTS_FILE, STANDINGS, rebuild_standings, refresh_for_results, refresh_standings
+from stats import load_stats
+from storage import (
+    DATA_DIR, STORAGE_BACKEND, compact_dataset, dataset_exists, insert_records, load_dataframe,
+    load_json_file, save_json_records, upsert_records, WriteConflict
+)
+from streaming import StreamImport, StreamParseError, iter_chunks, split_checked
+from validation import get_validator
+
+# Record per scrittura del journal negli import in coda e negli upsert
+WRITE_CHUNK_SIZE = 5000
+# Righe diverse mostrate per dataset nelle verifiche complete (classifiche e totali)
+REPORTED_DIFFERENCES = 20
+
+
+def resolve_dataset(name):
+    """Nome del file JSON dal tipo di dati ("Piloti"), dal nome del file o dal nome senza estensione"""
+    datasets = dataset_labels()
+    if name in datasets:
+        return datasets[name]
+    filename = name if name.endswith('.json') else f"{name}.json"
+    if filename in datasets.values():
+        return filename
+    choices = ", ".join(datasets)
+    raise argparse.ArgumentTypeError(f"dataset sconosciuto: {name!r} (validi: {choices})")
+
+
+def _print_json(obj):
+    print(json.dumps(obj, indent=2, ensure_ascii=False, default=str))
+
+
+def _report(filename, job, started, **extra):
+    """Riepilogo di un import in streaming (record letti, validi, scartati e relativi errori)"""
+    report = {
+        "dataset": filename,
+        "rows_read": job.rows_read,
+        "rows_valid": job.rows_valid,
+        "rows_invalid": job.rows_invalid,
+        **extra,
+        "seconds": round(time.perf_counter() - started, 3),
+        "invalid_records": job.invalid_records,
+    }
+    _print_json(report)
+    return 1 if job.rows_invalid else 0
+
+
+def _result_keys(records):
+    # Solo stagione, round e concorrenti: bastano per sapere cosa ricalcolare
+    return [{field: record.get(field) for field in ("year", "round", "driverId", "constructorId")} for record in records]
+
+
+def _sync_from_results(touched):
+    """Classifiche e totali di carriera dei piloti e costruttori toccati, ricalcolati dopo una scrittura dei risultati gara"""
+    return {"standings": refresh_for_results(touched), "careers": refresh_careers_for_results(touched)}
+
+
+def cmd_import(args):
+    filename = args.dataset
+    schema = get_schema(filename)
+    pk_index = load_primary_index(filename, schema)
+    started = time.perf_counter()
+    with open(args.input, 'rb') as f:
+        if args.replace:
+            # Il file sostituisce il dataset: le chiavi vanno controllate solo tra loro
+            job = StreamImport(f, get_validator(filename, schema), key_checker=KeyConflictChecker(pk_index.key_of),
+                               reference_checker=ReferenceChecker(filename))
+            written = save_json_records(filename, job.records())
+            # Nessun ricalcolo automatico su un file sostituito: le classifiche si riscrivono con standings --write
+            touched = []
+        else:
+            job = StreamImport(f, get_validator(filename, schema),
+                               key_checker=KeyConflictChecker(pk_index.key_of, pk_index),
+                               reference_checker=ReferenceChecker(filename))
+            written = 0
+            touched = []
+            for chunk in iter_chunks(job.records(), WRITE_CHUNK_SIZE):
+                insert_records(filename, chunk)
+                written += len(chunk)
+                touched.extend(_result_keys(chunk))
+            compact_dataset(filename)
+    extra = _sync_from_results(touched) if touched and filename == RESULTS_FILE else {}
+    return _report(filename, job, started, written=written, **extra)
+
+
+def cmd_upsert(args):
+    filename = args.dataset
+    schema = get_schema(filename)
+    started = time.perf_counter()
+    updated = inserted = 0
+    touched = []
+    with open(args.input, 'rb') as f:
+        # Chiavi ripetute nel file: vale la prima occorrenza, le altre sono scartate
+        job = StreamImport(f, get_validator(filename, schema),
+                           key_checker=KeyConflictChecker(load_primary_index(filename, schema).key_of),
+                           reference_checker=ReferenceChecker(filename))
+        for chunk in iter_chunks(job.records(), WRITE_CHUNK_SIZE):
+            pk_index = load_primary_index(filename, schema)
+            current = load_json_file(filename)
+            updates = []
+            inserts = []
+            for record in chunk:
+                position = pk_index.position(pk_index.key_of(record))
+                if position is None:
+                    inserts.append(record)
+                else:
+                    updates.append((position, record, current[position]))
+            try:
+                upsert_records(filename, updates, inserts)
+            except WriteConflict as e:
+                print(f"Errore: {e}", file=sys.stderr)
+                return 2
+            updated += len(updates)
+            inserted += len(inserts)
+            touched.extend(_result_keys(chunk + [expected for _, _, expected in updates]))
+        compact_dataset(filename)
+    extra = _sync_from_results(touched) if touched and filename == RESULTS_FILE else {}
+    return _report(filename, job, started, updated=updated, inserted=inserted, **extra)
+
+
+def cmd_validate(args):
+    filename = args.dataset
+    schema = get_schema(filename)
+    validator = get_validator(filename, schema)
+    key_checker = KeyConflictChecker(load_primary_index(filename, schema).key_of)
+    reference_checker = ReferenceChecker(filename)
+    started = time.perf_counter()
+    if args.input:
+        with open(args.input, 'rb') as f:
+            job = StreamImport(f, validator, key_checker=key_checker, reference_checker=reference_checker)
+            for _ in job.records():
+                pass
+        return _report(filename, job, started)
+
+    # Senza file: valida il dataset salvato (schema, chiavi esterne e unicità delle chiavi)
+    data = load_json_file(filename)
+    valid, valid_indices, invalid = validator.validate(data, with_indices=True)
+    valid, valid_indices, orphans = split_checked(reference_checker, valid, valid_indices)
+    valid, conflicts = key_checker.split(valid, valid_indices)
+    invalid = sorted(invalid + orphans + conflicts, key=lambda entry: entry["index"])
+    _print_json({
+        "dataset": filename,
+        "rows_read": len(data),
+        "rows_valid": len(valid),
+        "rows_invalid": len(invalid),
+        "seconds": round(time.perf_counter() - started, 3),
+        "invalid_records": invalid[:StreamImport.MAX_REPORTED_ERRORS],
+    })
+    return 1 if invalid else 0
+
+
+def cmd_export(args):
+    if args.dataset is None:
+        content, _ = export_bundle(dataset_labels().values(), args.format)
+    elif args.format == "csv":
+        content = dataframe_csv_bytes(load_dataframe(args.dataset))
+    else:
+        content = dataset_json_bytes(args.dataset)
+    if args.output:
+        with open(args.output, 'wb') as f:
+            f.write(content)
+    else:
+        sys.stdout.buffer.write(content)
+    return 0
+
+
+def cmd_stats(args):
+    filenames = [args.dataset] if args.dataset else list(dataset_labels().values())
+    stats = []
+    for filename in filenames:
+        if not dataset_exists(filename):
+            continue
+        dataset_stats = load_stats(filename)
+        entry = {"dataset": filename, "backend": STORAGE_BACKEND, "rows": dataset_stats.rows}
+        if STORAGE_BACKEND == "json":
+            filepath = os.path.join(DATA_DIR, filename)
+            journal = journal_path(filepath)
+            entry["bytes"] = os.path.getsize(filepath) if os.path.exists(filepath) else 0
+            entry["journal_bytes"] = os.path.getsize(journal) if os.path.exists(journal) else 0
+        entry["duplicate_keys"] = len(load_primary_index(filename, get_schema(filename)).duplicates())
+        entry["columns"] = dataset_stats.summary()
+        stats.append(entry)
+    _print_json(stats)
+    return 0
+
+
+def cmd_manifest(args):
+    # Con --describe vengono decodificati anche i file cambiati dall'ultima descrizione
+    entries = scan()
+    if args.describe:
+        entries = {filename: describe(filename) for filename in entries}
+    _print_json(list(entries.values()))
+    return 0
+
+
+def cmd_standings(args):
+    filenames = [args.dataset] if args.dataset else list(STANDINGS)
+    if args.year is not None:
+        try:
+            _print_json({filename: refresh_standings(filename, args.year, args.from_round) for filename in filenames})
+        except IncompleteResults as e:
+            print(f"Classifica non ricalcolata: {e}", file=sys.stderr)
+            return 1
+        return 0
+    # Ricalcolo completo: confronto con i file salvati, riscritti solo con --write
+    status = 0
+    summary = []
+    for filename in filenames:
+        report = rebuild_standings(filename, write=args.write)
+        if not args.write and (report["missing"] or report["extra"] or report["different"]):
+            status = 1
+        summary.append({
+            "dataset": filename,
+            "rows_computed": report["rows_computed"],
+            "rows_stored": report["rows_stored"],
+            "missing": len(report["missing"]),
+            "extra": len(report["extra"]),
+            "different": len(report["different"]),
+            "written": args.write,
+            "examples": report["different"][:REPORTED_DIFFERENCES],
+        })
+    _print_json(summary)
+    return status
+
+
+def cmd_careers(args):
+    filenames = [args.dataset] if args.dataset else list(CAREERS)
+    status = 0
+    summary = []
+    for filename in filenames:
+        differences, uncovered = career_report(filename)
+        entry = {"dataset": filename, "different": len(differences), "uncovered": len(uncovered)}
+        if args.write:
+            entry["updated"] = refresh_careers(filename, [record.get("id") for record in load_json_file(filename)])["updated"]
+        elif differences:
+            status = 1
+        entry["fields"] = dict(Counter(difference["field"] for difference in differences).most_common())
+        entry["examples"] = differences[:REPORTED_DIFFERENCES]
+        entry["uncovered_examples"] = uncovered[:REPORTED_DIFFERENCES]
+        summary.append(entry)
+    _print_json(summary)
+    return status
+
+
+def cmd_integrity(args):
+    filenames = [args.dataset] if args.dataset else list(dataset_labels().values())
+    report = integrity_report(filenames)
+    _print_json(report)
+    return 1 if any(entry["orphan_rows"] for entry in report) else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="cli.py",
+        description="Operazioni sui dataset f1db senza interfaccia Streamlit"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("import", help="Importa un file JSON (array di record) nel dataset")
+    p.add_argument("dataset", type=resolve_dataset)
+    p.add_argument("input", help="file JSON da importare")
+    p.add_argument("--replace", action="store_true", help="sostituisce il dataset invece di aggiungere i record")
+    p.set_defaults(func=cmd_import)
+
+    p = commands.add_parser("upsert", help="Aggiorna i record con chiave esistente e aggiunge gli altri")
+    p.add_argument("dataset", type=resolve_dataset)
+    p.add_argument("input", help="file JSON con i record")
+    p.set_defaults(func=cmd_upsert)
+
+    p = commands.add_parser("validate", help="Valida un file JSON (o il dataset salvato) contro lo schema")
+    p.add_argument("dataset", type=resolve_dataset)
+    p.add_argument("input", nargs="?", help="file JSON da validare (default: il dataset stesso)")
+    p.set_defaults(func=cmd_validate)
+
+    p = commands.add_parser("export", help="Esporta un dataset, o tutti in uno zip se il dataset è omesso")
+    p.add_argument("dataset", type=resolve_dataset, nargs="?")
+    p.add_argument("--format", choices=["json", "csv"], default="json")
+    p.add_argument("-o", "--output", help="file di destinazione (default: stdout)")
+    p.set_defaults(func=cmd_export)
+
+    p = commands.add_parser("stats", help="Statistiche dei dataset")
+    p.add_argument("dataset", type=resolve_dataset, nargs="?")
+    p.set_defaults(func=cmd_stats)
+
+    p = commands.add_parser("manifest", help="Manifest dei file JSON in data/ (dimensione, righe, mtime, hash, schema)")
+    p.add_argument("--describe", action="store_true", help="calcola righe, hash e schema dei file non ancora descritti")
+    p.set_defaults(func=cmd_manifest)
+
+    p = commands.add_parser("standings", help="Ricalcola le classifiche dai risultati gara (stagione o verifica completa)")
+    p.add_argument("dataset", nargs="?", choices=list(STANDINGS), help="classifica (default: piloti e costruttori)")
+    p.add_argument("--year", type=int, help="stagione da ricalcolare; senza, confronto completo con i file salvati")
+    p.add_argument("--from-round", type=int, default=1, help="primo round da ricalcolare nella stagione")
+    p.add_argument("--write", action="store_true", help="nel ricalcolo completo riscrive le classifiche")
+    p.set_defaults(func=cmd_standings)
+
+    p = commands.add_parser("careers", help="Confronta i totali di carriera di piloti e costruttori con quelli calcolati")
+    p.add_argument("dataset", nargs="?", choices=list(CAREERS), help="dataset (default: piloti e costruttori)")
+    p.add_argument("--write", action="store_true", help="sostituisce i totali salvati con quelli calcolati (solo carriere coperte dai risultati)")
+    p.set_defaults(func=cmd_careers)
+
+    p = commands.add_parser("integrity", help="Righe con chiavi esterne inesistenti (piloti, costruttori, gare, circuiti)")
+    p.add_argument("dataset", type=resolve_dataset, nargs="?")
+    p.set_defaults(func=cmd_integrity)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except (OSError, StreamParseError) as e:
+        print(f"Errore: {e}", file=sys.stderr)
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+from datetime import date, datetime
+
+# Stringhe accettate per i campi checkbox
+TRUE_STRINGS = {"true", "1", "yes", "si", "sì"}
+FALSE_STRINGS = {"false", "0", "no"}
+
+
+def convert_date_to_string(date_obj):
+    """Converte un oggetto date in stringa ISO"""
+    if date_obj:
+        return date_obj.isoformat()
+    return None
+
+
+def convert_string_to_date(date_str):
+    """Converte una stringa ISO in oggetto date"""
+    if date_str:
+        return datetime.fromisoformat(date_str).date()
+    return None
+
+
+def _encode_integer(value):
+    return int(float(value)) if type(value) is str else int(value)
+
+
+def _encode_float(value):
+    return float(value)
+
+
+def _encode_date(value):
+    return value if type(value) is str else convert_date_to_string(value)
+
+
+def _encode_checkbox(value):
+    return value.strip().lower() in TRUE_STRINGS if type(value) is str else bool(value)
+
+
+def _decode_date(value):
+    try:
+        return convert_string_to_date(value)
+    except (TypeError, ValueError):
+        return None
+
+
+# Per tipo di campo: (tipi già nel formato di salvataggio, conversione verso il file JSON)
+# text e select non hanno conversione: il valore viene salvato così com'è
+_ENCODERS = {
+    "integer": ((int,), _encode_integer),
+    "float": ((float, int), _encode_float),
+    "date": ((str,), _encode_date),
+    "checkbox": ((bool,), _encode_checkbox),
+}
+
+# Conversione dal valore salvato al valore Python usato dai form
+_DECODERS = {
+    "date": ((date,), _decode_date),
+}
+
+
+class RecordCodec:
+    """Codec tipizzato compilato da una voce di SCHEMAS.
+
+    I campi e le funzioni di conversione sono calcolati una volta sola: encode
+    porta un record (da form o da JSON incollato) nei tipi salvati nei file
+    f1db, decode porta un record salvato nei tipi usati dai widget. I valori
+    None restano None e i valori già nel tipo corretto non vengono toccati.
+    """
+
+    def __init__(self, schema):
+        fields = schema["fields"]
+        self.fields = tuple(field["name"] for field in fields)
+        self.required_fields = tuple(field["name"] for field in fields if field.get("required", False))
+        self._encoders = tuple(
+            (field["name"],) + _ENCODERS[field["type"]] for field in fields if field["type"] in _ENCODERS
+        )
+        self._decoders = tuple(
+            (field["name"],) + _DECODERS[field["type"]] for field in fields if field["type"] in _DECODERS
+        )
+
+    def missing_required(self, record):
+        """Campi obbligatori assenti o vuoti"""
+        return [name for name in self.required_fields if name not in record or record[name] == ""]
+
+    @staticmethod
+    def _convert(record, converters):
+        result = None
+        for name, ok_types, convert in converters:
+            value = record.get(name)
+            if value is not None and type(value) not in ok_types:
+                if result is None:
+                    result = dict(record)
+                result[name] = convert(value)
+        return record if result is None else result
+
+    def encode(self, record):
+        """Record nei tipi del file JSON (restituisce lo stesso oggetto se non serve conversione)"""
+        return self._convert(record, self._encoders)
+
+    def decode(self, record):
+        """Record nei tipi Python usati dai form (date come oggetti date)"""
+        return self._convert(record, self._decoders)
+
+    @staticmethod
+    def _convert_batch(records, converters):
+        result = list(records)
+        copied = set()
+        # Per colonna: si convertono solo i valori che non sono già del tipo giusto
+        for name, ok_types, convert in converters:
+            positions = [
+                i for i, record in enumerate(result)
+                if record.get(name) is not None and type(record[name]) not in ok_types
+            ]
+            for i in positions:
+                if i not in copied:
+                    result[i] = dict(result[i])
+                    copied.add(i)
+                result[i][name] = convert(result[i][name])
+        return result
+
+    def encode_batch(self, records):
+        """encode su una lista di record, colonna per colonna"""
+        return self._convert_batch(records, self._encoders)
+
+    def decode_batch(self, records):
+        """decode su una lista di record, colonna per colonna"""
+        return self._convert_batch(records, self._decoders)
+
+
+_codecs = {}
+
+
+def get_codec(filename, schema):
+    """Codec compilato per un dataset (compilato una sola volta per processo)"""
+    codec = _codecs.get(filename)
+    if codec is None:
+        codec = _codecs[filename] = RecordCodec(schema)
+    return codec
@@ -0,0 +1,181 @@
+import hashlib
+import io
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import jsonio
+from storage import (
+    DATA_DIR, compact_dataset, dataset_exists, dataset_is_pretty, dataset_signature, get_sqlite_store,
+    load_dataframe, load_json_file
+)
+
+# Livello di compressione deflate dei bundle (1 = più veloce, 9 = più piccolo)
+EXPORT_COMPRESSLEVEL = 6
+# Worker per la generazione in parallelo degli artefatti non aggiornati
+EXPORT_WORKERS = os.cpu_count() or 1
+
+# Membro dello zip già compresso (deflate raw), pronto per essere assemblato
+Member = namedtuple("Member", "name content_hash crc size compressed")
+
+
+def dataframe_csv_bytes(df):
+    """CSV (UTF-8) di un DataFrame"""
+    return df.to_csv(index=False).encode('utf-8')
+
+
+def dataset_json_bytes(filename):
+    """Contenuto del file JSON del dataset letto direttamente da disco, senza decodifica e ricodifica.
+
+    Le modifiche ancora nel journal vengono prima consolidate, così il file su
+    disco è la versione canonica del dataset. Con il backend SQLite sono i
+    byte del file importato finché il dataset non cambia, poi il JSON generato
+    dai record nel formato del dataset, come la compattazione del backend a file.
+    Pensata per i download differiti: viene chiamata solo quando l'utente
+    scarica il file.
+    """
+    store = get_sqlite_store()
+    if store is not None:
+        # La lettura importa il dataset nel database se non c'è ancora
+        data = load_json_file(filename)
+        raw = store.source(filename)
+        return raw if raw is not None else jsonio.dumps(data, dataset_is_pretty(filename))
+    compact_dataset(filename)
+    with open(os.path.join(DATA_DIR, filename), 'rb') as f:
+        return f.read()
+
+
+def _csv_payload(filename, raw):
+    return dataframe_csv_bytes(load_dataframe(filename))
+
+
+def _json_payload(filename, raw):
+    return raw
+
+
+# Per formato: (nome del file nello zip, generazione del contenuto dal dataset)
+FORMATS = {
+    "csv": (lambda filename: f"{filename.replace('.json', '')}.csv", _csv_payload),
+    "json": (lambda filename: filename, _json_payload),
+}
+
+_lock = threading.Lock()
+_executor = None
+_hashes = {}     # filename -> (firma del dataset, hash del contenuto)
+_members = {}    # (formato, filename) -> Member
+_bundles = {}    # formato -> (chiave del bundle, bytes dello zip)
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=EXPORT_WORKERS, thread_name_prefix="export")
+    return _executor
+
+
+def _content_hash(filename):
+    """Hash del JSON del dataset; se la firma non è cambiata non lo rilegge.
+
+    Restituisce (hash, bytes letti o None).
+    """
+    signature = dataset_signature(filename)
+    cached = _hashes.get(filename)
+    if cached is not None and cached[0] == signature:
+        return cached[1], None
+    raw = dataset_json_bytes(filename)
+    content_hash = hashlib.blake2b(raw, digest_size=16).hexdigest()
+    _hashes[filename] = (signature, content_hash)
+    return content_hash, raw
+
+
+def _build_member(fmt, filename):
+    """Artefatto di un dataset: riusato se l'hash del contenuto non è cambiato, altrimenti rigenerato e compresso"""
+    content_hash, raw = _content_hash(filename)
+    member = _members.get((fmt, filename))
+    if member is not None and member.content_hash == content_hash:
+        return member, False
+    if raw is None:
+        raw = dataset_json_bytes(filename)
+    member_name, payload = FORMATS[fmt]
+    data = payload(filename, raw)
+    # zlib rilascia il GIL: la compressione dei file procede in parallelo nei worker
+    compressor = zlib.compressobj(EXPORT_COMPRESSLEVEL, zlib.DEFLATED, -zlib.MAX_WBITS)
+    compressed = compressor.compress(data) + compressor.flush()
+    member = Member(member_name(filename), content_hash, zlib.crc32(data), len(data), compressed)
+    _members[(fmt, filename)] = member
+    return member, True
+
+
+def _dos_datetime(timestamp):
+    t = time.localtime(timestamp)
+    return (t.tm_year - 1980) << 9 | t.tm_mon << 5 | t.tm_mday, t.tm_hour << 11 | t.tm_min << 5 | t.tm_sec // 2
+
+
+def _write_zip(members):
+    """Assembla uno zip da membri già compressi (senza zip64: ogni file sotto i 4 GB)"""
+    out = io.BytesIO()
+    dos_date, dos_time = _dos_datetime(time.time())
+    central = []
+    for member in members:
+        name = member.name.encode('utf-8')
+        offset = out.tell()
+        # Flag 0x800: nome del file in UTF-8; metodo 8: deflate
+        out.write(struct.pack(
+            "<4s5H3L2H", b"PK\x03\x04", 20, 0x800, 8, dos_time, dos_date,
+            member.crc, len(member.compressed), member.size, len(name), 0
+        ))
+        out.write(name)
+        out.write(member.compressed)
+        central.append(struct.pack(
+            "<4s6H3L5H2L", b"PK\x01\x02", 20, 20, 0x800, 8, dos_time, dos_date,
+            member.crc, len(member.compressed), member.size, len(name), 0, 0, 0, 0, 0o644 << 16, offset
+        ) + name)
+    directory_offset = out.tell()
+    for entry in central:
+        out.write(entry)
+    out.write(struct.pack(
+        "<4s4H2LH", b"PK\x05\x06", 0, 0, len(central), len(central),
+        out.tell() - directory_offset, directory_offset, 0
+    ))
+    return out.getvalue()
+
+
+def export_bundle(filenames, fmt):
+    """Zip con un artefatto (CSV o JSON) per ogni dataset esistente.
+
+    Ogni artefatto è messo in cache per hash del contenuto del dataset: solo
+    quelli non aggiornati vengono rigenerati, in parallelo nel pool di worker.
+    Se nessun dataset è cambiato lo zip arriva direttamente dalla cache.
+    Restituisce (bytes dello zip, dataset rigenerati).
+    """
+    with _lock:
+        existing = []
+        for filename in filenames:
+            # Consolida eventuali modifiche ancora nel journal
+            compact_dataset(filename)
+            if dataset_exists(filename):
+                existing.append(filename)
+
+        results = list(_get_executor().map(lambda filename: _build_member(fmt, filename), existing))
+        members = [member for member, _ in results]
+        rebuilt = [filename for filename, (_, built) in zip(existing, results) if built]
+
+        key = tuple((member.name, member.content_hash) for member in members)
+        cached = _bundles.get(fmt)
+        if cached is not None and cached[0] == key:
+            return cached[1], rebuilt
+        bundle = _write_zip(members)
+        _bundles[fmt] = (key, bundle)
+        return bundle, rebuilt
+
+
+def clear_cache():
+    """Svuota la cache di artefatti e bundle (misure a freddo nei benchmark)"""
+    with _lock:
+        _hashes.clear()
+        _members.clear()
+        _bundles.clear()
@@ -0,0 +1,188 @@
+import math
+import os
+import re
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+
+import jsonio
+from storage import load_derived
+
+# Estensione del file dell'indice di trigrammi affiancato al dataset
+TRIGRAMS_SUFFIX = ".trigrams"
+# Campi testuali indicizzati, oltre agli id testuali (id e campi *Id / *_id)
+TEXT_FIELDS = ("name", "fullName", "firstName", "lastName", "officialName", "race_name")
+# Quota minima dei trigrammi della query presenti nel record perché sia un risultato
+MIN_SIMILARITY = 0.5
+
+# Lettere che NFKD non scompone in lettera base + accento
+_FOLD = str.maketrans({"ø": "o", "ł": "l", "đ": "d", "ħ": "h", "æ": "ae", "œ": "oe", "ı": "i"})
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def trigram_path(filepath):
+    """Percorso dell'indice di trigrammi associato a un file JSON"""
+    return filepath + TRIGRAMS_SUFFIX
+
+
+# Le classifiche ripetono gli stessi id in migliaia di record: testi e trigrammi
+# vengono calcolati una volta per valore distinto
+@lru_cache(maxsize=65536)
+def normalize(text):
+    """Testo confrontabile: minuscolo, senza accenti e punteggiatura ("Räikkönen" -> "raikkonen")"""
+    decomposed = unicodedata.normalize("NFKD", str(text).casefold().translate(_FOLD))
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return _NON_ALNUM.sub(" ", stripped).strip()
+
+
+@lru_cache(maxsize=65536)
+def trigrams(text):
+    """Trigrammi delle parole di un testo normalizzato, con due spazi prima e uno dopo ogni parola"""
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+def _is_id(name):
+    return name == "id" or name.endswith("Id") or name.endswith("_id")
+
+
+def record_text(record):
+    """Testo indicizzato di un record: campi nome e id testuali, normalizzati"""
+    parts = [record[name] for name in TEXT_FIELDS if isinstance(record.get(name), str)]
+    parts.extend(value for name, value in record.items() if _is_id(name) and isinstance(value, str))
+    return normalize(" ".join(dict.fromkeys(parts)))
+
+
+class TrigramIndex:
+    """Indice invertito trigramma -> record per la ricerca per nome, senza accenti e tollerante agli errori.
+
+    I record sono identificati da un id interno stabile (le posizioni scalano
+    con le eliminazioni): le scritture del journal aggiornano solo le posting
+    list dei trigrammi dei record toccati (apply_ops, copy-on-write). Una
+    ricerca legge solo le posting list dei trigrammi della query.
+    """
+
+    def __init__(self, texts, ids, postings, next_id):
+        self._texts = texts          # id interno -> testo normalizzato
+        self._ids = ids              # posizione -> id interno
+        self._postings = postings    # trigramma -> insieme di id interni
+        self._next_id = next_id
+        self._positions = None       # id interno -> posizione (calcolato alla prima ricerca)
+
+    @classmethod
+    def build(cls, data):
+        index = cls({}, [], {}, 0)
+        for record in data:
+            index._add(record)
+        return index
+
+    def _add(self, record, position=None, touched=None):
+        row = self._next_id
+        self._next_id += 1
+        text = record_text(record)
+        self._texts[row] = text
+        if position is None:
+            self._ids.append(row)
+        else:
+            self._ids[position] = row
+        for gram in trigrams(text):
+            self._posting(gram, touched).add(row)
+
+    def _remove(self, row, touched):
+        for gram in trigrams(self._texts.pop(row)):
+            posting = self._posting(gram, touched)
+            posting.discard(row)
+            if not posting:
+                del self._postings[gram]
+
+    def _posting(self, gram, touched):
+        # Copy-on-write: la posting list condivisa con la versione precedente viene copiata al primo uso
+        posting = self._postings.get(gram)
+        if posting is None:
+            posting = self._postings[gram] = set()
+            if touched is not None:
+                touched.add(gram)
+        elif touched is not None and gram not in touched:
+            posting = self._postings[gram] = set(posting)
+            touched.add(gram)
+        return posting
+
+    def __len__(self):
+        return len(self._ids)
+
+    def search(self, query, limit=None, min_similarity=MIN_SIMILARITY):
+        """Posizioni dei record che corrispondono alla query, dal più rilevante.
+
+        Rilevanza: quota dei trigrammi della query presenti nel record, poi
+        la query contenuta per intero, poi il testo più corto.
+        """
+        needle = normalize(query)
+        grams = trigrams(needle)
+        if not grams:
+            return []
+        counts = Counter()
+        for gram in grams:
+            posting = self._postings.get(gram)
+            if posting:
+                counts.update(posting)
+        needed = math.ceil(min_similarity * len(grams))
+        ranked = sorted(
+            ((-shared, needle not in self._texts[row], len(self._texts[row]), row)
+             for row, shared in counts.items() if shared >= needed)
+        )
+        if limit is not None:
+            ranked = ranked[:limit]
+        if self._positions is None:
+            self._positions = {row: position for position, row in enumerate(self._ids)}
+        return [self._positions[row] for *_, row in ranked]
+
+    def apply_ops(self, ops, old_data, new_data):
+        """Nuovo indice con le operazioni del journal applicate (copy-on-write)"""
+        index = TrigramIndex(dict(self._texts), list(self._ids), dict(self._postings), self._next_id)
+        touched = set()
+        for op in ops:
+            if op["op"] == "insert":
+                for record in op["records"]:
+                    index._add(record, touched=touched)
+            elif op["op"] == "update":
+                index._remove(index._ids[op["index"]], touched)
+                index._add(op["record"], position=op["index"], touched=touched)
+            elif op["op"] == "delete":
+                index._remove(index._ids.pop(op["index"]), touched)
+        return index
+
+    def persist(self, filepath, base_signature):
+        """Salva l'indice accanto al dataset, valido per la versione base_signature del file"""
+        renumber = {row: position for position, row in enumerate(self._ids)}
+        content = jsonio.dumps({
+            "signature": list(base_signature),
+            "texts": [self._texts[row] for row in self._ids],
+            "postings": {gram: sorted(renumber[row] for row in rows) for gram, rows in self._postings.items()},
+        })
+        path = trigram_path(filepath)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def restore(cls, filepath, base_signature):
+        """Indice salvato per la versione base_signature del file, None se assente o obsoleto"""
+        try:
+            with open(trigram_path(filepath), 'rb') as f:
+                content = jsonio.loads(f.read())
+        except (OSError, jsonio.DecodeError):
+            return None
+        if content.get("signature") != list(base_signature):
+            return None
+        texts = content["texts"]
+        postings = {gram: set(rows) for gram, rows in content["postings"].items()}
+        return cls(dict(enumerate(texts)), list(range(len(texts))), postings, len(texts))
+
+
+def load_trigram_index(filename):
+    """Indice di trigrammi della versione corrente del dataset"""
+    return load_derived(filename, "trigrams", TrigramIndex.build, restore=TrigramIndex.restore)
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+
+# Colonne categoriali usate dai filtri della tab Visualizza
+INDEX_COLUMNS = ("year", "circuitId", "grandPrixId", "raceId", "constructorId", "driverId")
+
+
+class ColumnIndex:
+    """Posting list valore → posizioni di riga per una colonna categoriale"""
+
+    def __init__(self, series):
+        try:
+            codes, uniques = pd.factorize(series, sort=True)
+        except TypeError:
+            # Tipi misti non confrontabili (es. 2026 e "2026b"): ordina per rappresentazione testuale
+            codes, uniques = pd.factorize(series)
+            order = sorted(range(len(uniques)), key=lambda i: str(uniques[i]))
+            remap = np.empty(len(order), dtype=np.intp)
+            remap[order] = np.arange(len(order))
+            codes = np.where(codes >= 0, remap[np.maximum(codes, 0)], -1)
+            uniques = [uniques[i] for i in order]
+        self.codes = np.asarray(codes)
+        self.values = list(uniques.tolist() if hasattr(uniques, 'tolist') else uniques)
+        self._code_of = {value: code for code, value in enumerate(self.values)}
+
+        # Ordinamento stabile per codice: ogni posting è un intervallo contiguo, già ordinato
+        valid = self.codes >= 0
+        self._order = np.argsort(self.codes, kind='stable')[np.count_nonzero(~valid):]
+        counts = np.bincount(self.codes[valid], minlength=len(self.values))
+        self._offsets = np.concatenate(([0], np.cumsum(counts)))
+
+    def postings(self, value):
+        """Posizioni (ordinate) delle righe con il valore indicato"""
+        code = self._code_of.get(value)
+        if code is None:
+            return np.empty(0, dtype=np.intp)
+        return self._order[self._offsets[code]:self._offsets[code + 1]]
+
+    def distinct(self, positions=None):
+        """Valori distinti ordinati, eventualmente ristretti a un sottoinsieme di righe"""
+        if positions is None:
+            return self.values
+        present = np.unique(self.codes[positions])
+        return [self.values[code] for code in present if code >= 0]
+
+
+class DatasetIndex:
+    """Indici secondari di un dataset, costruiti una volta per versione del file"""
+
+    def __init__(self, df, columns=INDEX_COLUMNS):
+        self.size = len(df)
+        self.columns = {col: ColumnIndex(df[col]) for col in columns if col in df.columns}
+
+    def __contains__(self, column):
+        return column in self.columns
+
+    def distinct_values(self, column, positions=None):
+        """Equivalente di sorted(df[column].unique()) senza ricalcolo"""
+        return self.columns[column].distinct(positions)
+
+    def filter(self, column, value, positions=None):
+        """Restringe le posizioni candidate alle righe con column == value"""
+        postings = self.columns[column].postings(value)
+        if positions is None:
+            return postings
+        return np.intersect1d(positions, postings, assume_unique=True)
+
+    def lookup(self, filters):
+        """Posizioni delle righe che soddisfano tutti i filtri {colonna: valore}"""
+        positions = None
+        # Interseca partendo dalla posting list più corta
+        for column, value in sorted(filters.items(), key=lambda item: len(self.columns[item[0]].postings(item[1]))):
+            positions = self.filter(column, value, positions)
+            if len(positions) == 0:
+                break
+        return positions
@@ -0,0 +1,141 @@
+from collections import Counter
+
+from registry import get_schema
+from storage import dataset_exists, load_dataframe, load_derived
+
+# Chiavi esterne dei file f1db: colonna -> (dataset di riferimento, colonna chiave)
+FOREIGN_KEYS = {
+    "raceId": ("f1db-races.json", "id"),
+    "driverId": ("f1db-drivers.json", "id"),
+    "constructorId": ("f1db-constructors.json", "id"),
+    "circuitId": ("f1db-circuits.json", "id"),
+    "grandPrixId": ("f1db-grands-prix.json", "id"),
+}
+# Le chiavi esterne valgono solo tra i file f1db: gli altri dataset usano id diversi (es. "max_verstappen")
+REFERENCE_PREFIX = "f1db-"
+# Valori mancanti diversi mostrati per colonna nel report completo
+REPORTED_VALUES = 20
+
+
+class KeySet:
+    """Valori di una colonna chiave con il numero di occorrenze, per i controlli di esistenza in O(1).
+
+    È una struttura derivata del dataset di riferimento: le scritture del
+    journal aggiornano solo i conteggi dei record toccati (apply_ops).
+    """
+
+    def __init__(self, column, counts):
+        self.column = column
+        self._counts = counts
+
+    @classmethod
+    def build(cls, data, column):
+        return cls(column, Counter(record.get(column) for record in data if record.get(column) is not None))
+
+    def __contains__(self, value):
+        return value in self._counts
+
+    def __len__(self):
+        return len(self._counts)
+
+    def values(self):
+        return self._counts.keys()
+
+    def _add(self, record, delta):
+        value = record.get(self.column)
+        if value is None:
+            return
+        self._counts[value] += delta
+        if self._counts[value] <= 0:
+            del self._counts[value]
+
+    def apply_ops(self, ops, old_data, new_data):
+        """Nuovo insieme con le operazioni del journal applicate (copy-on-write)"""
+        keys = KeySet(self.column, Counter(self._counts))
+        current = list(old_data) if any(op["op"] != "insert" for op in ops) else None
+        for op in ops:
+            if op["op"] == "insert":
+                for record in op["records"]:
+                    keys._add(record, 1)
+                    if current is not None:
+                        current.append(record)
+            elif op["op"] == "update":
+                keys._add(current[op["index"]], -1)
+                keys._add(op["record"], 1)
+                current[op["index"]] = op["record"]
+            elif op["op"] == "delete":
+                keys._add(current.pop(op["index"]), -1)
+        return keys
+
+
+def load_key_set(filename, column):
+    """Insieme delle chiavi della versione corrente del dataset, ricostruito solo se il file cambia"""
+    return load_derived(filename, f"key_set:{column}", lambda data: KeySet.build(data, column))
+
+
+def references_for(filename, columns=None):
+    """Chiavi esterne da verificare per un dataset: [(colonna, dataset di riferimento, colonna chiave)].
+
+    columns sono le colonne presenti (default: i campi dello schema, anche
+    dedotto); i dataset di riferimento assenti vengono saltati.
+    """
+    if not filename.startswith(REFERENCE_PREFIX):
+        return []
+    if columns is None:
+        schema = get_schema(filename)
+        columns = [field["name"] for field in schema["fields"]] if schema else []
+    return [
+        (column, target, key)
+        for column, (target, key) in FOREIGN_KEYS.items()
+        if column in columns and target != filename and dataset_exists(target)
+    ]
+
+
+class ReferenceChecker:
+    """Controllo delle chiavi esterne per batch di nuovi record, con gli insiemi di chiavi in cache.
+
+    Stessa interfaccia di KeyConflictChecker: split restituisce i record
+    accettati e le violazioni nel formato del report di validazione.
+    """
+
+    def __init__(self, filename):
+        self.checks = [(column, target, load_key_set(target, key)) for column, target, key in references_for(filename)]
+
+    def split(self, records, indices=None):
+        accepted = []
+        violations = []
+        for i, record in enumerate(records):
+            errors = {}
+            for column, target, keys in self.checks:
+                value = record.get(column)
+                if value is not None and value not in keys:
+                    errors[column] = f"{value!r} non esiste in {target}"
+            if not errors:
+                accepted.append(record)
+                continue
+            violations.append({"index": indices[i] if indices is not None else i, "record": record,
+                               "missing_fields": [], "errors": errors})
+        return accepted, violations
+
+
+def integrity_report(filenames):
+    """Righe orfane dei dataset (chiavi esterne senza record di riferimento), con una passata per colonna"""
+    report = []
+    for filename in filenames:
+        if not dataset_exists(filename):
+            continue
+        df = load_dataframe(filename)
+        for column, target, key in references_for(filename, df.columns):
+            keys = load_key_set(target, key)
+            values = df[column]
+            orphans = values[values.notna() & ~values.isin(list(keys.values()))]
+            counts = orphans.value_counts().head(REPORTED_VALUES)
+            report.append({
+                "dataset": filename,
+                "column": column,
+                "references": target,
+                "rows": len(values),
+                "orphan_rows": len(orphans),
+                "orphan_values": dict(zip(counts.index.tolist(), counts.tolist())),
+            })
+    return report
@@ -0,0 +1,110 @@
+import os
+
+import jsonio
+
+# Estensione del journal affiancato a ogni dataset
+JOURNAL_SUFFIX = ".journal"
+
+
+def journal_path(filepath):
+    """Percorso del journal associato a un file JSON"""
+    return filepath + JOURNAL_SUFFIX
+
+
+def _encode_signature(base_signature):
+    """Firma del file base in forma serializzabile (None se il file non esiste)"""
+    return list(base_signature) if base_signature is not None else None
+
+
+def read_journal(filepath, base_signature):
+    """Legge le operazioni del journal valide per la versione corrente del file base.
+
+    La prima riga del journal registra la firma del file base su cui le
+    operazioni vanno applicate: se il file base è stato riscritto (compattazione
+    già completata o modifica esterna) il journal è obsoleto e viene restituito
+    None. Un'ultima riga troncata da un crash durante l'append viene scartata.
+    """
+    path = journal_path(filepath)
+    try:
+        with open(path, 'rb') as f:
+            lines = f.read().split(b'\n')
+    except FileNotFoundError:
+        return []
+
+    ops = []
+    for i, line in enumerate(lines):
+        if not line:
+            continue
+        try:
+            entry = jsonio.loads(line)
+        except jsonio.DecodeError:
+            # Solo l'ultima riga può essere incompleta
+            if i >= len(lines) - 2:
+                break
+            raise
+        if i == 0:
+            if entry.get("op") != "base" or entry.get("signature") != _encode_signature(base_signature):
+                return None
+            continue
+        ops.append(entry)
+    return ops
+
+
+def append_journal(filepath, base_signature, ops):
+    """Aggiunge operazioni al journal con fsync (scrittura proporzionale alla modifica)"""
+    path = journal_path(filepath)
+    lines = [jsonio.dumps(op) for op in ops]
+    with open(path, 'ab+') as f:
+        _drop_partial_line(f)
+        if f.seek(0, os.SEEK_END) == 0:
+            lines.insert(0, jsonio.dumps({"op": "base", "signature": _encode_signature(base_signature)}))
+        f.write(b'\n'.join(lines) + b'\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _drop_partial_line(f):
+    """Tronca un'eventuale riga incompleta lasciata da un crash"""
+    size = f.seek(0, os.SEEK_END)
+    if size == 0:
+        return
+    f.seek(size - 1)
+    if f.read(1) == b'\n':
+        return
+    # Cerca l'ultimo a capo a ritroso, a blocchi
+    pos = size
+    while pos > 0:
+        start = max(0, pos - 4096)
+        f.seek(start)
+        idx = f.read(pos - start).rfind(b'\n')
+        if idx != -1:
+            f.truncate(start + idx + 1)
+            return
+        pos = start
+    f.truncate(0)
+
+
+def clear_journal(filepath):
+    """Elimina il journal dopo che è stato consolidato nel file base"""
+    try:
+        os.remove(journal_path(filepath))
+    except FileNotFoundError:
+        pass
+
+
+def apply_ops(data, ops):
+    """Applica le operazioni del journal a una copia della lista di record"""
+    if not ops:
+        return data
+    result = list(data)
+    for op in ops:
+        kind = op["op"]
+        if kind == "insert":
+            result.extend(op["records"])
+        elif kind == "update":
+            result[op["index"]] = op["record"]
+        elif kind == "delete":
+            del result[op["index"]]
+        else:
+            raise ValueError(f"Operazione di journal sconosciuta: {kind}")
+    return result
@@ -0,0 +1,83 @@
+import json
+import os
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+# Formato dei file salvati se lo schema del dataset non specifica "json_format"
+DEFAULT_JSON_FORMAT = "pretty"
+JSON_FORMATS = ("pretty", "compact")
+
+
+def _stdlib_loads(data):
+    return json.loads(data)
+
+
+def _stdlib_dumps(obj, pretty=False):
+    if pretty:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _orjson_dumps(obj, pretty=False):
+    return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0)
+
+
+def _msgspec_dumps(obj, pretty=False):
+    data = msgspec.json.encode(obj)
+    return msgspec.json.format(data, indent=2) if pretty else data
+
+
+# Per backend: (loads, dumps, eccezione di parsing). Stesso output per tutti:
+# UTF-8 senza escape, indentazione di 2 spazi in modalità pretty
+BACKENDS = {"stdlib": (_stdlib_loads, _stdlib_dumps, json.JSONDecodeError)}
+if msgspec is not None:
+    BACKENDS["msgspec"] = (msgspec.json.decode, _msgspec_dumps, msgspec.DecodeError)
+if orjson is not None:
+    BACKENDS["orjson"] = (orjson.loads, _orjson_dumps, orjson.JSONDecodeError)
+
+
+def _select_backend():
+    """Backend forzato con F1DB_JSON_BACKEND, altrimenti il più veloce installato"""
+    forced = os.environ.get("F1DB_JSON_BACKEND")
+    if forced:
+        if forced not in BACKENDS:
+            raise ImportError(f"Backend JSON non disponibile: {forced} (installati: {', '.join(BACKENDS)})")
+        return forced
+    for name in ("orjson", "msgspec", "stdlib"):
+        if name in BACKENDS:
+            return name
+
+
+BACKEND = _select_backend()
+_loads, _dumps, DecodeError = BACKENDS[BACKEND]
+
+
+def loads(data):
+    """Decodifica JSON da bytes o str"""
+    return _loads(data)
+
+
+def dumps(obj, pretty=False):
+    """Codifica in JSON (bytes UTF-8), compatto o indentato di 2 spazi"""
+    return _dumps(obj, pretty)
+
+
+def detect_pretty(head):
+    """True se il JSON (o il suo inizio) è indentato: a capo subito dopo la parentesi di apertura"""
+    return head.lstrip(b'\xef\xbb\xbf \t\r\n')[1:2] in (b'\n', b'\r')
+
+
+def is_pretty(schema):
+    """True se il dataset va salvato indentato (opzione "json_format" dello schema)"""
+    json_format = schema.get("json_format", DEFAULT_JSON_FORMAT) if schema else DEFAULT_JSON_FORMAT
+    if json_format not in JSON_FORMATS:
+        raise ValueError(f"json_format non valido: {json_format!r} (valori: {', '.join(JSON_FORMATS)})")
+    return json_format == "pretty"
@@ -0,0 +1,204 @@
+import threading
+from bisect import insort
+from itertools import islice
+
+from storage import load_derived
+
+
+class _BlankDict(dict):
+    """Dizionario per format_map: i campi assenti diventano stringa vuota"""
+
+    def __missing__(self, key):
+        return ""
+
+
+def format_label(label_format, record):
+    """Etichetta leggibile di un record (es. "Charles Leclerc (charles-leclerc)")"""
+    return label_format.format_map(_BlankDict(record))
+
+
+class PrimaryKeyIndex:
+    """Indice chiave primaria → posizione del record, con ricerca testuale sulle etichette.
+
+    La chiave è il valore del campo (chiave semplice, es. id) o la tupla dei
+    campi (chiave composta, es. raceId + constructorId). Viene mantenuto in
+    modo incrementale dalle scritture del journal tramite apply_ops.
+    """
+
+    def __init__(self, key_fields, label_format, positions, labels, search_texts, next_id=1):
+        self.key_fields = tuple(key_fields)
+        self.label_format = label_format
+        self._positions = positions  # chiave -> lista di posizioni (più di una se duplicata)
+        self.labels = labels
+        self._search_texts = search_texts
+        self._duplicates = None
+        # Sequenza monotona per le chiavi intere (non scende mai, nemmeno dopo un'eliminazione)
+        self._next_id = next_id
+        self._sequence_lock = threading.Lock()
+
+    @classmethod
+    def build(cls, data, key_fields, label_format):
+        index = cls(key_fields, label_format, {}, [], [])
+        for position, record in enumerate(data):
+            index._add(position, record)
+        return index
+
+    def key_of(self, record):
+        """Chiave primaria di un record"""
+        if len(self.key_fields) == 1:
+            return record.get(self.key_fields[0])
+        return tuple(record.get(field) for field in self.key_fields)
+
+    def _add(self, position, record):
+        key = self.key_of(record)
+        insort(self._positions.setdefault(key, []), position)
+        if type(key) is int and key >= self._next_id:
+            self._next_id = key + 1
+        label = format_label(self.label_format, record)
+        self.labels.insert(position, label)
+        self._search_texts.insert(position, label.lower())
+
+    def _remove(self, position, record):
+        key = self.key_of(record)
+        positions = self._positions[key]
+        positions.remove(position)
+        if not positions:
+            del self._positions[key]
+        del self.labels[position]
+        del self._search_texts[position]
+
+    def __len__(self):
+        return len(self.labels)
+
+    def position(self, key):
+        """Posizione del record con la chiave indicata (la prima se duplicata), None se assente"""
+        positions = self._positions.get(key)
+        return positions[0] if positions else None
+
+    def __contains__(self, key):
+        return key in self._positions
+
+    def allocate_id(self):
+        """Nuovo id intero univoco (O(1), senza scansione dei record)"""
+        with self._sequence_lock:
+            new_id = self._next_id
+            self._next_id += 1
+        return new_id
+
+    def unique_slug(self, base):
+        """Primo id testuale libero della forma base, base-2, base-3, ..."""
+        candidate = base
+        suffix = 1
+        while candidate in self._positions:
+            suffix += 1
+            candidate = f"{base}-{suffix}"
+        return candidate
+
+    def conflicts_for(self, records, indices=None, exclude_position=None):
+        """Separa un batch di nuovi record in (accettati, conflitti) per chiave primaria.
+
+        Un record è in conflitto se la chiave esiste già nel dataset (esclusa
+        eventualmente la posizione del record in modifica) o se compare più
+        volte nel batch. Costo O(1) per record.
+        """
+        checker = KeyConflictChecker(self.key_of, self, exclude_position)
+        return checker.split(records, indices)
+
+    def duplicates(self):
+        """Chiavi presenti in più record (calcolate una volta per versione dell'indice)"""
+        if self._duplicates is None:
+            self._duplicates = [key for key, positions in self._positions.items() if len(positions) > 1]
+        return self._duplicates
+
+    def search(self, query, limit=50):
+        """Posizioni dei primi `limit` record: prima la chiave esatta, poi le etichette che contengono la query"""
+        query = query.strip()
+        if not query:
+            return list(range(min(limit, len(self))))
+        exact = []
+        if len(self.key_fields) == 1:
+            key = int(query) if query.lstrip('-').isdigit() else query
+            exact = self._positions.get(key, [])[:limit]
+        needle = query.lower()
+        matches = (i for i, text in enumerate(self._search_texts) if needle in text and i not in exact)
+        return exact + list(islice(matches, limit - len(exact)))
+
+    def apply_ops(self, ops, old_data, new_data):
+        """Nuovo indice con le operazioni del journal applicate (copy-on-write)"""
+        index = PrimaryKeyIndex(
+            self.key_fields, self.label_format,
+            {key: list(positions) for key, positions in self._positions.items()},
+            list(self.labels), list(self._search_texts), self._next_id
+        )
+        current = list(old_data) if any(op["op"] != "insert" for op in ops) else None
+        for op in ops:
+            if op["op"] == "insert":
+                for record in op["records"]:
+                    index._add(len(index), record)
+                    if current is not None:
+                        current.append(record)
+            elif op["op"] == "update":
+                position = op["index"]
+                index._remove(position, current[position])
+                index._add(position, op["record"])
+                current[position] = op["record"]
+            elif op["op"] == "delete":
+                position = op["index"]
+                index._remove(position, current.pop(position))
+                # Le posizioni successive scalano di uno
+                for positions in index._positions.values():
+                    for i, p in enumerate(positions):
+                        if p > position:
+                            positions[i] = p - 1
+        return index
+
+
+class KeyConflictChecker:
+    """Controllo di unicità delle chiavi per batch successivi di nuovi record.
+
+    Mantiene l'insieme delle chiavi già viste nei batch precedenti, così un
+    import a blocchi rileva anche i duplicati tra blocchi diversi.
+    """
+
+    def __init__(self, key_of, existing=None, exclude_position=None):
+        self.key_of = key_of
+        self.existing = existing
+        self.exclude_position = exclude_position
+        self.seen = set()
+
+    def _exists(self, key):
+        if self.existing is None:
+            return False
+        positions = self.existing._positions.get(key)
+        if not positions:
+            return False
+        return positions != [self.exclude_position]
+
+    def split(self, records, indices=None):
+        """Restituisce (record accettati, conflitti) con conflitti nel formato del report di validazione.
+
+        indices sono le posizioni dei record nel batch originale, usate nel report.
+        """
+        accepted = []
+        conflicts = []
+        for i, record in enumerate(records):
+            key = self.key_of(record)
+            if self._exists(key):
+                reason = "chiave già presente nel dataset"
+            elif key in self.seen:
+                reason = "chiave duplicata nel batch"
+            else:
+                self.seen.add(key)
+                accepted.append(record)
+                continue
+            conflicts.append({"index": indices[i] if indices is not None else i, "record": record, "missing_fields": [],
+                              "errors": {"chiave": f"{reason}: {key!r}"}})
+        return accepted, conflicts
+
+
+def load_primary_index(filename, schema):
+    """Indice di chiave primaria per la versione corrente del dataset"""
+    return load_derived(
+        filename, "primary_key",
+        lambda data: PrimaryKeyIndex.build(data, schema["primary_key"], schema["label"])
+    )
@@ -0,0 +1,230 @@
+import hashlib
+import os
+import re
+import threading
+
+import pandas as pd
+
+import jsonio
+from schemas import FILE_MAPPING, INFERRED_SCHEMAS, SCHEMAS
+from storage import DATA_DIR
+
+# Manifest dei dataset in DATA_DIR (file nascosto: non compare tra i dataset)
+MANIFEST_NAME = ".manifest.json"
+# Byte letti dalla scansione per riconoscere un array di record senza parsing
+PEEK_BYTES = 64
+# Campi massimi di una chiave primaria composta dedotta
+MAX_KEY_FIELDS = 4
+
+_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+# Nomi utilizzabili in un'etichetta str.format ("Driver.driverId" non lo è)
+_LABEL_FIELD = re.compile(r"^\w+$")
+# Campi preferiti per l'etichetta leggibile dei record, in ordine
+_NAME_FIELDS = ("name", "fullName", "officialName", "race_name")
+# Colonne che identificano stagione e gara nelle chiavi composte (es. classifiche)
+_PERIOD_FIELDS = ("season", "year", "round")
+
+_lock = threading.Lock()
+_manifest = {}   # percorso del manifest -> voci per file
+
+
+def manifest_path():
+    return os.path.join(DATA_DIR, MANIFEST_NAME)
+
+
+def _read_manifest(path):
+    try:
+        with open(path, 'rb') as f:
+            return jsonio.loads(f.read())["datasets"]
+    except (OSError, KeyError, TypeError, jsonio.DecodeError):
+        return {}
+
+
+def _write_manifest(path, entries):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(jsonio.dumps({"datasets": entries}, pretty=True))
+    os.replace(tmp_path, path)
+
+
+def _peek_kind(path):
+    """"records" se il file è un array JSON, "object" se è un oggetto; legge solo i primi byte"""
+    with open(path, 'rb') as f:
+        head = f.read(PEEK_BYTES).lstrip(b'\xef\xbb\xbf \t\r\n')
+    if head.startswith(b'['):
+        return "records"
+    if head.startswith(b'{'):
+        return "object"
+    return "unknown"
+
+
+def scan():
+    """Voci del manifest per ogni file JSON in DATA_DIR, aggiornate con i soli metadati del filesystem.
+
+    I file nuovi o cambiati (dimensione o mtime diversi) vengono segnati come
+    da descrivere (rows e hash None): il parsing avviene solo in describe,
+    quando il dataset viene selezionato.
+    """
+    path = manifest_path()
+    with _lock:
+        if path not in _manifest:
+            _manifest[path] = _read_manifest(path)
+        entries = _manifest[path]
+        current = {}
+        try:
+            dirents = sorted(os.scandir(DATA_DIR), key=lambda dirent: dirent.name)
+        except FileNotFoundError:
+            dirents = []
+        for dirent in dirents:
+            name = dirent.name
+            if name.startswith('.') or not name.endswith('.json') or not dirent.is_file():
+                continue
+            st = dirent.stat()
+            entry = entries.get(name)
+            if entry is None or entry["bytes"] != st.st_size or entry["mtime_ns"] != st.st_mtime_ns:
+                entry = {
+                    "file": name,
+                    "bytes": st.st_size,
+                    "mtime_ns": st.st_mtime_ns,
+                    "kind": _peek_kind(dirent.path),
+                    "rows": None,
+                    "hash": None,
+                    "schema_source": "declared" if name in SCHEMAS else None,
+                    # Lo schema dedotto resta quello della prima descrizione del file
+                    "schema": entry.get("schema") if entry else None,
+                }
+            current[name] = entry
+        if current != entries:
+            _manifest[path] = current
+            _write_manifest(path, current)
+        for name, entry in current.items():
+            if entry["schema"] is not None:
+                INFERRED_SCHEMAS.setdefault(name, entry["schema"])
+        return dict(current)
+
+
+def describe(filename):
+    """Voce completa del manifest (righe, hash e schema), None se il file non esiste.
+
+    Il file viene letto e decodificato solo se è cambiato dall'ultima descrizione.
+    """
+    entry = scan().get(filename)
+    if entry is None or entry["rows"] is not None or entry["kind"] != "records":
+        return entry
+    filepath = os.path.join(DATA_DIR, filename)
+    with open(filepath, 'rb') as f:
+        raw = f.read()
+    data = jsonio.loads(raw)
+    entry = dict(entry, rows=len(data), hash=hashlib.blake2b(raw, digest_size=16).hexdigest())
+    if filename not in SCHEMAS and entry["schema"] is None:
+        entry["schema"] = infer_schema(data, jsonio.detect_pretty(raw))
+        entry["schema_source"] = "inferred"
+    path = manifest_path()
+    with _lock:
+        entries = _manifest.setdefault(path, {})
+        # Il file potrebbe essere cambiato nel frattempo: in quel caso la voce è già stata rinnovata
+        if entries.get(filename, {}).get("mtime_ns") == entry["mtime_ns"]:
+            entries[filename] = entry
+            _write_manifest(path, entries)
+        if entry["schema"] is not None:
+            INFERRED_SCHEMAS.setdefault(filename, entry["schema"])
+    return entry
+
+
+def _infer_type(values):
+    """Tipo di campo dello schema per i valori non nulli di una colonna (None per liste e oggetti)"""
+    types = {type(value) for value in values}
+    if not types:
+        return "text"
+    if types == {bool}:
+        return "checkbox"
+    if types == {int}:
+        return "integer"
+    if types <= {int, float}:
+        return "float"
+    if types == {str}:
+        return "date" if all(_DATE.match(value) for value in values) else "text"
+    if types <= {str, int, float}:
+        return "text"
+    return None
+
+
+def _infer_key(rows, names):
+    """Chiave primaria: il primo campo *id univoco, altrimenti la combinazione più corta trovata
+    aggiungendo ogni volta il campo con più valori distinti (prima id e stagione/gara, poi gli altri)"""
+    def is_id(name):
+        return name == "id" or name.lower().endswith("id")
+
+    df = pd.DataFrame(rows, columns=names)
+    complete = [name for name in names if df[name].notna().all()]
+    preferred = [name for name in complete if is_id(name)]
+    for name in preferred + complete:
+        if df[name].is_unique:
+            return [name]
+
+    def distinct(fields):
+        return len(df) - int(df.duplicated(fields).sum())
+
+    key = []
+    for pool in (preferred + [name for name in complete if name in _PERIOD_FIELDS], complete):
+        remaining = [name for name in pool if name not in key]
+        while remaining and len(key) < MAX_KEY_FIELDS:
+            best = max(remaining, key=lambda name: distinct(key + [name]))
+            key.append(best)
+            remaining.remove(best)
+            if distinct(key) == len(df):
+                return key
+    # Nessuna combinazione univoca: le chiavi duplicate vengono segnalate come nei file f1db
+    return key or names[:1]
+
+
+def infer_schema(data, pretty=True):
+    """Schema (campi, chiave primaria, etichetta, formato) dedotto da un array di record.
+
+    Liste e oggetti annidati non hanno un tipo di campo: restano nei record
+    ma non compaiono nei form.
+    """
+    rows = [record for record in data if isinstance(record, dict)]
+    names = list(dict.fromkeys(name for record in rows for name in record))
+    fields = []
+    for name in names:
+        field_type = _infer_type([record[name] for record in rows if record.get(name) is not None])
+        if field_type is not None:
+            fields.append({"name": name, "type": field_type})
+    scalar = [field["name"] for field in fields]
+    key = _infer_key(rows, scalar)
+    for field in fields:
+        if field["name"] in key:
+            field["required"] = True
+
+    key_label = " - ".join(f"{{{name}}}" for name in key if _LABEL_FIELD.match(name))
+    name_field = next((name for name in _NAME_FIELDS if name in scalar), None)
+    if name_field and key_label and name_field not in key:
+        label = f"{{{name_field}}} ({key_label})"
+    else:
+        label = key_label or (f"{{{name_field}}}" if name_field else "")
+    return {
+        "json_format": "pretty" if pretty else "compact",
+        "primary_key": key,
+        "label": label,
+        "fields": fields,
+    }
+
+
+def get_schema(filename):
+    """Schema dichiarato in SCHEMAS o, per gli altri file, dedotto alla prima descrizione"""
+    if filename in SCHEMAS:
+        return SCHEMAS[filename]
+    entry = describe(filename)
+    return entry["schema"] if entry else None
+
+
+def dataset_labels():
+    """Etichetta -> file per i dataset gestibili: quelli di FILE_MAPPING, poi gli array JSON
+    trovati in DATA_DIR (etichetta = nome del file senza estensione)"""
+    labels = dict(FILE_MAPPING)
+    declared = set(FILE_MAPPING.values())
+    for name, entry in scan().items():
+        if name not in declared and entry["kind"] == "records":
+            labels[os.path.splitext(name)[0]] = name
+    return labels
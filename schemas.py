@@ -0,0 +1,201 @@
+# Mappatura tipo di file → file JSON in DATA_DIR
+FILE_MAPPING = {
+    "Piloti": "f1db-drivers.json",
+    "Costruttori": "f1db-constructors.json",
+    "Gare": "f1db-races.json",
+    "Risultati Gare": "f1db-races-race-results.json",
+    "Classifica Costruttori": "f1db-races-constructor-standings.json"
+}
+
+# Schema dei file aggiornato
+SCHEMAS = {
+    "f1db-drivers.json": {
+        # Come nei file f1db originali: su una riga, senza indentazione
+        "json_format": "compact",
+        "primary_key": ["id"],
+        "label": "{name} ({id})",
+        "fields": [
+            {"name": "id", "type": "text", "required": True},
+            {"name": "name", "type": "text", "required": True},
+            {"name": "firstName", "type": "text", "required": True},
+            {"name": "lastName", "type": "text", "required": True},
+            {"name": "fullName", "type": "text", "required": True},
+            {"name": "abbreviation", "type": "text", "required": True},
+            {"name": "permanentNumber", "type": "text", "required": True},
+            {"name": "gender", "type": "select", "options": ["MALE", "FEMALE", "OTHER"], "required": True},
+            {"name": "dateOfBirth", "type": "date", "required": True},
+            {"name": "dateOfDeath", "type": "date", "required": False},
+            {"name": "placeOfBirth", "type": "text", "required": True},
+            {"name": "countryOfBirthCountryId", "type": "text", "required": True},
+            {"name": "nationalityCountryId", "type": "text", "required": True},
+            {"name": "secondNationalityCountryId", "type": "text", "required": False},
+            {"name": "bestChampionshipPosition", "type": "integer", "required": True},
+            {"name": "bestStartingGridPosition", "type": "integer", "required": True},
+            {"name": "bestRaceResult", "type": "integer", "required": True},
+            {"name": "bestSprintRaceResult", "type": "integer", "required": False},
+            {"name": "totalChampionshipWins", "type": "integer", "required": True},
+            {"name": "totalRaceEntries", "type": "integer", "required": True},
+            {"name": "totalRaceStarts", "type": "integer", "required": True},
+            {"name": "totalRaceWins", "type": "integer", "required": True},
+            {"name": "totalRaceLaps", "type": "integer", "required": True},
+            {"name": "totalPodiums", "type": "integer", "required": True},
+            {"name": "totalPoints", "type": "float", "required": True},
+            {"name": "totalChampionshipPoints", "type": "float", "required": True},
+            {"name": "totalPolePositions", "type": "integer", "required": True},
+            {"name": "totalFastestLaps", "type": "integer", "required": True},
+            {"name": "totalSprintRaceStarts", "type": "integer", "required": True},
+            {"name": "totalSprintRaceWins", "type": "integer", "required": True},
+            {"name": "totalDriverOfTheDay", "type": "integer", "required": True},
+            {"name": "totalGrandSlams", "type": "integer", "required": True}
+        ]
+    },
+    "f1db-constructors.json": {
+        # Come nei file f1db originali: su una riga, senza indentazione
+        "json_format": "compact",
+        "primary_key": ["id"],
+        "label": "{name} ({id})",
+        "fields": [
+            {"name": "id", "type": "text", "required": True},
+            {"name": "name", "type": "text", "required": True},
+            {"name": "fullName", "type": "text", "required": True},
+            {"name": "countryId", "type": "text", "required": True},
+            {"name": "bestChampionshipPosition", "type": "integer", "required": True},
+            {"name": "bestStartingGridPosition", "type": "integer", "required": True},
+            {"name": "bestRaceResult", "type": "integer", "required": True},
+            {"name": "bestSprintRaceResult", "type": "integer", "required": False},
+            {"name": "totalChampionshipWins", "type": "integer", "required": True},
+            {"name": "totalRaceEntries", "type": "integer", "required": True},
+            {"name": "totalRaceStarts", "type": "integer", "required": True},
+            {"name": "totalRaceWins", "type": "integer", "required": True},
+            {"name": "total1And2Finishes", "type": "integer", "required": True},
+            {"name": "totalRaceLaps", "type": "integer", "required": True},
+            {"name": "totalPodiums", "type": "integer", "required": True},
+            {"name": "totalPodiumRaces", "type": "integer", "required": True},
+            {"name": "totalPoints", "type": "float", "required": True},
+            {"name": "totalChampionshipPoints", "type": "float", "required": True},
+            {"name": "totalPolePositions", "type": "integer", "required": True},
+            {"name": "totalFastestLaps", "type": "integer", "required": True},
+            {"name": "totalSprintRaceStarts", "type": "integer", "required": True},
+            {"name": "totalSprintRaceWins", "type": "integer", "required": True}
+        ]
+    },
+    "f1db-races.json": {
+        # Come nei file f1db originali: su una riga, senza indentazione
+        "json_format": "compact",
+        "primary_key": ["id"],
+        "label": "{officialName} (Round {round})",
+        "fields": [
+            {"name": "id", "type": "integer", "required": True},
+            {"name": "year", "type": "integer", "required": True},
+            {"name": "round", "type": "integer", "required": True},
+            {"name": "date", "type": "date", "required": True},
+            {"name": "time", "type": "text", "required": True},
+            {"name": "grandPrixId", "type": "text", "required": True},
+            {"name": "officialName", "type": "text", "required": True},
+            {"name": "qualifyingFormat", "type": "select", "options": ["KNOCKOUT", "ONE_SHOT", "GROUP", "ELIMINATION", "TWO_SESSION", "ONE_SESSION", "FOUR_LAPS", "ONE_LAP", "AGGREGATE", "SPRINT_RACE", None], "required": True},
+            {"name": "sprintQualifyingFormat", "type": "select", "options": ["KNOCKOUT", "ONE_SHOT", "GROUP", "ELIMINATION", "SPRINT_SHOOTOUT", None], "required": False},
+            {"name": "circuitId", "type": "text", "required": True},
+            {"name": "circuitType", "type": "select", "options": ["RACE", "SPRINT", "TEST", "STREET", "ROAD"], "required": True},
+            {"name": "direction", "type": "select", "options": ["CLOCKWISE", "ANTI_CLOCKWISE"], "required": True},
+            {"name": "courseLength", "type": "float", "required": True},
+            {"name": "turns", "type": "integer", "required": True},
+            {"name": "laps", "type": "integer", "required": True},
+            {"name": "distance", "type": "float", "required": True},
+            {"name": "scheduledLaps", "type": "integer", "required": False},
+            {"name": "scheduledDistance", "type": "float", "required": False},
+            {"name": "driversChampionshipDecider", "type": "checkbox", "required": True},
+            {"name": "constructorsChampionshipDecider", "type": "checkbox", "required": True},
+            {"name": "preQualifyingDate", "type": "date", "required": False},
+            {"name": "preQualifyingTime", "type": "text", "required": False},
+            {"name": "freePractice1Date", "type": "date", "required": True},
+            {"name": "freePractice1Time", "type": "text", "required": True},
+            {"name": "freePractice2Date", "type": "date", "required": True},
+            {"name": "freePractice2Time", "type": "text", "required": True},
+            {"name": "freePractice3Date", "type": "date", "required": True},
+            {"name": "freePractice3Time", "type": "text", "required": True},
+            {"name": "freePractice4Date", "type": "date", "required": False},
+            {"name": "freePractice4Time", "type": "text", "required": False},
+            {"name": "qualifying1Date", "type": "date", "required": False},
+            {"name": "qualifying1Time", "type": "text", "required": False},
+            {"name": "qualifying2Date", "type": "date", "required": False},
+            {"name": "qualifying2Time", "type": "text", "required": False},
+            {"name": "qualifyingDate", "type": "date", "required": True},
+            {"name": "qualifyingTime", "type": "text", "required": True},
+            {"name": "sprintQualifyingDate", "type": "date", "required": False},
+            {"name": "sprintQualifyingTime", "type": "text", "required": False},
+            {"name": "sprintRaceDate", "type": "date", "required": False},
+            {"name": "sprintRaceTime", "type": "text", "required": False},
+            {"name": "warmingUpDate", "type": "date", "required": False},
+            {"name": "warmingUpTime", "type": "text", "required": False}
+        ]
+    },
+    "f1db-races-race-results.json": {
+        # File grandi e non pensati per la lettura: salvati senza indentazione
+        "json_format": "compact",
+        "primary_key": ["raceId", "driverId"],
+        "label": "Race {raceId} - Driver {driverId}",
+        "fields": [
+            {"name": "raceId", "type": "integer", "required": True},
+            {"name": "year", "type": "integer", "required": True},
+            {"name": "round", "type": "integer", "required": True},
+            {"name": "positionDisplayOrder", "type": "integer", "required": True},
+            {"name": "positionNumber", "type": "integer", "required": True},
+            {"name": "positionText", "type": "text", "required": True},
+            {"name": "driverNumber", "type": "text", "required": True},
+            {"name": "driverId", "type": "text", "required": True},
+            {"name": "constructorId", "type": "text", "required": True},
+            {"name": "engineManufacturerId", "type": "text", "required": True},
+            {"name": "tyreManufacturerId", "type": "text", "required": True},
+            {"name": "sharedCar", "type": "checkbox", "required": True},
+            {"name": "laps", "type": "integer", "required": True},
+            {"name": "time", "type": "text", "required": False},
+            {"name": "timeMillis", "type": "integer", "required": False},
+            {"name": "timePenalty", "type": "text", "required": False},
+            {"name": "timePenaltyMillis", "type": "integer", "required": False},
+            {"name": "gap", "type": "text", "required": True},
+            {"name": "gapMillis", "type": "integer", "required": False},
+            {"name": "gapLaps", "type": "integer", "required": True},
+            {"name": "interval", "type": "text", "required": False},
+            {"name": "intervalMillis", "type": "integer", "required": False},
+            {"name": "reasonRetired", "type": "text", "required": False},
+            {"name": "points", "type": "float", "required": False},
+            {"name": "polePosition", "type": "checkbox", "required": True},
+            {"name": "qualificationPositionNumber", "type": "integer", "required": True},
+            {"name": "qualificationPositionText", "type": "text", "required": True},
+            {"name": "gridPositionNumber", "type": "integer", "required": True},
+            {"name": "gridPositionText", "type": "text", "required": True},
+            {"name": "positionsGained", "type": "integer", "required": True},
+            {"name": "pitStops", "type": "integer", "required": True},
+            {"name": "fastestLap", "type": "checkbox", "required": True},
+            {"name": "driverOfTheDay", "type": "checkbox", "required": True},
+            {"name": "grandSlam", "type": "checkbox", "required": True}
+        ]
+    },
+    "f1db-races-constructor-standings.json": {
+        # File grandi e non pensati per la lettura: salvati senza indentazione
+        "json_format": "compact",
+        "primary_key": ["raceId", "constructorId", "engineManufacturerId"],
+        "label": "Race {raceId} - {constructorId} (Pos {positionNumber})",
+        "fields": [
+            {"name": "raceId", "type": "integer", "required": True},
+            {"name": "year", "type": "integer", "required": True},
+            {"name": "round", "type": "integer", "required": True},
+            {"name": "positionDisplayOrder", "type": "integer", "required": True},
+            {"name": "positionNumber", "type": "integer", "required": True},
+            {"name": "positionText", "type": "text", "required": True},
+            {"name": "constructorId", "type": "text", "required": True},
+            {"name": "engineManufacturerId", "type": "text", "required": True},
+            {"name": "points", "type": "float", "required": True},
+            {"name": "positionsGained", "type": "integer", "required": True},
+            {"name": "championshipWon", "type": "checkbox", "required": True}
+        ]
+    }
+}
+
+# Schemi dedotti dal registro per i file JSON non dichiarati in SCHEMAS (vedi registry.py)
+INFERRED_SCHEMAS = {}
+
+
+def schema_for(filename):
+    """Schema dichiarato del dataset, altrimenti quello dedotto dal registro (None se sconosciuto)"""
+    return SCHEMAS.get(filename) or INFERRED_SCHEMAS.get(filename)
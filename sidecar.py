@@ -0,0 +1,105 @@
+import json
+import os
+import threading
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+except ImportError:  # pyarrow è opzionale: senza sidecar si costruisce il DataFrame dal JSON
+    pa = None
+
+# Sidecar colonnare (Arrow IPC) affiancato al file JSON, che resta il formato sorgente
+SIDECAR_SUFFIX = ".arrow"
+# Sotto questa dimensione costruire il DataFrame dal JSON costa già poco
+SIDECAR_MIN_BYTES = 512 * 1024
+
+_METADATA_KEY = b"source_signature"
+
+
+def sidecar_available():
+    """True se pyarrow è installato"""
+    return pa is not None
+
+
+def sidecar_path(filepath):
+    """Percorso del sidecar colonnare associato a un file JSON"""
+    return filepath + SIDECAR_SUFFIX
+
+
+def _columns(data):
+    """Dati per colonna, con l'unione delle chiavi nell'ordine di comparsa (come pd.DataFrame)"""
+    keys = {}
+    for record in data:
+        keys.update(dict.fromkeys(record))
+    return {key: [record.get(key) for record in data] for key in keys}
+
+
+def write_sidecar(filepath, data, source_signature):
+    """Genera il sidecar per la versione del file JSON identificata da source_signature.
+
+    Restituisce False se pyarrow non è disponibile o se i dati hanno colonne
+    con tipi misti non rappresentabili in Arrow (in quel caso il sidecar
+    esistente viene rimosso, così non resta una versione obsoleta).
+    """
+    if pa is None or source_signature is None:
+        return False
+    path = sidecar_path(filepath)
+    try:
+        table = pa.table(_columns(data))
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        remove_sidecar(filepath)
+        return False
+    table = table.replace_schema_metadata({_METADATA_KEY: json.dumps(list(source_signature))})
+
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with pa_ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+    return True
+
+
+def load_sidecar(filepath, source_signature):
+    """Carica il sidecar via memory-map se corrisponde alla versione del JSON, altrimenti None"""
+    if pa is None or source_signature is None:
+        return None
+    path = sidecar_path(filepath)
+    if not os.path.exists(path):
+        return None
+    try:
+        source = pa.memory_map(path, 'r')
+        table = pa_ipc.open_file(source).read_all()
+    except (OSError, pa.ArrowInvalid):
+        return None
+    metadata = table.schema.metadata or {}
+    if metadata.get(_METADATA_KEY) != json.dumps(list(source_signature)).encode():
+        return None
+    # split_blocks evita il consolidamento in blocchi 2D: le colonne numeriche
+    # senza null restano viste sui buffer mappati in memoria
+    return table.to_pandas(split_blocks=True)
+
+
+def remove_sidecar(filepath):
+    """Rimuove il sidecar (es. quando non è più rappresentabile)"""
+    try:
+        os.remove(sidecar_path(filepath))
+    except FileNotFoundError:
+        pass
+
+
+def build_dataframe(filepath, data, source_signature, journal_pending):
+    """DataFrame del dataset: dal sidecar se aggiornato, altrimenti dalla lista di record.
+
+    Con modifiche ancora nel journal il sidecar (allineato al solo file base)
+    non è utilizzabile; viene rigenerato alla compattazione successiva.
+    """
+    if not journal_pending and source_signature is not None and source_signature[1] >= SIDECAR_MIN_BYTES:
+        df = load_sidecar(filepath, source_signature)
+        if df is not None:
+            return df
+        df = pd.DataFrame(data)
+        write_sidecar(filepath, data, source_signature)
+        return df
+    return pd.DataFrame(data)
@@ -0,0 +1,312 @@
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+import jsonio
+from indexes import INDEX_COLUMNS
+
+# Affinità SQLite delle colonne per tipo di campo dello schema
+SQL_TYPES = {
+    "text": "TEXT",
+    "select": "TEXT",
+    "date": "TEXT",
+    "integer": "INTEGER",
+    "float": "REAL",
+    "checkbox": "INTEGER",
+}
+
+# Record per executemany negli inserimenti
+INSERT_BATCH_SIZE = 1000
+
+
+def table_name(filename):
+    """Nome della tabella di un dataset (es. f1db-races.json -> f1db_races)"""
+    return os.path.splitext(filename)[0].replace("-", "_").replace(".", "_")
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _column_value(value):
+    # Liste e oggetti annidati non hanno un tipo SQLite: nella colonna finisce il loro JSON
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    return jsonio.dumps(value).decode('utf-8')
+
+
+class SqliteStore:
+    """Dataset in un database SQLite: una tabella per file, con colonne e indici derivati da SCHEMAS.
+
+    Ogni riga conserva il record originale (doc, JSON compatto) e la sua
+    posizione nel dataset (pos); le colonne dello schema ne sono una copia
+    tipizzata per filtri e indici. I record tornano dai doc nell'ordine di
+    pos. La tabella _versions conta le scritture di ogni dataset e fa da
+    firma per le cache in memoria; _sources conserva i byte del file JSON
+    importato, validi finché il dataset non viene modificato.
+    """
+
+    def __init__(self, path, schemas):
+        self.path = path
+        self.schemas = schemas
+        self._local = threading.local()
+
+    def _connection(self):
+        # Una connessione per thread: sqlite3 non le condivide tra thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            # WAL: le letture non bloccano e non sono bloccate dalla scrittura in corso
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS _versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS _sources (name TEXT PRIMARY KEY, version INTEGER NOT NULL, raw BLOB NOT NULL)")
+            self._local.conn = conn
+        return conn
+
+    def _fields(self, filename):
+        schema = self.schemas.get(filename)
+        return [field["name"] for field in schema["fields"]] if schema else []
+
+    def indexed_columns(self, filename):
+        """Colonne con indice secondario (quelle di INDEX_COLUMNS presenti nello schema)"""
+        fields = self._fields(filename)
+        return [column for column in INDEX_COLUMNS if column in fields]
+
+    def _create_table(self, conn, filename):
+        table = table_name(filename)
+        # Dataset senza schema dichiarato: solo posizione e record
+        schema = self.schemas.get(filename) or {"fields": []}
+        columns = "".join(
+            f", {_quote(field['name'])} {SQL_TYPES.get(field['type'], '')}".rstrip() for field in schema["fields"]
+        )
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (pos INTEGER NOT NULL, doc BLOB NOT NULL{columns})")
+        conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {table}__pos ON {table} (pos)")
+        # Indice non univoco sulla chiave primaria: i dati esistenti possono avere duplicati
+        key = ", ".join(_quote(name) for name in schema.get("primary_key", []))
+        if key:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {table}__pk ON {table} ({key})")
+        for column in self.indexed_columns(filename):
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {table}__{column} ON {table} ({_quote(column)}, pos)")
+        conn.execute("INSERT OR IGNORE INTO _versions (name, version) VALUES (?, 0)", (table,))
+
+    def exists(self, filename):
+        """True se il dataset è già stato creato o importato nel database"""
+        return self.version(filename) is not None
+
+    def version(self, filename):
+        """Numero di scritture del dataset (None se la tabella non esiste)"""
+        row = self._connection().execute(
+            "SELECT version FROM _versions WHERE name = ?", (table_name(filename),)
+        ).fetchone()
+        return row[0] if row else None
+
+    def load(self, filename):
+        """Record del dataset nell'ordine originale e versione letta nella stessa transazione"""
+        conn = self._connection()
+        conn.execute("BEGIN")
+        try:
+            version = self.version(filename)
+            if version is None:
+                return [], None
+            docs = [row[0] for row in conn.execute(f"SELECT doc FROM {table_name(filename)} ORDER BY pos")]
+        finally:
+            conn.execute("COMMIT")
+        # Un solo parsing per l'intero array invece di uno per record
+        return jsonio.loads(b"[" + b",".join(docs) + b"]"), version
+
+    def source(self, filename):
+        """Byte del file JSON importato, None se il dataset è stato modificato dopo l'import"""
+        row = self._connection().execute(
+            "SELECT raw FROM _sources JOIN _versions USING (name, version) WHERE name = ?", (table_name(filename),)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _rows(self, filename, records, start):
+        fields = self._fields(filename)
+        for offset, record in enumerate(records):
+            yield (start + offset, jsonio.dumps(record), *[_column_value(record.get(name)) for name in fields])
+
+    def _insert(self, conn, filename, records, start):
+        fields = self._fields(filename)
+        sql = (f"INSERT INTO {table_name(filename)} ({', '.join(['pos', 'doc', *map(_quote, fields)])}) "
+               f"VALUES ({', '.join('?' * (len(fields) + 2))})")
+        count = 0
+        rows = self._rows(filename, records, start)
+        while True:
+            batch = [row for _, row in zip(range(INSERT_BATCH_SIZE), rows)]
+            if not batch:
+                return count
+            conn.executemany(sql, batch)
+            count += len(batch)
+
+    def _bump(self, conn, filename, expected_version=None):
+        table = table_name(filename)
+        if expected_version is None:
+            conn.execute("UPDATE _versions SET version = version + 1 WHERE name = ?", (table,))
+        elif conn.execute("UPDATE _versions SET version = version + 1 WHERE name = ? AND version = ?",
+                          (table, expected_version)).rowcount == 0:
+            return None
+        # I byte del file importato non corrispondono più al dataset
+        conn.execute("DELETE FROM _sources WHERE name = ?", (table,))
+        return conn.execute("SELECT version FROM _versions WHERE name = ?", (table,)).fetchone()[0]
+
+    def replace(self, filename, records, allow_empty=False, raw=None):
+        """Sostituisce il dataset con un iterabile di record in un'unica transazione.
+
+        raw sono i byte del file JSON da cui vengono i record (import), per
+        un export identico al file. Restituisce (record scritti, nuova
+        versione); senza allow_empty un iterabile vuoto lascia il dataset
+        invariato e restituisce (0, None).
+        """
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._create_table(conn, filename)
+            conn.execute(f"DELETE FROM {table_name(filename)}")
+            count = self._insert(conn, filename, records, 0)
+            if count == 0 and not allow_empty:
+                conn.execute("ROLLBACK")
+                return 0, None
+            version = self._bump(conn, filename)
+            if raw is not None:
+                conn.execute("INSERT INTO _sources (name, version, raw) VALUES (?, ?, ?)",
+                             (table_name(filename), version, raw))
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return count, version
+
+    def apply_ops(self, filename, ops, expected_version):
+        """Applica le operazioni del journal (insert/update/delete) in un'unica transazione.
+
+        Se nel frattempo il dataset è passato a un'altra versione non scrive
+        nulla e restituisce None, altrimenti la nuova versione.
+        """
+        table = table_name(filename)
+        fields = self._fields(filename)
+        assignments = ", ".join(f"{_quote(name)} = ?" for name in ["doc", *fields])
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._create_table(conn, filename)
+            version = self._bump(conn, filename, expected_version or 0)
+            if version is None:
+                conn.execute("ROLLBACK")
+                return None
+            size = None
+            for op in ops:
+                if op["op"] == "insert":
+                    if size is None:
+                        size = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                    size += self._insert(conn, filename, op["records"], size)
+                elif op["op"] == "update":
+                    _, doc, *values = next(self._rows(filename, [op["record"]], op["index"]))
+                    conn.execute(f"UPDATE {table} SET {assignments} WHERE pos = ?", (doc, *values, op["index"]))
+                elif op["op"] == "delete":
+                    conn.execute(f"DELETE FROM {table} WHERE pos = ?", (op["index"],))
+                    # In due passaggi: uno spostamento diretto violerebbe l'unicità di pos a metà UPDATE
+                    conn.execute(f"UPDATE {table} SET pos = -pos - 1 WHERE pos > ?", (op["index"],))
+                    conn.execute(f"UPDATE {table} SET pos = -pos - 2 WHERE pos < 0")
+                    if size is not None:
+                        size -= 1
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return version
+
+    def _where_positions(self, positions):
+        # Le posizioni candidate arrivano come array JSON, senza limiti sul numero di parametri
+        return "pos IN (SELECT value FROM json_each(?))", jsonio.dumps(np.asarray(positions).tolist())
+
+    def _query(self, filename, sql, params):
+        """Righe di una query e versione del dataset lette nella stessa transazione"""
+        conn = self._connection()
+        conn.execute("BEGIN")
+        try:
+            version = self.version(filename)
+            rows = conn.execute(sql, params).fetchall()
+        finally:
+            conn.execute("COMMIT")
+        return rows, version
+
+    def distinct(self, filename, column, positions=None):
+        """Valori distinti ordinati della colonna, eventualmente ristretti a un sottoinsieme di righe.
+
+        Restituisce (valori, versione del dataset su cui è stata eseguita la query).
+        """
+        sql = f"SELECT DISTINCT {_quote(column)} FROM {table_name(filename)} WHERE {_quote(column)} IS NOT NULL"
+        params = ()
+        if positions is not None:
+            condition, param = self._where_positions(positions)
+            sql += f" AND {condition}"
+            params = (param,)
+        rows, version = self._query(filename, f"{sql} ORDER BY 1", params)
+        return [row[0] for row in rows], version
+
+    def positions(self, filename, filters, positions=None):
+        """Posizioni ordinate delle righe con colonna == valore per ogni filtro {colonna: valore}.
+
+        Restituisce (posizioni, versione del dataset su cui è stata eseguita la query).
+        """
+        conditions = [f"{_quote(column)} = ?" for column in filters]
+        params = list(filters.values())
+        if positions is not None:
+            condition, param = self._where_positions(positions)
+            conditions.append(condition)
+            params.append(param)
+        where = " AND ".join(conditions) or "1"
+        rows, version = self._query(filename, f"SELECT pos FROM {table_name(filename)} WHERE {where} ORDER BY pos", params)
+        return np.fromiter((row[0] for row in rows), dtype=np.intp, count=len(rows)), version
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class SqliteIndex:
+    """Indici secondari di un dataset SQLite, con la stessa interfaccia di DatasetIndex.
+
+    Filtri e valori distinti sono query sugli indici della tabella invece che
+    posting list in memoria. L'indice vale per la versione del dataset con cui
+    è stato creato: se un altro processo scrive nel database (inserimenti,
+    modifiche o eliminazioni) le query passano all'indice in memoria costruito
+    da fallback(), sui record di quella versione.
+    """
+
+    def __init__(self, store, filename, version, fallback):
+        self.store = store
+        self.filename = filename
+        self.version = version
+        self.columns = set(store.indexed_columns(filename))
+        self._fallback = fallback
+        self._memory = None
+
+    def __contains__(self, column):
+        return column in self.columns
+
+    def _run(self, query, *args):
+        """Risultato della query sul database, None se il database è già a un'altra versione"""
+        if self._memory is None:
+            result, version = query(self.filename, *args)
+            if version == self.version:
+                return result
+            self._memory = self._fallback()
+        return None
+
+    def distinct_values(self, column, positions=None):
+        result = self._run(self.store.distinct, column, positions)
+        return result if result is not None else self._memory.distinct_values(column, positions)
+
+    def filter(self, column, value, positions=None):
+        result = self._run(self.store.positions, {column: value}, positions)
+        return result if result is not None else self._memory.filter(column, value, positions)
+
+    def lookup(self, filters):
+        result = self._run(self.store.positions, filters)
+        return result if result is not None else self._memory.lookup(filters)
@@ -0,0 +1,311 @@
+import numpy as np
+import pandas as pd
+
+from storage import (
+    dataset_exists, load_dataframe, load_index, load_json_file, save_json_file, upsert_records
+)
+
+# Sorgenti delle classifiche
+RESULTS_FILE = "f1db-races-race-results.json"
+RACES_FILE = "f1db-races.json"
+
+# Classifiche derivate: campi che identificano il concorrente e prima stagione del campionato
+STANDINGS = {
+    "f1db-races-driver-standings.json": {"entity": ("driverId",), "first_year": 1950},
+    "f1db-races-constructor-standings.json": {"entity": ("constructorId", "engineManufacturerId"), "first_year": 1958},
+}
+
+
+class IncompleteResults(Exception):
+    """I risultati gara non bastano a ricalcolare la classifica di una stagione"""
+
+
+def _results_frame(year=None):
+    """Risultati gara (tutti o di una stagione) con le colonne usate dal calcolo"""
+    if not dataset_exists(RESULTS_FILE):
+        raise FileNotFoundError(f"{RESULTS_FILE} non trovato: le classifiche si calcolano dai risultati gara")
+    df = load_dataframe(RESULTS_FILE)
+    if year is not None:
+        index = load_index(RESULTS_FILE)
+        if 'year' in index:
+            df = df.iloc[index.filter('year', year)]
+        else:
+            df = df[df['year'] == year]
+    return df
+
+
+def _scheduled_rounds(year=None):
+    """Numero di gare in calendario per stagione (None se il calendario non c'è)"""
+    if not dataset_exists(RACES_FILE):
+        return None
+    races = load_dataframe(RACES_FILE)
+    if year is not None:
+        races = races[races['year'] == year]
+    return races.groupby('year')['round'].max()
+
+
+def _season_gaps(results, year, stored, entity):
+    """Motivi per cui i risultati di una stagione non coprono le righe da ricalcolare (lista vuota se le coprono).
+
+    Servono i risultati di tutte le gare in calendario fino all'ultimo round
+    con risultati, e di ogni concorrente già in classifica in quei round:
+    altrimenti il ricalcolo cancellerebbe righe che nessun risultato sostiene.
+    """
+    rounds = pd.to_numeric(results['round'], errors='coerce') if 'round' in results.columns else pd.Series(dtype=float)
+    played = set(rounds.dropna().astype(int).tolist())
+    if not played:
+        return ["nessun risultato nella stagione"] if stored else []
+    last_round = max(played)
+    expected = set(range(1, last_round + 1))
+    if dataset_exists(RACES_FILE):
+        races = load_dataframe(RACES_FILE)
+        calendar = pd.to_numeric(races.loc[races['year'] == year, 'round'], errors='coerce').dropna().astype(int)
+        if not calendar.empty:
+            expected = {rnd for rnd in calendar.tolist() if rnd <= last_round}
+    gaps = []
+    missing = sorted(expected - played)
+    if missing:
+        gaps.append(f"{len(missing)} gare in calendario senza risultati (dal round {missing[0]})")
+    entity = list(entity)
+    if all(field in results.columns for field in entity):
+        entrants = set(results[entity].itertuples(index=False, name=None))
+        absent = {
+            tuple(record.get(field) for field in entity) for record in stored
+            if (record.get('round') or 0) <= last_round
+        } - entrants
+        if absent:
+            gaps.append(f"{len(absent)} in classifica senza risultati")
+    return gaps
+
+
+def json_number(value):
+    # Punti interi come nei file f1db (9, non 9.0)
+    return int(value) if float(value).is_integer() else value
+
+
+def compute_standings(results, entity, first_year=None, scheduled=None):
+    """Classifiche gara per gara dai risultati, con operazioni vettoriali per tutte le stagioni presenti.
+
+    Punti: somma cumulata dei punti dei risultati nella stagione; a parità
+    di punti decide il conteggio dei piazzamenti (vittorie, poi secondi
+    posti, ...), a parità completa la posizione è condivisa. In classifica
+    compare chi ha almeno un risultato nella stagione fino a quel round.
+    Il titolo è assegnato dal round in cui il distacco del secondo supera i
+    punti ancora disponibili (gare in calendario per il massimo ottenuto in
+    una gara nella stagione), altrimenti all'ultima gara in calendario.
+    Scarti e regole storiche particolari non sono modellati.
+    """
+    entity = list(entity)
+    keys = ['year', 'round', *entity]
+    columns = [column for column in ['raceId', *keys, 'points', 'positionNumber'] if column in results.columns]
+    if any(column not in columns for column in ['raceId', *keys]):
+        return []
+    res = results[columns].dropna(subset=keys)
+    if first_year is not None:
+        res = res[res['year'] >= first_year]
+    if res.empty:
+        return []
+    res = res.astype({'year': int, 'round': int})
+
+    # Griglia: ogni concorrente in ogni round giocato della stagione dal suo primo risultato
+    played = res[['year', 'round', 'raceId']].drop_duplicates(['year', 'round']).sort_values(['year', 'round'])
+    first = res.groupby(['year', *entity], sort=False)['round'].min().rename('first_round').reset_index()
+    grid = first.merge(played, on='year')
+    grid = grid[grid['round'] >= grid['first_round']].sort_values(['year', *entity, 'round'], ignore_index=True)
+    size = len(grid)
+    rows = res.merge(grid[keys].assign(row=np.arange(size)), on=keys)['row'].to_numpy()
+
+    # Punti e piazzamenti di ogni concorrente in ogni gara, poi cumulati nella stagione
+    def numeric(column):
+        if column not in res.columns:
+            return np.full(len(res), np.nan)
+        return pd.to_numeric(res[column], errors='coerce').to_numpy(dtype=float)
+
+    points = np.nan_to_num(numeric('points'))
+    finish = numeric('positionNumber')
+    valid = ~np.isnan(finish) & (finish >= 1)
+    depth = int(finish[valid].max()) if valid.any() else 0
+    race_points = np.bincount(rows, weights=points, minlength=size)
+    counts = np.zeros((size, depth))
+    np.add.at(counts, (rows[valid], finish[valid].astype(int) - 1), 1)
+    season_entity = grid.groupby(['year', *entity], sort=False).ngroup().to_numpy()
+    totals = pd.DataFrame(np.column_stack([race_points, counts])).groupby(season_entity).cumsum().to_numpy()
+
+    # Ordine in ogni round: punti, poi conteggio dei piazzamenti; a parità l'id del concorrente
+    year = grid['year'].to_numpy()
+    rnd = grid['round'].to_numpy()
+    order = np.lexsort([np.arange(size), *(-totals[:, k] for k in range(depth, 0, -1)), -totals[:, 0], rnd, year])
+    ranked = totals[order]
+    new_round = np.ones(size, dtype=bool)
+    new_round[1:] = (year[order][1:] != year[order][:-1]) | (rnd[order][1:] != rnd[order][:-1])
+    new_block = new_round.copy()
+    new_block[1:] |= (ranked[1:] != ranked[:-1]).any(axis=1)
+    sequence = np.arange(size)
+    round_start = np.maximum.accumulate(np.where(new_round, sequence, 0))
+    block_start = np.maximum.accumulate(np.where(new_block, sequence, 0))
+    display = np.empty(size, dtype=int)
+    position = np.empty(size, dtype=int)
+    display[order] = sequence - round_start + 1
+    position[order] = block_start - round_start + 1
+
+    # Posizioni guadagnate rispetto al round precedente; chi entra in classifica parte
+    # dalla posizione dopo l'ultimo del round precedente, il primo round della stagione non ha valore
+    round_size = grid.groupby(['year', 'round']).size().rename('size').reset_index()
+    round_size['previous_size'] = round_size.groupby('year')['size'].shift()
+    previous_size = grid[['year', 'round']].merge(round_size, on=['year', 'round'], how='left')['previous_size'].to_numpy()
+    entering = np.ones(size, dtype=bool)
+    entering[1:] = season_entity[1:] != season_entity[:-1]
+    previous = np.where(entering, previous_size + 1, np.roll(position, 1))
+    gained = previous - position
+
+    # Titolo: primo round in cui il campionato è deciso, dal leader di quel round in poi
+    first_place, second_place = display == 1, display == 2
+    summary = grid.loc[first_place, ['year', 'round']].assign(
+        leader=totals[first_place, 0], champion=season_entity[first_place]
+    ).merge(
+        grid.loc[second_place, ['year', 'round']].assign(second=totals[second_place, 0]), on=['year', 'round'], how='left'
+    ).merge(
+        pd.DataFrame({'year': year, 'round': rnd, 'best_race': race_points}).groupby(['year', 'round'], as_index=False).max(),
+        on=['year', 'round']
+    ).sort_values(['year', 'round'], ignore_index=True)
+    best_race = summary.groupby('year')['best_race'].cummax()
+    last_round = summary.groupby('year')['round'].transform('max')
+    if scheduled is not None:
+        last_round = np.maximum(summary['year'].map(scheduled).fillna(last_round), last_round)
+    remaining = last_round - summary['round']
+    summary['decided'] = (remaining == 0) | (summary['leader'] - summary['second'].fillna(0) > remaining * best_race)
+    decided = summary[summary['decided']].groupby('year').first()
+    won = (grid['year'].map(decided['champion']).to_numpy() == season_entity) & \
+        (rnd >= grid['year'].map(decided['round']).fillna(np.inf).to_numpy())
+
+    columns = {
+        'raceId': grid['raceId'].tolist(),
+        'year': year.tolist(),
+        'round': rnd.tolist(),
+        'positionDisplayOrder': display.tolist(),
+        'positionNumber': position.tolist(),
+        'positionText': [str(value) for value in position.tolist()],
+        **{field: grid[field].tolist() for field in entity},
+        'points': [json_number(value) for value in totals[:, 0].tolist()],
+        'positionsGained': [None if np.isnan(value) else int(value) for value in gained.tolist()],
+        'championshipWon': won.tolist(),
+    }
+    names = list(columns)
+    records = [dict(zip(names, values)) for values in zip(*columns.values())]
+    return [records[i] for i in order]
+
+
+def _standing_key(record, entity):
+    return (record.get('raceId'), *(record.get(field) for field in entity))
+
+
+def _write_changes(filename, entity, stored, computed):
+    """Scrive le differenze tra le righe salvate [(posizione, record)] e quelle calcolate in un unico commit.
+
+    Le righe con la stessa chiave (gara e concorrente) vengono aggiornate sul
+    posto, quelle non più in classifica eliminate, le nuove aggiunte in coda.
+    """
+    pending = {_standing_key(record, entity): record for record in computed}
+    updates, deletes = [], []
+    for position, record in stored:
+        new_record = pending.pop(_standing_key(record, entity), None)
+        if new_record is None:
+            deletes.append((position, record))
+        elif new_record != record:
+            updates.append((position, new_record, record))
+    inserts = list(pending.values())
+    upsert_records(filename, updates, inserts, deletes)
+    return {"updated": len(updates), "inserted": len(inserts), "deleted": len(deletes)}
+
+
+def refresh_standings(filename, year, from_round=1):
+    """Ricalcola la classifica di una stagione dal round from_round in poi e salva solo le righe cambiate.
+
+    Il calcolo legge i soli risultati della stagione (indice per anno);
+    i round precedenti a from_round restano invariati. Se i risultati non
+    coprono la stagione (vedi _season_gaps) non si scrive nulla e viene
+    sollevata IncompleteResults.
+    """
+    config = STANDINGS[filename]
+    entity = config["entity"]
+    results = _results_frame(year)
+    data = load_json_file(filename)
+    index = load_index(filename)
+    if 'year' in index:
+        positions = index.filter('year', year).tolist()
+    else:
+        positions = [i for i, record in enumerate(data) if record.get('year') == year]
+    season = [data[i] for i in positions]
+    if year >= config["first_year"]:
+        gaps = _season_gaps(results, year, season, entity)
+        if gaps:
+            raise IncompleteResults(f"{filename}, stagione {year}: " + "; ".join(gaps))
+    computed = [
+        record for record in compute_standings(results, entity, config["first_year"], _scheduled_rounds(year))
+        if record['round'] >= from_round
+    ]
+    stored = [(i, data[i]) for i in positions if (data[i].get('round') or 0) >= from_round]
+    return _write_changes(filename, entity, stored, computed)
+
+
+def refresh_for_results(records):
+    """Aggiorna le classifiche dopo una scrittura dei risultati gara.
+
+    records sono i risultati aggiunti, modificati (versione vecchia e nuova)
+    o eliminati: per ogni stagione toccata si ricalcola dal primo round toccato.
+    Le stagioni non coperte dai risultati restano invariate e finiscono in
+    "skipped" con il motivo.
+    """
+    seasons = {}
+    for record in records:
+        year, rnd = record.get('year'), record.get('round')
+        if isinstance(year, int) and isinstance(rnd, int):
+            seasons[year] = min(rnd, seasons.get(year, rnd))
+    changes = {}
+    for filename in STANDINGS:
+        if not dataset_exists(filename):
+            continue
+        totals = changes.setdefault(filename, {"updated": 0, "inserted": 0, "deleted": 0, "skipped": []})
+        for year, from_round in sorted(seasons.items()):
+            try:
+                counts = refresh_standings(filename, year, from_round)
+            except IncompleteResults as e:
+                totals["skipped"].append(str(e))
+                continue
+            for name, count in counts.items():
+                totals[name] += count
+    return changes
+
+
+def rebuild_standings(filename, write=False):
+    """Ricalcolo completo della classifica da tutti i risultati, per verifica.
+
+    Restituisce le differenze rispetto al file salvato (righe mancanti, in più
+    e con valori diversi); con write=True il file viene riscritto con le righe
+    calcolate, in ordine di stagione, round e posizione.
+    """
+    config = STANDINGS[filename]
+    entity = config["entity"]
+    computed = compute_standings(_results_frame(), entity, config["first_year"], _scheduled_rounds())
+    stored = load_json_file(filename) if dataset_exists(filename) else []
+    expected = {_standing_key(record, entity): record for record in computed}
+    missing = dict(expected)
+    extra, different = [], []
+    for record in stored:
+        new_record = missing.pop(_standing_key(record, entity), None)
+        if new_record is None:
+            extra.append(record)
+        elif new_record != record:
+            fields = sorted(name for name in new_record.keys() | record.keys() if new_record.get(name) != record.get(name))
+            different.append({"stored": record, "computed": new_record, "fields": fields})
+    report = {
+        "dataset": filename,
+        "rows_computed": len(computed),
+        "rows_stored": len(stored),
+        "missing": list(missing.values()),
+        "extra": extra,
+        "different": different,
+    }
+    if write:
+        save_json_file(filename, computed)
+    return report
@@ -0,0 +1,160 @@
+import os
+from collections import Counter
+
+import jsonio
+from storage import load_derived
+
+# Estensione del file di statistiche affiancato al dataset
+STATS_SUFFIX = ".stats"
+
+
+def stats_path(filepath):
+    """Percorso del file di statistiche associato a un file JSON"""
+    return filepath + STATS_SUFFIX
+
+
+def _is_missing(value):
+    # Come `not d.get(campo)` nella vecchia metrica, ma 0 e False sono valori validi
+    return value is None or value == ""
+
+
+class DatasetStats:
+    """Statistiche di un dataset: numero di record e, per colonna, valori distinti,
+    valori mancanti (assenti, None o "") e min/max.
+
+    Per ogni colonna viene mantenuto il conteggio di ogni valore, così
+    inserimenti, modifiche ed eliminazioni aggiornano le statistiche senza
+    riscorrere il dataset (apply_ops, chiamata dalle scritture del journal).
+    """
+
+    def __init__(self, rows, counts, filled):
+        self.rows = rows
+        self._counts = counts   # colonna -> Counter valore -> occorrenze
+        self._filled = filled   # colonna -> record con un valore non mancante
+        self._ranges = {}
+
+    @classmethod
+    def build(cls, data):
+        columns = dict.fromkeys(key for record in data for key in record)
+        counts = {}
+        filled = {}
+        for column in columns:
+            counter = Counter()
+            present = 0
+            for record in data:
+                value = record.get(column)
+                if _is_missing(value):
+                    continue
+                present += 1
+                try:
+                    counter[value] += 1
+                except TypeError:
+                    # Liste e oggetti annidati: contano come presenti ma non come valori distinti
+                    pass
+            counts[column] = counter
+            filled[column] = present
+        return cls(len(data), counts, filled)
+
+    def distinct(self, column):
+        """Numero di valori distinti (non mancanti) della colonna"""
+        counter = self._counts.get(column)
+        return len(counter) if counter else 0
+
+    def missing(self, column):
+        """Record in cui la colonna è assente, None o stringa vuota"""
+        return self.rows - self._filled.get(column, 0)
+
+    def _range(self, column):
+        if column not in self._ranges:
+            values = list(self._counts.get(column, ()))
+            try:
+                self._ranges[column] = (min(values), max(values)) if values else (None, None)
+            except TypeError:
+                # Tipi non confrontabili tra loro: ordine della rappresentazione testuale
+                self._ranges[column] = (min(values, key=str), max(values, key=str))
+        return self._ranges[column]
+
+    def min(self, column):
+        return self._range(column)[0]
+
+    def max(self, column):
+        return self._range(column)[1]
+
+    def summary(self):
+        """Una riga per colonna: distinti, mancanti, min e max"""
+        return [
+            {"column": column, "distinct": self.distinct(column), "missing": self.missing(column),
+             "min": self.min(column), "max": self.max(column)}
+            for column in self._counts
+        ]
+
+    def _account(self, record, sign):
+        for column, value in record.items():
+            if _is_missing(value):
+                continue
+            counter = self._counts.get(column)
+            if counter is None:
+                counter = self._counts[column] = Counter()
+            self._filled[column] = self._filled.get(column, 0) + sign
+            try:
+                counter[value] += sign
+            except TypeError:
+                continue
+            if counter[value] <= 0:
+                del counter[value]
+
+    def apply_ops(self, ops, old_data, new_data):
+        """Nuove statistiche con le operazioni del journal applicate (copy-on-write)"""
+        stats = DatasetStats(
+            self.rows,
+            {column: Counter(counter) for column, counter in self._counts.items()},
+            dict(self._filled)
+        )
+        current = list(old_data) if any(op["op"] != "insert" for op in ops) else None
+        for op in ops:
+            if op["op"] == "insert":
+                for record in op["records"]:
+                    stats._account(record, 1)
+                stats.rows += len(op["records"])
+                if current is not None:
+                    current.extend(op["records"])
+            elif op["op"] == "update":
+                stats._account(current[op["index"]], -1)
+                stats._account(op["record"], 1)
+                current[op["index"]] = op["record"]
+            elif op["op"] == "delete":
+                stats._account(current.pop(op["index"]), -1)
+                stats.rows -= 1
+        return stats
+
+    def persist(self, filepath, base_signature):
+        """Salva le statistiche accanto al dataset, valide per la versione base_signature del file"""
+        content = jsonio.dumps({
+            "signature": list(base_signature),
+            "rows": self.rows,
+            "filled": self._filled,
+            "counts": {column: list(counter.items()) for column, counter in self._counts.items()},
+        })
+        path = stats_path(filepath)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def restore(cls, filepath, base_signature):
+        """Statistiche salvate per la versione base_signature del file, None se assenti o obsolete"""
+        try:
+            with open(stats_path(filepath), 'rb') as f:
+                content = jsonio.loads(f.read())
+        except (OSError, jsonio.DecodeError):
+            return None
+        if content.get("signature") != list(base_signature):
+            return None
+        counts = {column: Counter(dict(items)) for column, items in content["counts"].items()}
+        return cls(content["rows"], counts, content["filled"])
+
+
+def load_stats(filename):
+    """Statistiche della versione corrente del dataset"""
+    return load_derived(filename, "stats", DatasetStats.build, restore=DatasetStats.restore)
@@ -0,0 +1,737 @@
+import os
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: solo il lock tra i thread dello stesso processo
+    fcntl = None
+
+from journal import append_journal, apply_ops, clear_journal, journal_path, read_journal
+from sidecar import SIDECAR_MIN_BYTES, build_dataframe, write_sidecar
+from indexes import DatasetIndex
+from sqlite_store import SqliteIndex, SqliteStore
+from streaming import iter_chunks
+from schemas import SCHEMAS, schema_for
+import jsonio
+
+# Directory per i file JSON
+DATA_DIR = "data"
+
+# Dove vivono i dataset: "json" (file in DATA_DIR con journal) o "sqlite" (database SQLITE_PATH).
+# Con "sqlite" un dataset assente dal database viene importato dal file JSON al primo accesso
+STORAGE_BACKEND = os.environ.get("F1DB_STORAGE_BACKEND", "json")
+SQLITE_PATH = os.environ.get("F1DB_SQLITE_PATH", os.path.join(DATA_DIR, "f1db.sqlite"))
+STORAGE_BACKENDS = ("json", "sqlite")
+if STORAGE_BACKEND not in STORAGE_BACKENDS:
+    raise ValueError(f"F1DB_STORAGE_BACKEND non valido: {STORAGE_BACKEND!r} (valori: {', '.join(STORAGE_BACKENDS)})")
+
+
+class DatasetCache:
+    """Cache dei dataset già parsati, condivisa tra tutte le sessioni del processo.
+
+    Ogni voce è indicizzata per percorso e validata con la firma del file
+    base e del suo journal (mtime, dimensione, inode): una modifica esterna
+    cambia la firma e la voce viene scartata alla lettura successiva. I dati
+    restituiti sono condivisi, quindi vanno trattati in sola lettura.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, filepath, signature):
+        """Restituisce i dati in cache se la firma coincide, altrimenti None"""
+        with self._lock:
+            entry = self._entries.get(filepath)
+            if entry is not None and entry[0] == signature:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, filepath, signature, data):
+        """Memorizza i dati parsati per una data firma del file"""
+        with self._lock:
+            self._entries[filepath] = (signature, data)
+
+    def retag(self, filepath, old_signature, new_signature):
+        """Riassocia una voce a una nuova firma quando il contenuto non cambia (es. compattazione)"""
+        with self._lock:
+            entry = self._entries.get(filepath)
+            if entry is not None and entry[0] == old_signature:
+                self._entries[filepath] = (new_signature, entry[1])
+
+    def invalidate(self, filepath=None):
+        """Rimuove una voce (o tutte se filepath è None)"""
+        with self._lock:
+            if filepath is None:
+                self.invalidations += len(self._entries)
+                self._entries.clear()
+            elif self._entries.pop(filepath, None) is not None:
+                self.invalidations += 1
+
+    def stats(self):
+        """Statistiche di utilizzo della cache"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+# Il modulo viene importato una sola volta per processo, quindi la cache
+# sopravvive ai rerun di Streamlit ed è condivisa tra le sessioni
+_cache = DatasetCache()
+# DataFrame dei dataset, indicizzati con la stessa firma della cache dei dati
+_frame_cache = DatasetCache()
+# Indici secondari per i filtri, ricostruiti solo quando cambia la versione del dataset
+_index_cache = DatasetCache()
+
+
+def file_signature(stat_result):
+    """Firma di un file usata come chiave di validità della cache"""
+    return (stat_result.st_mtime_ns, stat_result.st_size, stat_result.st_ino)
+
+
+def _path_signature(path):
+    """Firma di un file dato il percorso, None se non esiste"""
+    try:
+        return file_signature(os.stat(path))
+    except FileNotFoundError:
+        return None
+
+
+# Un lock per file serializza scritture, compattazione e letture non in cache
+_file_locks = {}
+_file_locks_guard = threading.Lock()
+
+
+def _lock_for(filepath):
+    with _file_locks_guard:
+        lock = _file_locks.get(filepath)
+        if lock is None:
+            lock = _file_locks[filepath] = threading.RLock()
+        return lock
+
+
+# Estensione del file usato per il lock di scrittura tra processi
+LOCK_SUFFIX = ".lock"
+
+
+class _WriteLock:
+    """Lock di scrittura di un dataset: il lock del file tra i thread più flock tra i processi
+    (più server Streamlit o la CLI sullo stesso DATA_DIR). Rientrante nello stesso thread.
+    """
+
+    def __init__(self, filepath, lock):
+        self.filepath = filepath
+        self._lock = lock
+        self._depth = 0
+        self._fd = None
+
+    def __enter__(self):
+        self._lock.acquire()
+        if self._depth == 0 and fcntl is not None:
+            try:
+                fd = os.open(self.filepath + LOCK_SUFFIX, os.O_RDWR | os.O_CREAT, 0o644)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                except BaseException:
+                    os.close(fd)
+                    raise
+            except BaseException:
+                self._lock.release()
+                raise
+            self._fd = fd
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        self._depth -= 1
+        if self._depth == 0 and self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+        self._lock.release()
+
+
+_write_locks = {}
+
+
+def _write_lock(filepath):
+    lock = _lock_for(filepath)
+    with _file_locks_guard:
+        write_lock = _write_locks.get(filepath)
+        if write_lock is None:
+            write_lock = _write_locks[filepath] = _WriteLock(filepath, lock)
+        return write_lock
+
+
+_store = None
+
+
+def get_sqlite_store():
+    """Database SQLite dei dataset, None con il backend a file JSON"""
+    global _store
+    if STORAGE_BACKEND != "sqlite":
+        return None
+    with _file_locks_guard:
+        if _store is None:
+            _store = SqliteStore(SQLITE_PATH, SCHEMAS)
+        return _store
+
+
+def _sqlite_signature(version):
+    # Nessun journal: la versione del dataset nel database è l'intera firma
+    return (("sqlite", version), None) if version is not None else (None, None)
+
+
+def _load_sqlite(store, filepath):
+    filename = os.path.basename(filepath)
+    version = store.version(filename)
+    if version is None and os.path.exists(filepath):
+        # Primo accesso con il backend SQLite: importa il file JSON esistente
+        with _write_lock(filepath):
+            if not store.exists(filename):
+                with open(filepath, 'rb') as f:
+                    raw = f.read()
+                store.replace(filename, jsonio.loads(raw), allow_empty=True, raw=raw)
+        version = store.version(filename)
+    signature = _sqlite_signature(version)
+    data = _cache.get(filepath, signature)
+    if data is None:
+        data, version = store.load(filename)
+        signature = _sqlite_signature(version)
+        _cache.put(filepath, signature, data)
+    return data, signature
+
+
+def _load_locked(filepath, cleanup=False):
+    """Carica file base + journal; restituisce i dati e la firma combinata.
+
+    Un journal obsoleto viene ignorato; con cleanup=True (solo sotto il lock di
+    scrittura, che esclude un'altra compattazione in corso) viene anche eliminato.
+    """
+    store = get_sqlite_store()
+    if store is not None:
+        return _load_sqlite(store, filepath)
+    try:
+        f = open(filepath, 'rb')
+    except FileNotFoundError:
+        f = None
+    try:
+        # La firma viene letta dallo stesso descrittore che verrà parsato,
+        # così una scrittura concorrente non può associare dati vecchi a una firma nuova
+        base_signature = file_signature(os.fstat(f.fileno())) if f else None
+        signature = (base_signature, _path_signature(journal_path(filepath)))
+        data = _cache.get(filepath, signature)
+        if data is None:
+            base = jsonio.loads(f.read()) if f else []
+            ops = read_journal(filepath, base_signature)
+            if ops is None:
+                # Journal già consolidato o superato da una modifica esterna
+                ops = []
+                if cleanup:
+                    clear_journal(filepath)
+                    signature = (base_signature, None)
+            data = apply_ops(base, ops)
+            _cache.put(filepath, signature, data)
+    finally:
+        if f:
+            f.close()
+    return data, signature
+
+
+def load_json_file(filename):
+    """Carica un file JSON (usando la cache se il file non è cambiato)"""
+    filepath = os.path.join(DATA_DIR, filename)
+    with _lock_for(filepath):
+        return _load_locked(filepath)[0]
+
+
+def load_dataframe(filename):
+    """DataFrame del dataset, dal sidecar colonnare mappato in memoria quando possibile"""
+    filepath = os.path.join(DATA_DIR, filename)
+    with _lock_for(filepath):
+        data, signature = _load_locked(filepath)
+        df = _frame_cache.get(filepath, signature)
+        if df is None:
+            base_signature, journal_signature = signature
+            if get_sqlite_store() is not None:
+                # Il sidecar segue solo il file JSON
+                base_signature = None
+            df = build_dataframe(filepath, data, base_signature, journal_signature is not None)
+            _frame_cache.put(filepath, signature, df)
+    return df
+
+
+def load_index(filename):
+    """Indici secondari (posting list e valori distinti) per la versione corrente del dataset"""
+    filepath = os.path.join(DATA_DIR, filename)
+    with _lock_for(filepath):
+        data, signature = _load_locked(filepath)
+        index = _index_cache.get(filepath, signature)
+        if index is None:
+            store = get_sqlite_store()
+            if store is not None:
+                # Indice in memoria sui record di questa versione se il database cambia nel frattempo
+                index = SqliteIndex(store, filename, signature[0][1] if signature[0] else None,
+                                    lambda: DatasetIndex(build_dataframe(filepath, data, None, False)))
+            else:
+                index = DatasetIndex(load_dataframe(filename))
+            _index_cache.put(filepath, signature, index)
+    return index
+
+
+# Strutture derivate dai dati (es. indici di chiave): filepath -> {nome: (firma, oggetto)}.
+# Gli oggetti che definiscono apply_ops(ops, old_data, new_data) vengono aggiornati
+# in modo incrementale dalle scritture del journal, gli altri ricostruiti alla lettura.
+# Quelli che definiscono persist(filepath, base_signature) vengono salvati accanto
+# al dataset quando non ci sono modifiche nel journal (costruzione e compattazione)
+_derived = {}
+
+
+def load_derived(filename, name, build, restore=None):
+    """Struttura derivata dal dataset, costruita con build(data) una volta per versione.
+
+    restore(filepath, base_signature), se indicata, carica la versione salvata
+    da persist quando il journal è vuoto; restituisce None se assente o obsoleta.
+    """
+    filepath = os.path.join(DATA_DIR, filename)
+    with _lock_for(filepath):
+        data, signature = _load_locked(filepath)
+        entries = _derived.setdefault(filepath, {})
+        entry = entries.get(name)
+        if entry is not None and entry[0] == signature:
+            return entry[1]
+        base_signature, journal_signature = signature
+        # Con SQLite la versione riparte da capo se il database viene ricreato: niente file salvati
+        persistable = base_signature is not None and journal_signature is None and get_sqlite_store() is None
+        obj = restore(filepath, base_signature) if restore is not None and persistable else None
+        if obj is None:
+            obj = build(data)
+            if persistable and hasattr(obj, "persist"):
+                obj.persist(filepath, base_signature)
+        entries[name] = (signature, obj)
+    return obj
+
+
+def _update_derived(filepath, old_signature, new_signature, ops, old_data, new_data):
+    """Aggiorna le strutture derivate dopo una scrittura nel journal"""
+    entries = _derived.get(filepath)
+    if not entries:
+        return
+    for name, (signature, obj) in list(entries.items()):
+        if signature != old_signature or not hasattr(obj, "apply_ops"):
+            continue
+        entries[name] = (new_signature, obj.apply_ops(ops, old_data, new_data))
+
+
+def _sync_sidecar(filepath, data, base_signature):
+    """Rigenera il sidecar colonnare dopo una riscrittura completa del file base"""
+    if base_signature is not None and base_signature[1] >= SIDECAR_MIN_BYTES:
+        write_sidecar(filepath, data, base_signature)
+
+
+def _atomic_replace(filepath, write):
+    """Scrive su un file temporaneo tramite write(f) e lo sostituisce atomicamente al file"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(filepath) or '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            result = write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp crea il file con permessi 0600: mantieni quelli del file originale
+        if os.path.exists(filepath):
+            os.chmod(tmp_path, os.stat(filepath).st_mode & 0o777)
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    return result
+
+
+# Byte letti per riconoscere il formato di un file senza "json_format" nello schema
+FORMAT_PROBE_BYTES = 64
+
+
+def dataset_is_pretty(filename):
+    """Formato di salvataggio del dataset: opzione "json_format" dello schema, altrimenti quello del file su disco"""
+    schema = schema_for(filename)
+    if not schema or "json_format" not in schema:
+        try:
+            with open(os.path.join(DATA_DIR, filename), 'rb') as f:
+                return jsonio.detect_pretty(f.read(FORMAT_PROBE_BYTES))
+        except FileNotFoundError:
+            pass
+    return jsonio.is_pretty(schema)
+
+
+def _is_pretty(filepath):
+    return dataset_is_pretty(os.path.basename(filepath))
+
+
+def _atomic_write(filepath, data):
+    """Scrive il file JSON su un file temporaneo e lo sostituisce atomicamente"""
+    content = jsonio.dumps(data, pretty=_is_pretty(filepath))
+    _atomic_replace(filepath, lambda f: f.write(content))
+
+
+class _EmptyImport(Exception):
+    pass
+
+
+def _write_records(f, records, pretty=True, batch_size=1000):
+    """Scrive un array JSON a blocchi di record, con lo stesso formato di jsonio.dumps sull'intera lista"""
+    # "[\n  {...},\n  {...}\n]" (o "[{...},{...}]") senza parentesi: i blocchi si concatenano con ","
+    closing = b'\n]' if pretty else b']'
+    count = 0
+    f.write(b'[')
+    for batch in iter_chunks(records, batch_size):
+        if count:
+            f.write(b',')
+        f.write(jsonio.dumps(batch, pretty)[1:-len(closing)])
+        count += len(batch)
+    if count == 0:
+        raise _EmptyImport()
+    f.write(closing)
+    return count
+
+
+def save_json_file(filename, data):
+    """Salva dati in un file JSON (riscrittura completa, es. upload)"""
+    filepath = os.path.join(DATA_DIR, filename)
+    store = get_sqlite_store()
+    with _write_lock(filepath):
+        _cache.invalidate(filepath)
+        if store is not None:
+            _, version = store.replace(filename, data, allow_empty=True)
+            _cache.put(filepath, _sqlite_signature(version), data)
+            return True
+        _atomic_write(filepath, data)
+        clear_journal(filepath)
+        # Scrittura passante: il rerun successivo trova già i dati in cache
+        base_signature = _path_signature(filepath)
+        _cache.put(filepath, (base_signature, None), data)
+        _sync_sidecar(filepath, data, base_signature)
+    return True
+
+
+def save_json_records(filename, records):
+    """Sostituisce il dataset con un iterabile di record, scritto in streaming.
+
+    I record non vengono mai materializzati in una lista: adatto a import di
+    file molto grandi. Se l'iterabile è vuoto il file esistente non viene
+    toccato. Restituisce il numero di record scritti.
+    """
+    filepath = os.path.join(DATA_DIR, filename)
+    store = get_sqlite_store()
+    with _write_lock(filepath):
+        if store is not None:
+            count, _ = store.replace(filename, records)
+            _cache.invalidate(filepath)
+            return count
+        try:
+            count = _atomic_replace(filepath, lambda f: _write_records(f, records, _is_pretty(filepath)))
+        except _EmptyImport:
+            return 0
+        clear_journal(filepath)
+        # Il dataset non è in memoria: la prossima lettura lo ricarica dal file
+        _cache.invalidate(filepath)
+    return count
+
+
+# Soglie oltre le quali il journal viene consolidato nel file base
+COMPACT_MAX_JOURNAL_BYTES = 1024 * 1024
+COMPACT_MAX_JOURNAL_RATIO = 0.1
+COMPACT_MIN_JOURNAL_BYTES = 64 * 1024
+
+_compacting = set()
+
+
+def _compaction_threshold(base_size):
+    """Dimensione del journal oltre la quale conviene riscrivere il file base"""
+    threshold = min(COMPACT_MAX_JOURNAL_BYTES, base_size * COMPACT_MAX_JOURNAL_RATIO)
+    return max(COMPACT_MIN_JOURNAL_BYTES, threshold)
+
+
+class WriteConflict(Exception):
+    """La modifica si basa su una versione del record che nel frattempo è cambiata"""
+
+
+# Attesa del primo commit di un gruppo, per raccogliere le scritture quasi simultanee
+GROUP_COMMIT_WINDOW = 0.002
+
+
+class _Commit:
+    __slots__ = ("ops", "done", "error")
+
+    def __init__(self, ops):
+        self.ops = ops
+        self.done = threading.Event()
+        self.error = None
+
+
+def _resolve(data, op):
+    """Verifica il record atteso da un'operazione update/delete e restituisce l'operazione da registrare.
+
+    Se nel frattempo il record si è spostato (inserimenti o eliminazioni di
+    altri utenti) e compare una sola volta, l'indice viene aggiornato; se è
+    stato modificato o eliminato si solleva WriteConflict.
+    """
+    if "expected" not in op:
+        return op
+    op = dict(op)
+    expected = op.pop("expected")
+    index = op["index"]
+    if 0 <= index < len(data) and data[index] == expected:
+        return op
+    positions = [i for i, record in enumerate(data) if record == expected]
+    if len(positions) != 1:
+        raise WriteConflict("Il record è stato modificato o eliminato da un altro utente")
+    op["index"] = positions[0]
+    return op
+
+
+class WriteCoordinator:
+    """Coordinatore delle scritture di un dataset, con group commit.
+
+    Le richieste arrivano in coda; il primo thread che trova la coda senza
+    leader la svuota: sotto il lock di scrittura ricarica la versione corrente,
+    verifica e applica ogni commit e registra tutti quelli accettati con
+    un'unica append (e un solo fsync) nel journal. I commit rifiutati ricevono
+    il proprio errore senza bloccare gli altri del gruppo.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.filepath = os.path.join(DATA_DIR, filename)
+        self._pending = []
+        self._guard = threading.Lock()
+        self._leader = False
+        self.commits = 0
+        self.groups = 0
+
+    def submit(self, ops):
+        commit = _Commit(ops)
+        with self._guard:
+            self._pending.append(commit)
+            leader = not self._leader
+            self._leader = True
+        if leader:
+            self._lead()
+        commit.done.wait()
+        if commit.error is not None:
+            raise commit.error
+        return True
+
+    def _lead(self):
+        time.sleep(GROUP_COMMIT_WINDOW)
+        while True:
+            with self._guard:
+                batch, self._pending = self._pending, []
+                if not batch:
+                    self._leader = False
+                    return
+            try:
+                self._commit(batch)
+            except BaseException as e:
+                for commit in batch:
+                    if not commit.done.is_set():
+                        commit.error = e
+            finally:
+                for commit in batch:
+                    commit.done.set()
+
+    def _commit(self, batch):
+        filepath = self.filepath
+        with _write_lock(filepath):
+            data, old_signature = _load_locked(filepath, cleanup=True)
+            base_signature = old_signature[0]
+            # Applica prima in memoria: un commit non valido viene rifiutato
+            # senza sporcare il journal
+            new_data = data
+            ops = []
+            for commit in batch:
+                try:
+                    resolved = [_resolve(new_data, op) for op in commit.ops]
+                    new_data = apply_ops(new_data, resolved)
+                except (WriteConflict, IndexError) as e:
+                    commit.error = e
+                    continue
+                ops.extend(resolved)
+            if not ops:
+                return
+            store = get_sqlite_store()
+            if store is not None:
+                # Un'unica transazione SQLite al posto dell'append nel journal
+                version = store.apply_ops(self.filename, ops, base_signature[1] if base_signature else None)
+                if version is None:
+                    raise WriteConflict("Il dataset è stato modificato da un altro processo")
+                new_signature = _sqlite_signature(version)
+            else:
+                append_journal(filepath, base_signature, ops)
+                journal_signature = _path_signature(journal_path(filepath))
+                new_signature = (base_signature, journal_signature)
+            _cache.put(filepath, new_signature, new_data)
+            _update_derived(filepath, old_signature, new_signature, ops, data, new_data)
+            self.commits += len(batch)
+            self.groups += 1
+
+        if store is not None:
+            return
+        base_size = base_signature[1] if base_signature else 0
+        if journal_signature[1] > _compaction_threshold(base_size):
+            _schedule_compaction(self.filename)
+
+
+_coordinators = {}
+
+
+def _coordinator(filename):
+    with _file_locks_guard:
+        coordinator = _coordinators.get(filename)
+        if coordinator is None:
+            coordinator = _coordinators[filename] = WriteCoordinator(filename)
+        return coordinator
+
+
+def insert_records(filename, records):
+    """Aggiunge record in coda al dataset"""
+    return _coordinator(filename).submit([{"op": "insert", "records": list(records)}])
+
+
+def _checked(op, expected):
+    if expected is not None:
+        op["expected"] = expected
+    return op
+
+
+def update_record(filename, index, record, expected=None):
+    """Sostituisce il record in posizione index.
+
+    expected è il record come l'ha letto chi modifica: se nel frattempo è
+    cambiato la scrittura viene rifiutata con WriteConflict.
+    """
+    return _coordinator(filename).submit([_checked({"op": "update", "index": index, "record": record}, expected)])
+
+
+def delete_record(filename, index, expected=None):
+    """Elimina il record in posizione index (verificando expected come update_record)"""
+    return _coordinator(filename).submit([_checked({"op": "delete", "index": index}, expected)])
+
+
+def upsert_records(filename, updates, inserts, deletes=()):
+    """Aggiorna i record [(index, record, expected), ...], elimina [(index, expected), ...]
+    e aggiunge i nuovi in un unico commit"""
+    ops = [_checked({"op": "update", "index": index, "record": record}, expected)
+           for index, record, expected in updates]
+    # Dall'indice più alto: le eliminazioni non spostano i record ancora da eliminare
+    ops.extend(_checked({"op": "delete", "index": index}, expected)
+               for index, expected in sorted(deletes, key=lambda delete: delete[0], reverse=True))
+    if inserts:
+        ops.append({"op": "insert", "records": list(inserts)})
+    if not ops:
+        return False
+    return _coordinator(filename).submit(ops)
+
+
+def compact_dataset(filename):
+    """Consolida il journal nel file JSON canonico; restituisce True se c'era qualcosa da fare"""
+    if get_sqlite_store() is not None:
+        # Con SQLite ogni scrittura è già una transazione sul database
+        return False
+    filepath = os.path.join(DATA_DIR, filename)
+    with _write_lock(filepath):
+        data, (base_signature, journal_signature) = _load_locked(filepath, cleanup=True)
+        if journal_signature is None:
+            return False
+        _atomic_write(filepath, data)
+        # Un crash qui lascia un journal con firma del file base obsoleta,
+        # che viene ignorato alla lettura successiva
+        clear_journal(filepath)
+        old_signature = (base_signature, journal_signature)
+        base_signature = _path_signature(filepath)
+        new_signature = (base_signature, None)
+        _cache.put(filepath, new_signature, data)
+        _sync_sidecar(filepath, data, base_signature)
+        # Il contenuto non cambia: DataFrame, indici e strutture derivate restano validi
+        for cache in (_frame_cache, _index_cache):
+            cache.retag(filepath, old_signature, new_signature)
+        for name, (signature, obj) in list(_derived.get(filepath, {}).items()):
+            if signature == old_signature:
+                _derived[filepath][name] = (new_signature, obj)
+                if hasattr(obj, "persist"):
+                    obj.persist(filepath, base_signature)
+    return True
+
+
+def _schedule_compaction(filename):
+    """Avvia la compattazione in un thread in background (una per file)"""
+    with _file_locks_guard:
+        if filename in _compacting:
+            return
+        _compacting.add(filename)
+
+    def run():
+        try:
+            compact_dataset(filename)
+        finally:
+            with _file_locks_guard:
+                _compacting.discard(filename)
+
+    threading.Thread(target=run, name=f"compact-{filename}", daemon=True).start()
+
+
+def dataset_exists(filename):
+    """True se il dataset esiste nel backend in uso (con SQLite anche se ancora da importare dal JSON).
+
+    Conta anche un journal senza file base: il primo inserimento in un
+    dataset nuovo scrive solo il journal fino alla compattazione.
+    """
+    store = get_sqlite_store()
+    if store is not None and store.exists(filename):
+        return True
+    filepath = os.path.join(DATA_DIR, filename)
+    return os.path.exists(filepath) or os.path.exists(journal_path(filepath))
+
+
+def dataset_signature(filename):
+    """Firma della versione corrente del dataset, None se non esiste.
+
+    Con i file JSON è quella del solo file base: il journal va consolidato prima.
+    """
+    filepath = os.path.join(DATA_DIR, filename)
+    store = get_sqlite_store()
+    if store is not None:
+        with _lock_for(filepath):
+            return _load_locked(filepath)[1][0]
+    try:
+        return file_signature(os.stat(filepath))
+    except FileNotFoundError:
+        return None
+
+
+def clear_caches():
+    """Svuota dati, DataFrame, indici e strutture derivate in memoria (misure a freddo nei benchmark)"""
+    for cache in (_cache, _frame_cache, _index_cache):
+        cache.invalidate()
+    _derived.clear()
+
+
+def get_cache_stats():
+    """Statistiche hit/miss della cache dei dataset"""
+    return _cache.stats()
@@ -0,0 +1,183 @@
+import codecs
+import json
+import time
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+_DELIMITERS = _WHITESPACE + ",]"
+# Dimensione massima (caratteri) di un singolo elemento dell'array: oltre, il file viene rifiutato
+MAX_ELEMENT_SIZE = 64 * 1024 * 1024
+# Un errore di sintassi così lontano dalla fine del buffer non dipende dai dati ancora da leggere
+# (oltre la lunghezza di un letterale troncato come "tru" o di un escape "\\uXXX")
+_TRUNCATION_MARGIN = 8
+
+
+class StreamParseError(ValueError):
+    """Errore di sintassi durante il parsing incrementale"""
+
+
+def iter_json_array(fileobj, chunk_size=1024 * 1024, on_bytes=None, max_element_size=MAX_ELEMENT_SIZE):
+    """Restituisce gli elementi di un array JSON leggendo il file a blocchi.
+
+    Accetta anche un singolo oggetto JSON (restituito come unico elemento).
+    In memoria resta solo il blocco corrente più l'elemento in corso di parsing,
+    al più max_element_size caratteri: un elemento più grande è un errore.
+    on_bytes(n) viene chiamata con il numero di byte letti finora.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    buffer = ""
+    pos = 0
+    bytes_read = 0
+    eof = False
+
+    def fill():
+        nonlocal buffer, pos, bytes_read, eof
+        chunk = fileobj.read(chunk_size)
+        if not chunk:
+            eof = True
+            buffer = buffer[pos:] + decoder.decode(b"", final=True)
+        else:
+            bytes_read += len(chunk)
+            buffer = buffer[pos:] + decoder.decode(chunk)
+            if on_bytes:
+                on_bytes(bytes_read)
+        pos = 0
+
+    def skip_whitespace():
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buffer) or eof:
+                return
+            fill()
+
+    def grow():
+        # Altri dati per l'elemento in corso, entro il limite di dimensione
+        if len(buffer) - pos > max_element_size:
+            raise StreamParseError(
+                f"Elemento JSON oltre {max_element_size:,} caratteri vicino al byte {bytes_read} (o JSON non valido)"
+            )
+        fill()
+
+    def decode_value():
+        nonlocal pos
+        while True:
+            try:
+                value, end = _decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as e:
+                # Errore prima della fine dei dati letti: altri blocchi non possono renderlo valido.
+                # Una stringa non terminata invece è segnalata dal suo inizio e può continuare nel blocco dopo
+                definitive = e.pos + _TRUNCATION_MARGIN < len(buffer) and not e.msg.startswith("Unterminated string")
+                if eof or definitive:
+                    raise StreamParseError(f"JSON non valido vicino al byte {bytes_read}: {e.msg}") from e
+                grow()
+                continue
+            # Un valore non seguito da un delimitatore potrebbe essere troncato
+            # (es. "2." di "2.5e3"): serve il blocco successivo per esserne certi
+            if not eof and (end == len(buffer) or buffer[end] not in _DELIMITERS):
+                grow()
+                continue
+            pos = end
+            return value
+
+    skip_whitespace()
+    if pos >= len(buffer):
+        return
+    if buffer[pos] != '[':
+        yield decode_value()
+        skip_whitespace()
+        if pos < len(buffer):
+            raise StreamParseError("Contenuto inatteso dopo l'oggetto JSON")
+        return
+
+    pos += 1
+    skip_whitespace()
+    if pos < len(buffer) and buffer[pos] == ']':
+        return
+    while True:
+        skip_whitespace()
+        yield decode_value()
+        skip_whitespace()
+        if pos >= len(buffer):
+            raise StreamParseError("Array JSON non terminato")
+        separator = buffer[pos]
+        pos += 1
+        if separator == ']':
+            return
+        if separator != ',':
+            raise StreamParseError(f"Atteso ',' o ']' nell'array JSON, trovato {separator!r}")
+
+
+def iter_chunks(iterable, size):
+    """Raggruppa un iterabile in liste di al più size elementi"""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def split_checked(checker, records, indices):
+    """checker.split che restituisce anche le posizioni nel batch dei record accettati:
+    (accettati, posizioni, scartati)"""
+    accepted, rejected = checker.split(records, indices)
+    rejected_indices = {entry["index"] for entry in rejected}
+    return accepted, [index for index in indices if index not in rejected_indices], rejected
+
+
+class StreamImport:
+    """Import in streaming: parsing incrementale, validazione a blocchi e statistiche"""
+
+    # Numero massimo di record non validi conservati nel report
+    MAX_REPORTED_ERRORS = 1000
+
+    def __init__(self, fileobj, validator, key_checker=None, chunk_size=5000, on_progress=None,
+                 reference_checker=None):
+        self.fileobj = fileobj
+        self.validator = validator
+        # Controllo opzionale di unicità delle chiavi tra tutti i blocchi del file
+        self.key_checker = key_checker
+        # Controllo opzionale delle chiavi esterne (record che citano id inesistenti)
+        self.reference_checker = reference_checker
+        self.chunk_size = chunk_size
+        self.on_progress = on_progress
+        self.rows_read = 0
+        self.rows_valid = 0
+        self.rows_invalid = 0
+        self.bytes_read = 0
+        self.invalid_records = []
+        self.started = None
+
+    def _on_bytes(self, n):
+        self.bytes_read = n
+
+    @property
+    def rows_per_second(self):
+        elapsed = time.perf_counter() - self.started if self.started else 0
+        return self.rows_read / elapsed if elapsed > 0 else 0.0
+
+    def records(self):
+        """Generatore dei record validi (già convertiti), da passare a save_json_records"""
+        self.started = time.perf_counter()
+        elements = iter_json_array(self.fileobj, on_bytes=self._on_bytes)
+        for chunk in iter_chunks(elements, self.chunk_size):
+            valid, valid_indices, invalid = self.validator.validate(chunk, with_indices=True)
+            # Prima le chiavi esterne: un record scartato non deve occupare la sua chiave
+            for checker in (self.reference_checker, self.key_checker):
+                if checker is not None:
+                    valid, valid_indices, rejected = split_checked(checker, valid, valid_indices)
+                    invalid = sorted(invalid + rejected, key=lambda entry: entry["index"])
+            for entry in invalid:
+                entry["index"] += self.rows_read
+                if len(self.invalid_records) < self.MAX_REPORTED_ERRORS:
+                    self.invalid_records.append(entry)
+            self.rows_read += len(chunk)
+            self.rows_valid += len(valid)
+            self.rows_invalid += len(invalid)
+            if self.on_progress:
+                self.on_progress(self)
+            yield from valid
@@ -0,0 +1,37 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import storage  # noqa: E402
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Copia dei file JSON di data/ in una directory temporanea, usata come directory corrente"""
+    target = tmp_path / storage.DATA_DIR
+    target.mkdir()
+    source = os.path.join(ROOT, storage.DATA_DIR)
+    for name in os.listdir(source):
+        if name.endswith(".json"):
+            shutil.copyfile(os.path.join(source, name), target / name)
+    monkeypatch.chdir(tmp_path)
+    storage.clear_caches()
+    yield target
+    storage.clear_caches()
+
+
+@pytest.fixture
+def sqlite_backend(tmp_path, monkeypatch):
+    """Backend SQLite su un database temporaneo (i dataset vengono importati dai JSON al primo accesso)"""
+    monkeypatch.setattr(storage, "STORAGE_BACKEND", "sqlite")
+    monkeypatch.setattr(storage, "SQLITE_PATH", str(tmp_path / "f1db.sqlite"))
+    monkeypatch.setattr(storage, "_store", None)
+    yield
+    if storage._store is not None:
+        storage._store.close()
+    storage.clear_caches()
@@ -0,0 +1,38 @@
+import os
+
+import pytest
+
+import storage
+from export import dataset_json_bytes
+from schemas import FILE_MAPPING
+
+DATASETS = sorted(FILE_MAPPING.values())
+
+
+def _read_source(filename):
+    filepath = os.path.join(storage.DATA_DIR, filename)
+    if not os.path.exists(filepath):
+        pytest.skip(f"{filename} non presente in data/")
+    with open(filepath, 'rb') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("filename", DATASETS)
+def test_sqlite_export_matches_imported_file(data_dir, sqlite_backend, filename):
+    raw = _read_source(filename)
+    assert dataset_json_bytes(filename) == raw
+
+
+@pytest.mark.parametrize("filename", DATASETS)
+def test_backends_export_same_bytes_after_update(data_dir, request, filename):
+    raw = _read_source(filename)
+    record = dict(storage.load_json_file(filename)[0])
+    storage.update_record(filename, 0, record)
+    json_bytes = dataset_json_bytes(filename)
+
+    # Stessa modifica sul file originale importato nel backend SQLite
+    (data_dir / filename).write_bytes(raw)
+    request.getfixturevalue("sqlite_backend")
+    storage.clear_caches()
+    storage.update_record(filename, 0, record)
+    assert dataset_json_bytes(filename) == json_bytes
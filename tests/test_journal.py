@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+import storage
+from journal import journal_path, read_journal
+
+DATASET = "items.json"
+RECORDS = [{"id": i, "name": f"item {i}"} for i in range(5)]
+
+
+@pytest.fixture
+def dataset(data_dir):
+    (data_dir / DATASET).write_text(json.dumps(RECORDS))
+    return data_dir / DATASET
+
+
+def _append_raw(path, content):
+    with open(journal_path(str(path)), 'ab') as f:
+        f.write(content)
+
+
+def test_replay_ignores_truncated_tail(dataset):
+    storage.insert_records(DATASET, [{"id": 5, "name": "item 5"}])
+    storage.update_record(DATASET, 0, {"id": 0, "name": "changed"})
+    # Crash a metà di un'append: l'ultima riga resta incompleta
+    _append_raw(dataset, b'{"op":"insert","records":[{"id":6,"na')
+    storage.clear_caches()
+
+    expected = [{"id": 0, "name": "changed"}, *RECORDS[1:], {"id": 5, "name": "item 5"}]
+    assert storage.load_json_file(DATASET) == expected
+
+
+def test_append_after_truncated_tail_keeps_journal_readable(dataset):
+    storage.insert_records(DATASET, [{"id": 5, "name": "item 5"}])
+    _append_raw(dataset, b'{"op":"delete","ind')
+    storage.clear_caches()
+
+    storage.insert_records(DATASET, [{"id": 6, "name": "item 6"}])
+    storage.clear_caches()
+    assert [record["id"] for record in storage.load_json_file(DATASET)] == [0, 1, 2, 3, 4, 5, 6]
+
+    storage.compact_dataset(DATASET)
+    assert json.loads(dataset.read_text()) == [*RECORDS, {"id": 5, "name": "item 5"}, {"id": 6, "name": "item 6"}]
+    assert not (dataset.parent / (DATASET + ".journal")).exists()
+
+
+def test_corrupted_line_before_the_tail_is_an_error(dataset):
+    storage.insert_records(DATASET, [{"id": 5, "name": "item 5"}])
+    _append_raw(dataset, b'{"op":"insert",\n{"op":"insert","records":[]}\n')
+    signature = storage.file_signature(dataset.stat())
+    with pytest.raises(ValueError):
+        read_journal(str(dataset), signature)
+
+
+def test_journal_of_a_rewritten_base_is_ignored(dataset):
+    storage.insert_records(DATASET, [{"id": 5, "name": "item 5"}])
+    # Il file base riscritto da fuori: il journal si riferisce alla versione precedente
+    dataset.write_text(json.dumps(RECORDS[:2]))
+    storage.clear_caches()
+    assert storage.load_json_file(DATASET) == RECORDS[:2]
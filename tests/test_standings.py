@@ -0,0 +1,84 @@
+import json
+from collections import Counter, defaultdict
+
+import pandas as pd
+import pytest
+
+import storage
+from standings import (
+    RESULTS_FILE, STANDINGS, IncompleteResults, _scheduled_rounds, compute_standings, refresh_for_results,
+    refresh_standings
+)
+
+DRIVER_STANDINGS = "f1db-races-driver-standings.json"
+SEASON = 2023
+
+
+def _season_results(standings, year):
+    """Risultati gara di una stagione ricostruiti dalle classifiche salvate: i punti di ogni gara sono
+    la differenza tra classifiche consecutive, l'ordine d'arrivo segue i punti"""
+    previous = {}
+    by_race = defaultdict(list)
+    for row in standings:
+        if row["year"] != year:
+            continue
+        driver = row["driverId"]
+        points = row["points"] - previous.get(driver, 0)
+        previous[driver] = row["points"]
+        by_race[row["raceId"]].append({
+            "raceId": row["raceId"], "year": year, "round": row["round"], "driverId": driver, "points": points,
+        })
+    results = []
+    for race in by_race.values():
+        for position, result in enumerate(sorted(race, key=lambda r: (-r["points"], r["driverId"])), start=1):
+            results.append(dict(result, positionNumber=position))
+    return results
+
+
+@pytest.fixture
+def season(data_dir):
+    """Classifica piloti salvata e risultati completi della stagione SEASON in data/"""
+    stored = storage.load_json_file(DRIVER_STANDINGS)
+    results = _season_results(stored, SEASON)
+    (data_dir / RESULTS_FILE).write_text(json.dumps(results))
+    return [row for row in stored if row["year"] == SEASON], results
+
+
+def test_compute_standings_matches_stored_season(season):
+    stored, results = season
+    computed = compute_standings(pd.DataFrame(results), STANDINGS[DRIVER_STANDINGS]["entity"], 1950,
+                                 _scheduled_rounds(SEASON))
+    by_key = {(row["raceId"], row["driverId"]): row for row in computed}
+    assert by_key.keys() == {(row["raceId"], row["driverId"]) for row in stored}
+
+    # A parità di punti l'ordine dipende dagli arrivi reali, non ricostruibili: si confrontano solo le posizioni univoche
+    ties = Counter((row["raceId"], row["points"]) for row in stored)
+    final_round = max(row["round"] for row in stored)
+    for row in stored:
+        new_row = by_key[(row["raceId"], row["driverId"])]
+        assert new_row["points"] == row["points"]
+        if ties[(row["raceId"], row["points"])] == 1:
+            assert new_row["positionNumber"] == row["positionNumber"]
+        if row["round"] == final_round:
+            assert new_row["championshipWon"] == row["championshipWon"]
+
+
+def test_refresh_standings_keeps_every_stored_row(season):
+    stored, _ = season
+    changes = refresh_standings(DRIVER_STANDINGS, SEASON)
+    assert changes["inserted"] == 0 and changes["deleted"] == 0
+    after = {(row["raceId"], row["driverId"]): row["points"]
+             for row in storage.load_json_file(DRIVER_STANDINGS) if row["year"] == SEASON}
+    assert after == {(row["raceId"], row["driverId"]): row["points"] for row in stored}
+
+
+def test_partial_results_leave_standings_untouched(data_dir):
+    before = storage.load_json_file(DRIVER_STANDINGS)
+    last_race = [row for row in _season_results(before, SEASON) if row["round"] == 22]
+    (data_dir / RESULTS_FILE).write_text(json.dumps(last_race[:1]))
+
+    with pytest.raises(IncompleteResults):
+        refresh_standings(DRIVER_STANDINGS, SEASON, from_round=22)
+    changes = refresh_for_results(last_race[:1])
+    assert changes[DRIVER_STANDINGS]["skipped"]
+    assert storage.load_json_file(DRIVER_STANDINGS) == before
@@ -0,0 +1,54 @@
+import io
+import json
+
+import pytest
+
+from streaming import StreamParseError, iter_json_array
+
+RECORDS = [
+    {"id": i, "name": f"Pilota {i} è \\\"quoted\\\"", "points": i * 2.5e3, "won": i % 2 == 0, "note": None,
+     "tags": ["a", "ü", {"nested": [1, -2, 3.25]}]}
+    for i in range(200)
+]
+
+
+class CountingReader(io.BytesIO):
+    """File in memoria che conta i byte letti"""
+
+    def __init__(self, data):
+        super().__init__(data)
+        self.consumed = 0
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.consumed += len(chunk)
+        return chunk
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64, 1024 * 1024])
+@pytest.mark.parametrize("indent", [None, 2])
+def test_chunked_parse_matches_json_loads(chunk_size, indent):
+    raw = json.dumps(RECORDS, indent=indent, ensure_ascii=False).encode('utf-8')
+    assert list(iter_json_array(io.BytesIO(raw), chunk_size=chunk_size)) == RECORDS
+
+
+def test_invalid_element_fails_without_reading_the_whole_file():
+    raw = b'[{"id": 1, "name": oops}, ' + b",".join(json.dumps(r).encode() for r in RECORDS * 50) + b"]"
+    reader = CountingReader(raw)
+    with pytest.raises(StreamParseError):
+        list(iter_json_array(reader, chunk_size=4096))
+    assert reader.consumed <= 2 * 4096
+
+
+def test_element_over_the_size_limit_is_rejected():
+    raw = b'[{"name": "' + b"x" * 10000 + b'"}]'
+    reader = CountingReader(raw)
+    with pytest.raises(StreamParseError):
+        list(iter_json_array(reader, chunk_size=1000, max_element_size=2000))
+    assert reader.consumed < len(raw)
+
+
+@pytest.mark.parametrize("raw", [b'[{"a": 1}', b'[{"a": tru', b'[{"a": "unterminated', b'[1, 2,'])
+def test_truncated_file_is_an_error(raw):
+    with pytest.raises(StreamParseError):
+        list(iter_json_array(io.BytesIO(raw), chunk_size=3))
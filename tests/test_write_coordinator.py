@@ -0,0 +1,69 @@
+import json
+import threading
+
+import pytest
+
+import storage
+
+DATASET = "counters.json"
+WRITERS = 2
+INCREMENTS = 50
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def dataset(request, data_dir):
+    (data_dir / DATASET).write_text(json.dumps([{"id": "a", "value": 0}]))
+    if request.param == "sqlite":
+        request.getfixturevalue("sqlite_backend")
+    return DATASET
+
+
+def _run_concurrently(target):
+    barrier = threading.Barrier(WRITERS)
+    errors = []
+
+    def run(writer):
+        barrier.wait()
+        try:
+            target(writer)
+        except BaseException as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(writer,)) for writer in range(WRITERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+
+
+def test_concurrent_increments_lose_no_update(dataset):
+    def increment(writer):
+        for _ in range(INCREMENTS):
+            # Lettura e scrittura con il record atteso: in caso di conflitto si rilegge e si riprova
+            while True:
+                record = storage.load_json_file(dataset)[0]
+                try:
+                    storage.update_record(dataset, 0, dict(record, value=record["value"] + 1), expected=record)
+                    break
+                except storage.WriteConflict:
+                    continue
+
+    _run_concurrently(increment)
+    storage.clear_caches()
+    assert storage.load_json_file(dataset)[0]["value"] == WRITERS * INCREMENTS
+
+
+def test_concurrent_inserts_are_all_kept(dataset):
+    def insert(writer):
+        for i in range(INCREMENTS):
+            storage.insert_records(dataset, [{"id": f"{writer}-{i}", "value": i}])
+
+    _run_concurrently(insert)
+    storage.compact_dataset(dataset)
+    storage.clear_caches()
+    ids = [record["id"] for record in storage.load_json_file(dataset)]
+    assert sorted(ids[1:]) == sorted(f"{writer}-{i}" for writer in range(WRITERS) for i in range(INCREMENTS))
+    # Le scritture di ogni writer restano nel suo ordine
+    for writer in range(WRITERS):
+        assert [i for i in ids if i.startswith(f"{writer}-")] == [f"{writer}-{i}" for i in range(INCREMENTS)]
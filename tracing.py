@@ -0,0 +1,82 @@
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# File JSONL dei trace, una riga per esecuzione dello script (stringa vuota per disattivarlo)
+TRACE_LOG = os.environ.get("F1DB_TRACE_LOG", os.path.join("logs", "trace.jsonl"))
+
+_log_lock = threading.Lock()
+
+
+def new_session_id():
+    """Identificativo della sessione del browser, riportato in ogni riga del log"""
+    return uuid.uuid4().hex
+
+
+class RerunTrace:
+    """Span temporizzati (nome, inizio, durata) di un'esecuzione dello script Streamlit.
+
+    Gli span possono essere annidati: il nome registrato è il percorso
+    completo, es. "Visualizza/tabella".
+    """
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.started = time.perf_counter()
+        self.spans = []
+        self.fields = {}
+        self.record = None
+        self._stack = []
+
+    @contextmanager
+    def span(self, name):
+        self._stack.append(name)
+        path = "/".join(self._stack)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self._stack.pop()
+            self.spans.append({
+                "name": path,
+                "start_ms": round((start - self.started) * 1000, 3),
+                "ms": round((end - start) * 1000, 3),
+            })
+
+    def annotate(self, **fields):
+        """Campi aggiuntivi della riga di log (es. dataset e numero di record)"""
+        self.fields.update(fields)
+
+    def finish(self, log_path=TRACE_LOG, interrupted=False):
+        """Chiude il trace, lo accoda al log JSONL e lo restituisce; le chiamate successive restituiscono lo stesso record.
+
+        interrupted=True per un'esecuzione interrotta (eccezione o rerun) chiusa
+        in ritardo: la durata arriva alla fine dell'ultimo span completato.
+        """
+        if self.record is not None:
+            return self.record
+        if interrupted:
+            total_ms = max((span["start_ms"] + span["ms"] for span in self.spans), default=0)
+        else:
+            total_ms = (time.perf_counter() - self.started) * 1000
+        record = {
+            "ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+            "session_id": self.session_id,
+            **self.fields,
+            "total_ms": round(total_ms, 3),
+            "interrupted": interrupted,
+            "spans": sorted(self.spans, key=lambda span: span["start_ms"]),
+        }
+        self.record = record
+        if log_path:
+            line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+            with _log_lock:
+                os.makedirs(os.path.dirname(log_path) or ".", exist_ok=True)
+                with open(log_path, 'a', encoding='utf-8') as f:
+                    f.write(line)
+        return record
@@ -0,0 +1,144 @@
+import numpy as np
+import pandas as pd
+
+from codec import FALSE_STRINGS, TRUE_STRINGS, get_codec
+
+# Segnaposto per le chiavi assenti nel record (diverso da None, che è un valore ammesso)
+_MISSING = object()
+
+
+def _is_bool(values):
+    return np.fromiter((type(v) is bool for v in values), dtype=bool, count=len(values))
+
+
+def _is_str(values):
+    return np.fromiter((type(v) is str for v in values), dtype=bool, count=len(values))
+
+
+def _check_text(values, field):
+    """Testo: stringhe o numeri (es. permanentNumber incollato come numero), nessuna conversione"""
+    ok = np.fromiter((type(v) in (str, int, float) for v in values), dtype=bool, count=len(values))
+    return ok, "tipo non valido (atteso testo)"
+
+
+def _check_integer(values, field):
+    """Intero: accetta anche float interi e stringhe numeriche (convertiti dal codec)"""
+    numbers = pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').to_numpy(dtype=float)
+    ok = ~np.isnan(numbers) & ~_is_bool(values)
+    ok[ok] = numbers[ok] % 1 == 0
+    return ok, "tipo non valido (atteso intero)"
+
+
+def _check_float(values, field):
+    """Numero decimale: accetta interi e stringhe numeriche (convertite dal codec)"""
+    numbers = pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').to_numpy(dtype=float)
+    ok = ~np.isnan(numbers) & ~_is_bool(values)
+    return ok, "tipo non valido (atteso numero)"
+
+
+def _check_date(values, field):
+    """Data in formato ISO YYYY-MM-DD"""
+    is_str = _is_str(values)
+    strings = pd.Series(np.where(is_str, values, None), dtype=object)
+    parsed = pd.to_datetime(strings, format='%Y-%m-%d', errors='coerce')
+    ok = is_str & parsed.notna().to_numpy()
+    return ok, "data non valida (formato YYYY-MM-DD)"
+
+
+def _check_select(values, field):
+    """Valore tra le opzioni ammesse dallo schema"""
+    options = [o for o in field.get("options", []) if o is not None]
+    ok = pd.Series(values, dtype=object).isin(options).to_numpy()
+    return ok, f"valore non ammesso (opzioni: {', '.join(options)})"
+
+
+def _check_checkbox(values, field):
+    """Booleano: accetta anche stringhe come "true"/"false" (convertite dal codec)"""
+    ok = _is_bool(values)
+    for i in np.flatnonzero(~ok & _is_str(values)):
+        text = values[i].strip().lower()
+        ok[i] = text in TRUE_STRINGS or text in FALSE_STRINGS
+    return ok, "tipo non valido (atteso true/false)"
+
+
+_CHECKS = {
+    "text": _check_text,
+    "integer": _check_integer,
+    "float": _check_float,
+    "date": _check_date,
+    "select": _check_select,
+    "checkbox": _check_checkbox,
+}
+
+
+class SchemaValidator:
+    """Validatore compilato da una voce di SCHEMAS.
+
+    I controlli sono eseguiti per colonna sull'intero batch: presenza dei campi
+    obbligatori, tipo, valori ammessi e convertibilità (es. "5" → 5 per gli
+    interi); i record validi vengono poi convertiti con il RecordCodec dello
+    schema. None è sempre ammesso, come nei file f1db.
+    """
+
+    def __init__(self, schema, codec):
+        self.codec = codec
+        self.fields = tuple(
+            (field["name"], field.get("required", False), _CHECKS[field["type"]], field)
+            for field in schema["fields"]
+        )
+
+    def validate(self, records, with_indices=False):
+        """Valida un batch di record; restituisce i record validi (convertiti) e il report degli errori.
+
+        Con with_indices=True restituisce anche le posizioni nel batch dei record validi.
+        """
+        n = len(records)
+        is_dict = np.fromiter((isinstance(r, dict) for r in records), dtype=bool, count=n)
+        rows = [r if ok else {} for r, ok in zip(records, is_dict)]
+
+        missing = {}
+        errors = {}
+        for name, required, check, field in self.fields:
+            values = [r.get(name, _MISSING) for r in rows]
+            absent = np.fromiter((v is _MISSING or v == "" for v in values), dtype=bool, count=n)
+            if required:
+                for i in np.flatnonzero(absent & is_dict):
+                    missing.setdefault(int(i), []).append(name)
+
+            # Il controllo di tipo riguarda solo i valori presenti e non nulli
+            present = np.flatnonzero(~absent & np.fromiter((v is not None for v in values), dtype=bool, count=n))
+            if len(present) == 0:
+                continue
+            subset = [values[i] for i in present]
+            ok, message = check(subset, field)
+            for j in np.flatnonzero(~ok):
+                errors.setdefault(int(present[j]), {})[name] = f"{message}: {subset[j]!r}"
+
+        valid_records = []
+        valid_indices = []
+        invalid_records = []
+        for i, record in enumerate(records):
+            if not is_dict[i]:
+                invalid_records.append({"index": i, "record": record, "missing_fields": [],
+                                        "errors": {"record": "non è un oggetto JSON"}})
+            elif i in missing or i in errors:
+                invalid_records.append({"index": i, "record": record,
+                                        "missing_fields": missing.get(i, []), "errors": errors.get(i, {})})
+            else:
+                valid_records.append(record)
+                valid_indices.append(i)
+        valid_records = self.codec.encode_batch(valid_records)
+        if with_indices:
+            return valid_records, valid_indices, invalid_records
+        return valid_records, invalid_records
+
+
+_validators = {}
+
+
+def get_validator(filename, schema):
+    """Validatore compilato per un dataset (compilato una sola volta per processo)"""
+    validator = _validators.get(filename)
+    if validator is None:
+        validator = _validators[filename] = SchemaValidator(schema, get_codec(filename, schema))
+    return validator
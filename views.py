@@ -0,0 +1,184 @@
+import threading
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from storage import load_dataframe, load_derived
+
+# Join di una vista: la colonna key della vista (del dataset o prodotta da un join
+# precedente) viene cercata nella colonna on di source; columns mappa
+# colonna della sorgente -> colonna aggiunta alla vista
+Join = namedtuple("Join", "source key on columns")
+
+_RACE = Join("f1db-races.json", "raceId", "id", {"officialName": "raceName", "date": "raceDate", "circuitId": "circuitId"})
+_CIRCUIT = Join("f1db-circuits.json", "circuitId", "id", {"fullName": "circuitName"})
+_DRIVER = Join("f1db-drivers.json", "driverId", "id", {"fullName": "driverName"})
+_CONSTRUCTOR = Join("f1db-constructors.json", "constructorId", "id", {"fullName": "constructorName"})
+
+# Viste arricchite per dataset: classifiche e risultati con i nomi di gare, circuiti, piloti e costruttori
+JOIN_VIEWS = {
+    "f1db-races-race-results.json": (_RACE, _CIRCUIT, _DRIVER, _CONSTRUCTOR),
+    "f1db-races-constructor-standings.json": (_RACE, _CIRCUIT, _CONSTRUCTOR),
+    "f1db-races-driver-standings.json": (_RACE, _CIRCUIT, _DRIVER),
+}
+
+_lock = threading.Lock()
+
+
+class Lookup:
+    """Tabella hash di un join: valori della colonna on (prima occorrenza) -> colonne richieste"""
+
+    def __init__(self, index, values):
+        self.index = index      # pd.Index univoco delle chiavi
+        self.values = values    # colonna della vista -> array con un None finale per le chiavi mancanti
+
+    @classmethod
+    def build(cls, df, join):
+        if join.on not in df.columns:
+            keep = np.zeros(len(df), dtype=bool)
+        else:
+            keep = (df[join.on].notna() & ~df[join.on].duplicated()).to_numpy()
+        index = pd.Index(df[join.on].to_numpy()[keep] if join.on in df.columns else [])
+        values = {}
+        for column, output in join.columns.items():
+            if column in df.columns:
+                selected = df[column].to_numpy(dtype=object)[keep]
+            else:
+                selected = np.full(len(index), None, dtype=object)
+            values[output] = np.append(selected, None)
+        return cls(index, values)
+
+    def probe(self, keys):
+        """Colonne per ogni chiave (None se la chiave non c'è), con una sola passata sulla tabella hash"""
+        positions = self.index.get_indexer(keys) if len(self.index) else np.full(len(keys), -1)
+        positions[positions < 0] = len(self.index)
+        return {output: values.take(positions) for output, values in self.values.items()}
+
+
+def _lookup(join):
+    """Tabella hash del join, ricostruita una volta per versione del dataset sorgente"""
+    name = f"lookup:{join.on}:{','.join(join.columns)}"
+    return load_derived(join.source, name, lambda data: Lookup.build(load_dataframe(join.source), join))
+
+
+def _probe(joins, lookups, base_column, columns=None, stale=None):
+    """Esegue i join in ordine; con stale (posizioni dei join) solo quelli indicati
+    e quelli che dipendono dalle colonne che producono"""
+    columns = dict(columns or {})
+    produced = set()
+    changed = set()
+    for position, (join, lookup) in enumerate(zip(joins, lookups)):
+        if stale is None or position in stale or join.key in changed:
+            keys = columns[join.key] if join.key in produced else base_column(join.key)
+            columns.update(lookup.probe(keys))
+            changed.update(join.columns.values())
+        produced.update(join.columns.values())
+    return columns
+
+
+def _frame_column(df):
+    """Colonna del dataset come array di oggetti (None se il dataset non la ha)"""
+    def column(name):
+        if name in df.columns:
+            return df[name].to_numpy(dtype=object)
+        return np.full(len(df), None, dtype=object)
+    return column
+
+
+def _record_column(records):
+    """Come _frame_column, per una lista di record"""
+    def column(name):
+        values = np.empty(len(records), dtype=object)
+        for i, record in enumerate(records):
+            values[i] = record.get(name)
+        return values
+    return column
+
+
+class JoinView:
+    """Colonne aggiunte da una vista, allineate alle righe del dataset (stesso ordine e numero).
+
+    È una struttura derivata del dataset: inserimenti, modifiche ed eliminazioni
+    del journal aggiornano solo le righe toccate (apply_ops). Se cambia una
+    sorgente vengono rifatti solo i join che la usano, alla lettura successiva.
+    """
+
+    def __init__(self, joins, lookups, columns):
+        self.joins = joins
+        self.lookups = lookups
+        self.columns = columns
+        self._frame = None   # (DataFrame del dataset, DataFrame della vista)
+
+    @classmethod
+    def build(cls, joins, lookups, df):
+        return cls(joins, lookups, _probe(joins, lookups, _frame_column(df)))
+
+    def apply_ops(self, ops, old_data, new_data):
+        """Nuova vista con le operazioni del journal applicate (copy-on-write)"""
+        columns = {output: values.copy() for output, values in self.columns.items()}
+        for op in ops:
+            if op["op"] == "insert":
+                added = _probe(self.joins, self.lookups, _record_column(op["records"]))
+                for output in columns:
+                    columns[output] = np.concatenate((columns[output], added[output]))
+            elif op["op"] == "update":
+                row = _probe(self.joins, self.lookups, _record_column([op["record"]]))
+                for output in columns:
+                    columns[output][op["index"]] = row[output][0]
+            elif op["op"] == "delete":
+                for output in columns:
+                    columns[output] = np.delete(columns[output], op["index"])
+        return JoinView(self.joins, self.lookups, columns)
+
+    def refresh(self, lookups, df):
+        """Rifà i join le cui sorgenti sono cambiate rispetto a lookups"""
+        stale = {position for position, (old, new) in enumerate(zip(self.lookups, lookups)) if old is not new}
+        if not stale:
+            return
+        self.columns = _probe(self.joins, lookups, _frame_column(df), self.columns, stale)
+        self.lookups = lookups
+        self._frame = None
+
+    def frame(self, df):
+        """DataFrame del dataset con le colonne dei join accanto alla rispettiva chiave"""
+        if self._frame is not None and self._frame[0] is df:
+            return self._frame[1]
+        after = {}
+        for join in self.joins:
+            after.setdefault(join.key, []).extend(join.columns.values())
+        ordered = []
+
+        def place(column):
+            if column in ordered:
+                return
+            ordered.append(column)
+            for output in after.get(column, ()):
+                place(output)
+
+        for column in df.columns:
+            place(column)
+        for output in self.columns:
+            place(output)
+        view = pd.DataFrame(
+            {column: df[column] if column in df.columns else self.columns[column] for column in ordered},
+            index=df.index
+        )
+        self._frame = (df, view)
+        return view
+
+
+def has_view(filename):
+    """True se per il dataset è definita una vista arricchita"""
+    return filename in JOIN_VIEWS
+
+
+def load_view(filename):
+    """Vista arricchita della versione corrente del dataset (stesse righe, nello stesso ordine)"""
+    joins = JOIN_VIEWS[filename]
+    with _lock:
+        lookups = tuple(_lookup(join) for join in joins)
+        df = load_dataframe(filename)
+        view = load_derived(filename, "join_view", lambda data: JoinView.build(joins, lookups, df))
+        view.refresh(lookups, df)
+        return view.frame(df)